@@ -5,4 +5,8 @@ set -o errexit
 pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# Centroides de cidades/bairros (imoveis/dados/centroides.csv) e localização dos imóveis
+# sem ponto exato; idempotente, roda a cada deploy para pegar mudanças no CSV
+python manage.py carregar_centroides
\ No newline at end of file
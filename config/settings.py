@@ -90,6 +90,32 @@ DATABASES = {
     )
 }
 
+# --- CACHE COMPARTILHADO ---
+# Versões do catálogo/referência, travas contra estouro, buffer do contador de visitas:
+# tudo isso precisa de um cache que todos os workers e os comandos (cron,
+# processar_fotos) enxergam, com incr/add atômicos. Só o Redis serve (REDIS_URL).
+# Sem ele: cache por processo (LocMemCache) para os derivados, versões na tabela
+# VersaoGlobal e o contador de visitas gravando direto no banco (imoveis/catalogo.py,
+# imoveis/contador.py). O DatabaseCache não: incr nele é ler e depois gravar, e o
+# descarte ao encher (CULL) levaria baldes e sketches ainda não gravados.
+REDIS_URL = os.environ.get('REDIS_URL')
+CACHE_COMPARTILHADO = bool(REDIS_URL)
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    if not DEBUG:
+        print("!!! AVISO: REDIS_URL não definida. Cache por processo; visitas gravadas direto no banco. !!!")
+
 # --- PASSWORD VALIDATION ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -271,6 +297,35 @@ LOGGING = {
     },
 }
 # --- FIM DA SEÇÃO LOGGING ---
+# --- VITRINE EM MEMÓRIA (imoveis/vitrine.py) ---
+# Índice NumPy por worker para os filtros de lista_imoveis. Desligado por padrão.
+# Uma thread do worker o reconstrói quando o catálogo muda ou a cada VITRINE_RECONSTRUIR_SEGUNDOS.
+VITRINE_EM_MEMORIA = os.environ.get('VITRINE_EM_MEMORIA', 'False') == 'True'
+VITRINE_RECONSTRUIR_SEGUNDOS = int(os.environ.get('VITRINE_RECONSTRUIR_SEGUNDOS', '300'))
+
+# --- CONTADOR DE VISUALIZAÇÕES (imoveis/contador.py) ---
+# Com Redis as visitas ficam num buffer no cache: rode o comando descarregar_visualizacoes
+# num cron ou ligue a thread (a trava deixa uma descarga por vez). Sem Redis não há buffer:
+# cada visitante novo é gravado direto no banco e a descarga não tem o que fazer.
+VISUALIZACOES_DESCARGA_EM_THREAD = os.environ.get('VISUALIZACOES_DESCARGA_EM_THREAD', 'False') == 'True'
+# Quantos proxies nossos ficam na frente do Django acrescentando o IP ao X-Forwarded-For
+# (o Render tem um). O IP do visitante é o que o mais externo deles acrescentou; o começo
+# do cabeçalho vem do cliente e não vale. Com 0 vale o REMOTE_ADDR.
+PROXIES_CONFIAVEIS = int(os.environ.get('PROXIES_CONFIAVEIS', '1' if RENDER_EXTERNAL_HOSTNAME else '0'))
+
+# --- EXPIRAÇÃO DE ASSINATURAS/ANÚNCIOS (imoveis/expiracao.py) ---
+# Rode o comando expirar_anuncios num cron ou ligue a thread (uma por worker; uma trava
+# no banco/cache garante uma execução por vez).
+EXPIRACAO_EM_THREAD = os.environ.get('EXPIRACAO_EM_THREAD', 'False') == 'True'
+
+# --- FILA DE FOTOS (contas/fila_fotos.py) ---
+# O anúncio grava as fotos originais aqui e volta na hora; o comando processar_fotos
+# (worker) aplica a marca d'água e envia ao B2. Precisa ser um disco que o worker enxerga.
+FOTOS_STAGING_ROOT = Path(os.environ.get('FOTOS_STAGING_ROOT', BASE_DIR / 'staging_fotos'))
+# Antes da marca d'água (contas/uploads.py, normalizar): lado maior em px e qualidade do JPEG
+FOTOS_LADO_MAXIMO = int(os.environ.get('FOTOS_LADO_MAXIMO', 1920))
+FOTOS_QUALIDADE_JPEG = int(os.environ.get('FOTOS_QUALIDADE_JPEG', 82))
+
 MERCADOPAGO_ACCESS_TOKEN = 'TEST-2115056379086026-011214-f6d39061f853500ce2e17cbd6bdb43b0-83157671'
 # settings.py (no final do arquivo)
 
@@ -6,7 +6,9 @@ from django.urls import path, include
 
 # --- ✅ [1. IMPORTES ADICIONADOS] ---
 from django.contrib.sitemaps.views import sitemap
+from django.views.decorators.http import condition
 from django.views.generic import TemplateView
+from imoveis.condicional import etag_sitemap
 from imoveis.sitemaps import ImovelSitemap, StaticViewSitemap # (Você criou este arquivo no Passo 2)
 
 # --- ✅ [2. DICIONÁRIO DO SITEMAP ADICIONADO] ---
@@ -21,8 +23,8 @@ urlpatterns = [
     path('contas/', include('contas.urls')),
     
     # --- ✅ [3. ROTAS DO SITEMAP E ROBOTS.TXT ADICIONADAS] ---
-    # Esta linha gera o arquivo sitemap.xml
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    # Esta linha gera o arquivo sitemap.xml (304 enquanto a versão do catálogo não muda)
+    path('sitemap.xml', condition(etag_func=etag_sitemap)(sitemap), {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
     # Esta linha serve o arquivo robots.txt que você criou
     path('robots.txt', TemplateView.as_view(template_name="robots.txt", content_type="text/plain")),
     
@@ -0,0 +1,243 @@
+# contas/fila_fotos.py
+"""
+Fila das fotos dos anúncios (tabela ProcessamentoFoto + comando processar_fotos).
+
+A requisição só grava o original em FOTOS_STAGING_ROOT e cria um item na
+fila (enfileirar_foto_principal / enfileirar_galeria): nada de marca d'água
+nem B2 no caminho do usuário. Enquanto isso a galeria tem a Foto com
+pronta=False e o imóvel foto_principal_pendente=True (as páginas mostram
+"processando").
+
+O worker (processar_lote) reserva até `limite` itens com um UPDATE
+condicional (vários workers não pegam o mesmo item), envia em paralelo pelo
+pool de contas/uploads.py e grava o resultado:
+
+- deu certo: Foto.pronta=True / foto_principal preenchida, com as larguras
+  das versões reduzidas (JPEG + WebP) em `derivados`; original apagado;
+- deu errado: volta para a fila com espera exponencial (BACKOFF_SEGUNDOS *
+  2^(tentativas-1), até BACKOFF_MAXIMO_SEGUNDOS) e, depois de MAX_TENTATIVAS,
+  fica FALHOU (a Foto de galeria é removida; a principal deixa de "processar").
+
+Item reservado por um worker que morreu volta sozinho para a fila quando
+passa o prazo da reserva (RESERVA_SEGUNDOS).
+"""
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import uploads
+
+MAX_TENTATIVAS = 6
+BACKOFF_SEGUNDOS = 30
+BACKOFF_MAXIMO_SEGUNDOS = 3600
+RESERVA_SEGUNDOS = 300
+PASTA_PRINCIPAL = 'fotos_imoveis'
+PASTA_GALERIA = 'fotos_galeria'
+
+
+def staging():
+    return FileSystemStorage(location=settings.FOTOS_STAGING_ROOT)
+
+
+def _guardar(arquivo):
+    """
+    Grava o original no staging. Devolve (nome no staging, nome final no B2);
+    o nome final é .jpg qualquer que seja o upload (o worker normaliza para JPEG).
+    """
+    nome_unico = uploads.generate_unique_filename(arquivo.name, uploads.EXTENSAO_NORMALIZADA)
+    return staging().save(nome_unico, arquivo), nome_unico
+
+
+def apagar_temporario(nome):
+    try:
+        staging().delete(nome)
+    except OSError as e:
+        print(f"Aviso: não foi possível apagar {nome} do staging: {e}")
+
+
+def enfileirar_foto_principal(imovel, arquivo):
+    """
+    Põe a foto principal na fila. Quem chama já gravou o imóvel com
+    foto_principal=None e foto_principal_pendente=True.
+    """
+    from imoveis.models import ProcessamentoFoto
+
+    if not uploads.eh_imagem(arquivo):
+        raise uploads.FotoInvalida(f"{arquivo.name} não é uma imagem")
+    temporario, nome_unico = _guardar(arquivo)
+    return ProcessamentoFoto.objects.create(
+        imovel=imovel, destino=ProcessamentoFoto.Destino.PRINCIPAL,
+        nome=f"{PASTA_PRINCIPAL}/{nome_unico}", arquivo_temporario=temporario,
+        nome_original=arquivo.name, content_type=arquivo.content_type or '',
+    )
+
+
+def enfileirar_galeria(imovel, arquivos):
+    """
+    Cria as Fotos (pronta=False) e os itens da fila. Devolve quantas entraram;
+    o que não é imagem fica de fora (nem chega ao staging).
+    """
+    from imoveis.models import Foto, ProcessamentoFoto
+
+    imagens = []
+    for arquivo in arquivos:
+        if not isinstance(arquivo, UploadedFile):
+            continue
+        if uploads.eh_imagem(arquivo):
+            imagens.append(arquivo)
+        else:
+            print(f"Aviso: {arquivo.name} não é uma imagem; fora da fila.")
+    arquivos = imagens
+    guardados = [_guardar(arquivo) for arquivo in arquivos]
+    with transaction.atomic():
+        fotos = Foto.objects.bulk_create([
+            Foto(imovel=imovel, imagem=f"{PASTA_GALERIA}/{nome_unico}", pronta=False)
+            for _, nome_unico in guardados
+        ])
+        ProcessamentoFoto.objects.bulk_create([
+            ProcessamentoFoto(
+                imovel=imovel, foto=foto, destino=ProcessamentoFoto.Destino.GALERIA,
+                nome=foto.imagem.name, arquivo_temporario=temporario,
+                nome_original=arquivo.name, content_type=arquivo.content_type or '',
+            )
+            for arquivo, (temporario, _), foto in zip(arquivos, guardados, fotos)
+        ])
+    return len(fotos)
+
+
+def reservar(limite, agora=None):
+    """Pega até `limite` itens prontos para rodar (os mais antigos primeiro) para este worker."""
+    from imoveis.models import ProcessamentoFoto
+
+    agora = agora or timezone.now()
+    Status = ProcessamentoFoto.Status
+    disponiveis = (
+        Q(status=Status.PENDENTE, proxima_tentativa__lte=agora)
+        | Q(status=Status.PROCESSANDO, reservado_ate__lt=agora)
+    )
+    ids = list(
+        ProcessamentoFoto.objects.filter(disponiveis)
+        .order_by('proxima_tentativa', 'id').values_list('id', flat=True)[:limite]
+    )
+    if not ids:
+        return []
+    ficha = uuid.uuid4().hex
+    # O filtro vai de novo no UPDATE: o que outro worker reservou desde o SELECT fica de fora
+    ProcessamentoFoto.objects.filter(disponiveis, id__in=ids).update(
+        status=Status.PROCESSANDO, reservado_por=ficha,
+        reservado_ate=agora + timedelta(seconds=RESERVA_SEGUNDOS), tentativas=F('tentativas') + 1,
+    )
+    return list(ProcessamentoFoto.objects.filter(reservado_por=ficha, status=Status.PROCESSANDO).order_by('id'))
+
+
+def espera(tentativas):
+    """Segundos até a próxima tentativa (exponencial, com até 20% de folga para espalhar os workers)."""
+    segundos = min(BACKOFF_SEGUNDOS * 2 ** (tentativas - 1), BACKOFF_MAXIMO_SEGUNDOS)
+    return segundos * random.uniform(1.0, 1.2)
+
+
+def _enviar(item, s3_client, bucket_name):
+    """
+    Roda numa thread do pool: lê o original, marca d'água, PUT do original e das
+    versões reduzidas. Devolve (exceção ou None, larguras geradas).
+    """
+    try:
+        with staging().open(item.arquivo_temporario, 'rb') as original:
+            arquivo = SimpleUploadedFile(item.nome_original or item.nome, original.read(), item.content_type or None)
+        larguras = uploads.enviar_com_marca(
+            arquivo, f"{settings.AWS_LOCATION}/{item.nome}", s3_client, bucket_name, derivados=True,
+        )
+    except Exception as e:
+        return e, []
+    return None, larguras
+
+
+def _concluir(item, larguras, agora):
+    from imoveis.models import Foto, Imovel, ProcessamentoFoto
+
+    derivados = {'nome': item.nome, 'larguras': larguras}
+    with transaction.atomic():
+        if item.destino == ProcessamentoFoto.Destino.GALERIA:
+            if Foto.objects.filter(id=item.foto_id).update(pronta=True, derivados=derivados):
+                # A galeria aparece no detalhe: muda a ETag/Last-Modified dele
+                Imovel.objects.filter(id=item.imovel_id).update(atualizado_em=agora)
+        else:
+            imovel = Imovel.objects.select_for_update().filter(id=item.imovel_id).first()
+            mais_nova = ProcessamentoFoto.objects.filter(
+                imovel_id=item.imovel_id, destino=ProcessamentoFoto.Destino.PRINCIPAL, id__gt=item.id,
+            ).exists()
+            # Só vale se o dono não trocou (foto mais nova na fila) nem limpou a foto enquanto isso
+            if imovel and imovel.foto_principal_pendente and not mais_nova:
+                imovel.foto_principal.name = item.nome
+                imovel.foto_principal_pendente = False
+                imovel.foto_principal_derivados = derivados
+                imovel.save(update_fields=['foto_principal', 'foto_principal_pendente', 'foto_principal_derivados'])
+        ProcessamentoFoto.objects.filter(id=item.id).update(
+            status=ProcessamentoFoto.Status.CONCLUIDO, concluido_em=agora, reservado_ate=None, erro='',
+        )
+    apagar_temporario(item.arquivo_temporario)
+
+
+def _falhar(item, erro, agora):
+    """
+    Volta para a fila com espera exponencial; na última tentativa (ou sem o
+    original, ou se ele não é uma imagem) desiste.
+    """
+    from imoveis.models import Foto, Imovel, ProcessamentoFoto
+
+    definitivo = item.tentativas >= MAX_TENTATIVAS or isinstance(erro, (FileNotFoundError, uploads.FotoInvalida))
+    if not definitivo:
+        ProcessamentoFoto.objects.filter(id=item.id).update(
+            status=ProcessamentoFoto.Status.PENDENTE, reservado_ate=None, erro=str(erro),
+            proxima_tentativa=agora + timedelta(seconds=espera(item.tentativas)),
+        )
+        return False
+
+    with transaction.atomic():
+        # foto=None antes de apagar a Foto: o CASCADE levaria o registro da falha junto
+        ProcessamentoFoto.objects.filter(id=item.id).update(
+            status=ProcessamentoFoto.Status.FALHOU, foto=None, reservado_ate=None, erro=str(erro), concluido_em=agora,
+        )
+        if item.destino == ProcessamentoFoto.Destino.GALERIA:
+            Foto.objects.filter(id=item.foto_id).delete()
+        else:
+            mais_nova = ProcessamentoFoto.objects.filter(
+                imovel_id=item.imovel_id, destino=ProcessamentoFoto.Destino.PRINCIPAL, id__gt=item.id,
+            ).exists()
+            if not mais_nova:
+                imovel = Imovel.objects.filter(id=item.imovel_id, foto_principal_pendente=True).first()
+                if imovel:
+                    imovel.foto_principal_pendente = False
+                    imovel.save(update_fields=['foto_principal_pendente'])
+    apagar_temporario(item.arquivo_temporario)
+    return True
+
+
+def processar_lote(limite=uploads.MAX_UPLOADS_PARALELOS, s3_client=None, bucket_name=None):
+    """
+    Reserva e processa um lote. Devolve (concluídos, reagendados, falhas definitivas);
+    (0, 0, 0) com a fila vazia.
+    """
+    itens = reservar(limite)
+    futuros = [uploads._pool().submit(_enviar, item, s3_client, bucket_name) for item in itens]
+    concluidos = reagendados = falhas = 0
+    for item, futuro in zip(itens, futuros):
+        erro, larguras = futuro.result()
+        agora = timezone.now()
+        if erro is None:
+            _concluir(item, larguras, agora)
+            concluidos += 1
+        elif _falhar(item, erro, agora):
+            print(f"!!! Foto {item.nome_original} (imóvel {item.imovel_id}) desistida após {item.tentativas} tentativas: {erro}")
+            falhas += 1
+        else:
+            print(f"Foto {item.nome_original} (imóvel {item.imovel_id}) falhou ({erro}); nova tentativa agendada.")
+            reagendados += 1
+    return concluidos, reagendados, falhas
@@ -0,0 +1,91 @@
+# contas/management/commands/benchmark_fotos.py
+import contextlib
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw, ImageFont
+
+from contas import uploads
+
+
+def _marca_como_era(arquivo, texto="USO EXCLUSIVO DE DOCELARMS"):
+    """A marca d'água antes da normalização: foto inteira em RGBA, salva como PNG."""
+    img = Image.open(arquivo).convert("RGBA")
+    draw = ImageDraw.Draw(img)
+    try:
+        fonte = ImageFont.truetype("DejaVuSans-Bold.ttf", int(img.height / 30))
+    except IOError:
+        fonte = ImageFont.load_default()
+    caixa = draw.textbbox((0, 0), texto, font=fonte)
+    draw.text(((img.width - caixa[2]) / 2, (img.height - caixa[3]) / 2), texto, font=fonte, fill=(0, 0, 0, 128))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede CPU e bytes de saída do tratamento de uma foto de celular (JPEG 4:3 com EXIF de "
+        "orientação e GPS): a marca d'água como era (RGBA -> PNG no tamanho cheio) e com a "
+        "normalização antes dela (contas/uploads.py, normalizar), com e sem Image.draft()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fotos', type=int, default=5, help='Quantas vezes processar a foto.')
+        parser.add_argument('--largura', type=int, default=4032, help='Largura da foto de teste (4032 = 12MP).')
+        parser.add_argument('--lado-maximo', type=int, default=uploads.LADO_MAXIMO)
+        parser.add_argument('--qualidade', type=int, default=uploads.QUALIDADE_JPEG)
+
+    def handle(self, *args, **options):
+        original = self.foto(options['largura'])
+        lado, qualidade = options['lado_maximo'], options['qualidade']
+        self.stdout.write(
+            f"Foto de teste: {options['largura']}x{options['largura'] * 3 // 4}, {len(original) / 1024:.0f} KB; "
+            f"lado máximo {lado}px, qualidade {qualidade}; {options['fotos']} execuções"
+        )
+
+        cenarios = (
+            ('como era (RGBA -> PNG)', _marca_como_era),
+            ("marca d'água em JPEG", uploads.add_watermark),
+            ('normalizar sem draft + marca', lambda f: uploads.add_watermark(
+                uploads.normalizar(f, lado, qualidade, rascunho=False))),
+            ('normalizar + marca', lambda f: uploads.add_watermark(uploads.normalizar(f, lado, qualidade))),
+        )
+        self.stdout.write(f"{'cenário':>30}{'CPU/foto (s)':>14}{'saída (KB)':>12}{'tamanho':>12}{'EXIF':>6}")
+        base = None
+        for nome, processar in cenarios:
+            cpu = 0.0
+            for _ in range(options['fotos']):
+                inicio = time.process_time()
+                with contextlib.redirect_stdout(io.StringIO()):  # os prints da marca d'água
+                    saida = processar(io.BytesIO(original))
+                    conteudo = saida.read()
+                cpu += time.process_time() - inicio
+            cpu /= options['fotos']
+            resultado = Image.open(io.BytesIO(conteudo))
+            base = base or (cpu, len(conteudo))
+            self.stdout.write(
+                f"{nome:>30}{cpu:>14.3f}{len(conteudo) / 1024:>12.0f}"
+                f"{f'{resultado.width}x{resultado.height}':>12}{'sim' if resultado.getexif() else 'não':>6}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Normalizado: {base[0] / cpu:.1f}x menos CPU e {base[1] / len(conteudo):.1f}x menos bytes que como era."
+        ))
+
+    def foto(self, largura):
+        """JPEG de câmera deitado (orientação 6), com ruído (comprime como foto de verdade) e GPS/câmera no EXIF."""
+        altura = largura * 3 // 4
+        ruido = Image.effect_noise((largura, altura), 48)
+        gradiente = Image.linear_gradient('L').resize((largura, altura))
+        imagem = Image.merge('RGB', (ruido, gradiente, Image.blend(ruido, gradiente, 0.5)))
+        exif = Image.Exif()
+        exif[0x010F] = 'Fabricante'  # Make
+        exif[0x0110] = 'Celular 12MP'  # Model
+        exif[0x0112] = 6  # Orientation: girar 90°
+        exif[0x8825] = {1: 'S', 2: (20.0, 27.0, 0.0), 3: 'W', 4: (54.0, 37.0, 0.0)}  # GPS
+        buffer = io.BytesIO()
+        imagem.save(buffer, format='JPEG', quality=92, exif=exif)
+        return buffer.getvalue()
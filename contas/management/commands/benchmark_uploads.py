@@ -0,0 +1,122 @@
+# contas/management/commands/benchmark_uploads.py
+import contextlib
+import io
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from contas import uploads
+
+BUCKET = 'benchmark'
+
+
+class _S3Falso(BaseHTTPRequestHandler):
+    """PUT de objeto com latência de rede simulada: `rtt` por pedido e 3 x `rtt` por conexão nova (TCP + TLS)."""
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    rtt = 0.0
+    conexoes = 0
+    pedidos = 0
+    contador_lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.contador_lock:
+            type(self).conexoes += 1
+        time.sleep(3 * self.rtt)
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.contador_lock:
+            type(self).pedidos += 1
+        time.sleep(self.rtt)
+        self.send_response(200)
+        self.send_header('ETag', '"0"')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o envio da galeria para um S3 falso local (com latência simulada): um cliente boto3 '
+        'novo por foto em série (como era), o cliente compartilhado em série e o cliente '
+        'compartilhado com o pool de threads (contas/uploads.py).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fotos', type=int, default=32, help='Quantas fotos na galeria.')
+        parser.add_argument('--rtt-ms', type=float, default=30.0, help='Ida e volta simulada até o B2, em ms.')
+        parser.add_argument('--largura', type=int, default=1600, help='Largura das fotos de teste (4:3).')
+        parser.add_argument('--marca-dagua', action='store_true',
+                            help="Inclui a marca d'água (CPU; com um núcleo só, ela domina o tempo e esconde a rede).")
+
+    def handle(self, *args, **options):
+        # O LOGGING do projeto deixa o botocore em DEBUG: atrapalha a leitura e a medição
+        for nome in ('boto3', 'botocore', 's3transfer', 'urllib3'):
+            logging.getLogger(nome).setLevel(logging.WARNING)
+        _S3Falso.rtt = options['rtt_ms'] / 1000
+        servidor = ThreadingHTTPServer(('127.0.0.1', 0), _S3Falso)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        endpoint = f"http://127.0.0.1:{servidor.server_address[1]}"
+        credenciais = {'aws_access_key_id': 'teste', 'aws_secret_access_key': 'teste', 'region_name': 'us-east-005'}
+
+        fotos = self.fotos(options['fotos'], options['largura'])
+        compartilhado = uploads.criar_cliente_s3(endpoint, **credenciais)
+
+        def um_cliente_por_foto():
+            return [
+                uploads.upload_to_b2(foto, f"galeria/{i}.jpg", uploads.criar_cliente_s3(endpoint, **credenciais), BUCKET)
+                for i, foto in enumerate(fotos)
+            ]
+
+        def compartilhado_em_serie():
+            return [uploads.upload_to_b2(foto, f"galeria/{i}.jpg", compartilhado, BUCKET) for i, foto in enumerate(fotos)]
+
+        def compartilhado_em_paralelo():
+            return [r.ok for r in uploads.enviar_galeria(fotos, 'galeria', 'media', compartilhado, BUCKET)]
+
+        self.stdout.write(
+            f"{len(fotos)} fotos {options['largura']}px, rtt {options['rtt_ms']:.0f} ms, "
+            f"{uploads.MAX_UPLOADS_PARALELOS} threads, marca d'água {'ligada' if options['marca_dagua'] else 'desligada'}"
+        )
+        sem_marca = contextlib.nullcontext() if options['marca_dagua'] else mock.patch.object(
+            uploads, 'add_watermark', lambda arquivo: arquivo,
+        )
+        self.stdout.write(f"{'cenário':>32}{'total (s)':>11}{'ok':>5}{'conexões':>10}")
+        for nome, executar in (
+            ('cliente novo por foto, em série', um_cliente_por_foto),
+            ('cliente compartilhado, em série', compartilhado_em_serie),
+            ('compartilhado + pool de threads', compartilhado_em_paralelo),
+        ):
+            conexoes_antes = _S3Falso.conexoes
+            inicio = time.perf_counter()
+            with sem_marca, contextlib.redirect_stdout(io.StringIO()):  # os prints de cada upload
+                resultados = executar()
+            total = time.perf_counter() - inicio
+            self.stdout.write(
+                f"{nome:>32}{total:>11.2f}{sum(resultados):>5}{_S3Falso.conexoes - conexoes_antes:>10}"
+            )
+
+        servidor.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"{_S3Falso.pedidos} PUTs recebidos pelo S3 falso."))
+
+    def fotos(self, quantidade, largura):
+        altura = largura * 3 // 4
+        gradiente = Image.linear_gradient('L').resize((largura, altura))
+        imagem = Image.merge('RGB', (gradiente, gradiente.rotate(90, expand=False), gradiente))
+        buffer = io.BytesIO()
+        imagem.save(buffer, format='JPEG', quality=85)
+        conteudo = buffer.getvalue()
+        return [
+            InMemoryUploadedFile(io.BytesIO(conteudo), 'fotos_galeria', f"foto{i}.jpg", 'image/jpeg', len(conteudo), None)
+            for i in range(quantidade)
+        ]
@@ -0,0 +1,40 @@
+# contas/management/commands/processar_fotos.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from contas.fila_fotos import MAX_TENTATIVAS, processar_lote
+from contas.uploads import MAX_UPLOADS_PARALELOS
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker da fila de fotos: aplica a marca d'água, envia ao B2 e marca a foto como pronta "
+        f"(até {MAX_TENTATIVAS} tentativas, com espera exponencial). Vários workers podem rodar juntos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=MAX_UPLOADS_PARALELOS, help='Fotos reservadas por vez.')
+        parser.add_argument('--intervalo', type=float, default=5.0, help='Segundos de espera com a fila vazia.')
+        parser.add_argument('--uma-vez', action='store_true', help='Processa o que está pronto na fila e sai (cron).')
+
+    def handle(self, *args, **options):
+        totais = [0, 0, 0]
+        while True:
+            try:
+                resultado = processar_lote(options['lote'])
+            finally:
+                close_old_connections()
+            totais = [total + n for total, n in zip(totais, resultado)]
+            if any(resultado):
+                concluidos, reagendados, falhas = resultado
+                self.stdout.write(f"{concluidos} foto(s) pronta(s), {reagendados} reagendada(s), {falhas} desistida(s).")
+                continue
+            if options['uma_vez']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Fila vazia: {totais[0]} foto(s) pronta(s), {totais[1]} reagendada(s), {totais[2]} desistida(s)."
+        ))
@@ -1,3 +1,233 @@
-from django.test import TestCase
+import io
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile, TemporaryUploadedFile
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from imoveis.models import Foto, Imovel, ProcessamentoFoto
+
+from . import fila_fotos, uploads
+
+
+class _ClienteFalso:
+    """put_object em memória; falha nas chaves que contêm 'ruim'."""
+
+    def __init__(self):
+        self.chaves = []
+        self.tipos = {}
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        if 'ruim' in Key or getattr(self, 'fora_do_ar', False):
+            raise ConnectionError("falha simulada")
+        with self.lock:
+            self.chaves.append(Key)
+            self.tipos[Key] = ContentType
+
+
+class EnviarGaleriaTests(SimpleTestCase):
+    """Galeria enviada em paralelo com o cliente compartilhado (contas/uploads.py)."""
+
+    def foto(self, nome):
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 30), 'white').save(buffer, format='JPEG')
+        return InMemoryUploadedFile(buffer, 'fotos_galeria', nome, 'image/jpeg', buffer.tell(), None)
+
+    def test_resultado_por_arquivo_na_ordem(self):
+        cliente = _ClienteFalso()
+        arquivos = [self.foto(f"foto{i}.jpg") for i in range(5)] + ["nao-e-upload"]
+        with mock.patch.object(uploads, 'generate_unique_filename', side_effect=lambda nome, extensao: f"u-{nome}"):
+            arquivos[2].name = "ruim.jpg"
+            resultados = uploads.enviar_galeria(arquivos, 'fotos_galeria', 'media', cliente, 'bucket')
+
+        self.assertEqual(
+            [r.nome_original for r in resultados],
+            ["foto0.jpg", "foto1.jpg", "ruim.jpg", "foto3.jpg", "foto4.jpg", "nao-e-upload"],
+        )
+        self.assertEqual([r.ok for r in resultados], [True, True, False, True, True, False])
+        self.assertIsNone(resultados[-1].nome_unico)
+        self.assertEqual(sorted(cliente.chaves), [f"media/fotos_galeria/u-foto{i}.jpg" for i in (0, 1, 3, 4)])
+
+    def test_upload_grande_em_disco_tambem_vai(self):
+        # Acima de 2,5 MB o Django entrega TemporaryUploadedFile, não InMemoryUploadedFile
+        cliente = _ClienteFalso()
+        arquivo = TemporaryUploadedFile("grande.jpg", 'image/jpeg', 0, None)
+        Image.new('RGB', (40, 30), 'white').save(arquivo, format='JPEG')
+        arquivo.size = arquivo.tell()
+        with mock.patch.object(uploads, 'generate_unique_filename', side_effect=lambda nome, extensao: f"u-{nome}"):
+            resultados = uploads.enviar_galeria([arquivo], 'fotos_galeria', 'media', cliente, 'bucket')
+        arquivo.close()
+
+        self.assertEqual(resultados, [uploads.ResultadoUpload("grande.jpg", "u-grande.jpg", True)])
+        self.assertEqual(cliente.chaves, ["media/fotos_galeria/u-grande.jpg"])
+
+    def test_um_cliente_por_processo(self):
+        with mock.patch.object(uploads, '_cliente', None), mock.patch.object(uploads, 'criar_cliente_s3') as criar:
+            threads = [threading.Thread(target=uploads.cliente_s3) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        criar.assert_called_once()
+
+
+class NormalizarFotoTests(SimpleTestCase):
+    """Etapa antes da marca d'água: draft, orientação EXIF, lado máximo, sem metadados (contas/uploads.py)."""
+
+    def foto_de_celular(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # deitada: girar 90°
+        exif[0x0110] = 'Celular'
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), 'white').save(buffer, format='JPEG', exif=exif)
+        return buffer
+
+    @override_settings(FOTOS_LADO_MAXIMO=400, FOTOS_QUALIDADE_JPEG=80)
+    def test_em_pe_reduzida_sem_metadados(self):
+        resultado = Image.open(uploads.normalizar(self.foto_de_celular()))
+        self.assertEqual(resultado.format, 'JPEG')
+        self.assertEqual(resultado.size, (300, 400))
+        self.assertFalse(resultado.getexif())
+        self.assertTrue(resultado.info.get('progressive'))
+
+    def test_nao_imagem_volta_como_veio(self):
+        arquivo = io.BytesIO(b"isto nao e uma foto")
+        self.assertIs(uploads.normalizar(arquivo), arquivo)
+
+
+class FilaFotosTests(TestCase):
+    """Fotos gravadas no staging pela requisição e enviadas pelo worker (contas/fila_fotos.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cls.imovel = Imovel.objects.create(proprietario=dono, titulo="Casa", foto_principal_pendente=True)
+
+    def setUp(self):
+        staging = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        self.enterContext(override_settings(FOTOS_STAGING_ROOT=staging.name))
+        self.enterContext(mock.patch.object(uploads, 'add_watermark', lambda arquivo: arquivo))
+
+    def foto(self, nome, tamanho=(40, 30)):
+        buffer = io.BytesIO()
+        Image.new('RGB', tamanho, 'white').save(buffer, format='JPEG')
+        return SimpleUploadedFile(nome, buffer.getvalue(), 'image/jpeg')
+
+    def test_worker_envia_e_marca_pronta(self):
+        fila_fotos.enfileirar_foto_principal(self.imovel, self.foto("capa.jpg"))
+        self.assertEqual(fila_fotos.enfileirar_galeria(self.imovel, [self.foto("a.jpg"), self.foto("b.jpg")]), 2)
+        self.assertFalse(Foto.objects.filter(imovel=self.imovel, pronta=True).exists())
+        self.assertEqual(len(fila_fotos.staging().listdir('')[1]), 3)
+
+        cliente = _ClienteFalso()
+        self.assertEqual(fila_fotos.processar_lote(8, cliente, 'bucket'), (3, 0, 0))
+
+        self.imovel.refresh_from_db()
+        self.assertFalse(self.imovel.foto_principal_pendente)
+        self.assertTrue(self.imovel.foto_principal.name.startswith('fotos_imoveis/'))
+        fotos = list(Foto.objects.filter(imovel=self.imovel))
+        self.assertTrue(all(foto.pronta for foto in fotos))
+        self.assertEqual(
+            sorted(cliente.chaves),
+            sorted([f"media/{self.imovel.foto_principal.name}"] + [f"media/{foto.imagem.name}" for foto in fotos]),
+        )
+        self.assertEqual(fila_fotos.staging().listdir('')[1], [])
+        self.assertEqual(fila_fotos.processar_lote(8, cliente, 'bucket'), (0, 0, 0))
+
+    def test_falha_volta_com_espera_e_desiste_no_limite(self):
+        fila_fotos.enfileirar_galeria(self.imovel, [self.foto("a.jpg")])
+        cliente = _ClienteFalso()
+        cliente.fora_do_ar = True
+
+        self.assertEqual(fila_fotos.processar_lote(8, cliente, 'bucket'), (0, 1, 0))
+        item = ProcessamentoFoto.objects.get()
+        self.assertEqual((item.status, item.tentativas), (ProcessamentoFoto.Status.PENDENTE, 1))
+        self.assertGreaterEqual(item.proxima_tentativa, timezone.now() + timedelta(seconds=fila_fotos.BACKOFF_SEGUNDOS - 1))
+        # Ainda esperando: o próximo lote não pega
+        self.assertEqual(fila_fotos.reservar(8), [])
+
+        ProcessamentoFoto.objects.update(tentativas=fila_fotos.MAX_TENTATIVAS - 1, proxima_tentativa=timezone.now())
+        self.assertEqual(fila_fotos.processar_lote(8, cliente, 'bucket'), (0, 0, 1))
+        item.refresh_from_db()
+        self.assertEqual(item.status, ProcessamentoFoto.Status.FALHOU)
+        self.assertFalse(Foto.objects.exists())
+        self.assertEqual(fila_fotos.staging().listdir('')[1], [])
+
+    def test_nao_imagem_fica_fora_da_fila_e_nunca_vai_ao_b2(self):
+        texto = SimpleUploadedFile("planta.jpg", b"isto nao e uma foto", 'image/jpeg')
+        self.assertEqual(fila_fotos.enfileirar_galeria(self.imovel, [self.foto("a.jpg"), texto]), 1)
+        with self.assertRaises(uploads.FotoInvalida):
+            fila_fotos.enfileirar_foto_principal(self.imovel, texto)
+        self.assertEqual(ProcessamentoFoto.objects.count(), 1)
+        self.assertEqual(len(fila_fotos.staging().listdir('')[1]), 1)
+
+        # Item que já estava na fila (de antes da checagem): falha de vez, sem PUT nem nova tentativa
+        ProcessamentoFoto.objects.all().delete()
+        Foto.objects.all().delete()
+        fila_fotos.enfileirar_galeria(self.imovel, [self.foto("b.jpg")])
+        item = ProcessamentoFoto.objects.get()
+        with fila_fotos.staging().open(item.arquivo_temporario, 'wb') as original:
+            original.write(b"isto nao e uma foto")
+        cliente = _ClienteFalso()
+        self.assertEqual(fila_fotos.processar_lote(8, cliente, 'bucket'), (0, 0, 1))
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.tentativas), (ProcessamentoFoto.Status.FALHOU, 1))
+        self.assertEqual(cliente.chaves, [])
+        self.assertFalse(Foto.objects.exists())
+
+    def test_png_vira_chave_jpg(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (700, 500), 'white').save(buffer, format='PNG')
+        fila_fotos.enfileirar_galeria(self.imovel, [SimpleUploadedFile("planta.png", buffer.getvalue(), 'image/png')])
+        cliente = _ClienteFalso()
+        self.assertEqual(fila_fotos.processar_lote(8, cliente, 'bucket'), (1, 0, 0))
+
+        foto = Foto.objects.get()
+        self.assertTrue(foto.imagem.name.endswith('.jpg'))
+        self.assertEqual(cliente.tipos[f"media/{foto.imagem.name}"], 'image/jpeg')
+        base = foto.imagem.name[:-len('.jpg')]
+        self.assertEqual(
+            sorted(cliente.chaves),
+            sorted([f"media/{foto.imagem.name}"] + [f"media/{base}_{l}.{ext}" for l in (320, 640) for ext in ('jpg', 'webp')]),
+        )
+
+    def test_reserva_vencida_volta_para_a_fila(self):
+        fila_fotos.enfileirar_galeria(self.imovel, [self.foto("a.jpg")])
+        self.assertEqual(len(fila_fotos.reservar(8)), 1)
+        self.assertEqual(fila_fotos.reservar(8), [])  # reservado por outro worker
+        depois = timezone.now() + timedelta(seconds=fila_fotos.RESERVA_SEGUNDOS + 1)
+        self.assertEqual([item.tentativas for item in fila_fotos.reservar(8, agora=depois)], [2])
+
+    def test_versoes_reduzidas_e_srcset(self):
+        fila_fotos.enfileirar_galeria(self.imovel, [self.foto("larga.jpg", (700, 500))])
+        cliente = _ClienteFalso()
+        fila_fotos.processar_lote(8, cliente, 'bucket')
+
+        foto = Foto.objects.get()
+        base = foto.imagem.name.rsplit('.', 1)[0]
+        self.assertEqual(foto.derivados, {'nome': foto.imagem.name, 'larguras': [320, 640]})
+        self.assertEqual(
+            sorted(cliente.chaves),
+            sorted([f"media/{foto.imagem.name}"] + [f"media/{base}_{l}.{ext}" for l in (320, 640) for ext in ('jpg', 'webp')]),
+        )
+
+        html = Template('{% load fotos %}{% foto_responsiva foto.imagem foto.derivados "50vw" alt="Casa" %}').render(
+            Context({'foto': foto})
+        )
+        url = foto.imagem.storage.url
+        self.assertIn(f'type="image/webp" srcset="{url(base + "_320.webp")} 320w, {url(base + "_640.webp")} 640w"', html)
+        self.assertIn(f'<img src="{url(base + "_640.jpg")}" srcset="{url(base + "_320.jpg")} 320w', html)
+
+        # Sem versões para o nome atual (foto trocada fora da fila): só o original
+        foto.imagem.name = 'fotos_galeria/outra.jpg'
+        html = Template('{% load fotos %}{% foto_responsiva foto.imagem foto.derivados "50vw" %}').render(Context({'foto': foto}))
+        self.assertNotIn('<picture>', html)
+        self.assertIn(f'src="{url("fotos_galeria/outra.jpg")}"', html)
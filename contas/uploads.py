@@ -0,0 +1,337 @@
+# contas/uploads.py
+"""
+Upload das fotos dos anúncios para o B2 (API S3) com marca d'água.
+
+- Um cliente boto3 por processo (cliente_s3), criado na primeira vez e
+  compartilhado por todas as threads (clientes boto3 são thread-safe), com
+  pool de até MAX_CONEXOES conexões HTTP keep-alive: o TLS com o B2 é feito
+  uma vez, não a cada arquivo.
+- A galeria é enviada por um pool de MAX_UPLOADS_PARALELOS threads
+  (enviar_galeria): marca d'água + PUT de cada foto em paralelo, com o
+  resultado de cada arquivo devolvido na ordem em que ele chegou (inclusive
+  o que ficou de fora por não ser upload).
+- Antes da marca d'água a foto é normalizada (normalizar): decodificação
+  reduzida do JPEG (Image.draft), orientação EXIF aplicada, lado maior
+  limitado a FOTOS_LADO_MAXIMO, cores em sRGB, sem metadados (GPS, câmera)
+  e JPEG progressivo em FOTOS_QUALIDADE_JPEG. A marca d'água também sai em
+  JPEG (antes o RGBA virava um PNG várias vezes maior).
+- Com `derivados=True` (fila de fotos), a foto marcada também sai em
+  larguras fixas (LARGURAS_DERIVADAS) em JPEG e WebP, ao lado do original:
+  <nome>_<largura>.jpg/.webp (nome_derivado). Os templates montam o srcset
+  com elas (imoveis/templatetags/fotos.py).
+"""
+import os
+import threading
+import traceback
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageCms, ImageDraw, ImageFont, ImageOps
+
+MAX_UPLOADS_PARALELOS = 8
+# Um pouco acima das threads de upload: sobra para a foto principal de outra requisição
+MAX_CONEXOES = 16
+
+# Padrões de FOTOS_LADO_MAXIMO / FOTOS_QUALIDADE_JPEG (settings)
+# 1920: uma foto de 12MP (4032px) ainda cabe na decodificação pela metade do draft
+LADO_MAXIMO = 1920
+QUALIDADE_JPEG = 82
+# O que sai de normalizar é sempre JPEG: a chave no bucket usa esta extensão, não a do upload
+EXTENSAO_NORMALIZADA = '.jpg'
+
+# Larguras (px) das versões reduzidas; só as menores que a foto são geradas
+LARGURAS_DERIVADAS = (320, 640, 1280)
+# extensão -> (formato do Pillow, Content-Type, opções do save)
+FORMATOS_DERIVADOS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 75, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+ResultadoUpload = namedtuple('ResultadoUpload', 'nome_original nome_unico ok')
+
+_cliente = None
+_cliente_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def criar_cliente_s3(endpoint_url=None, **credenciais):
+    """Cliente S3 do B2 (ou de outro endpoint, ex: o servidor falso do benchmark_uploads)."""
+    config = Config(
+        max_pool_connections=MAX_CONEXOES,
+        tcp_keepalive=True,
+        connect_timeout=5,
+        read_timeout=30,
+        retries={'max_attempts': 3, 'mode': 'standard'},
+    )
+    return boto3.client(
+        's3',
+        region_name=credenciais.get('region_name', os.getenv("B2_REGION_NAME", "us-east-005")),
+        endpoint_url=endpoint_url or f"https://{os.getenv('B2_ENDPOINT')}",
+        aws_access_key_id=credenciais.get('aws_access_key_id', os.getenv("B2_ACCESS_KEY_ID")),
+        aws_secret_access_key=credenciais.get('aws_secret_access_key', os.getenv("B2_SECRET_ACCESS_KEY")),
+        config=config,
+    )
+
+
+def cliente_s3():
+    """O cliente compartilhado deste processo (criar um boto3.client custa dezenas de ms)."""
+    global _cliente
+    if _cliente is None:
+        # boto3.client() não é thread-safe na criação (a sessão padrão é global)
+        with _cliente_lock:
+            if _cliente is None:
+                _cliente = criar_cliente_s3()
+                print("Cliente S3 Boto3 criado.")
+    return _cliente
+
+
+# Função auxiliar para gerar nome de arquivo único
+def generate_unique_filename(filename, extensao=None):
+    """Gera um nome de arquivo único mantendo a extensão (ou trocando por `extensao`)."""
+    ext = extensao or Path(filename).suffix
+    new_filename = f"{uuid.uuid4()}{ext}"
+    return new_filename
+
+class FotoInvalida(ValueError):
+    """O arquivo não é uma imagem que o Pillow abre: não vai para o B2 nem volta para a fila."""
+
+
+def eh_imagem(arquivo):
+    """True se o Pillow reconhece o arquivo como imagem (só confere o cabeçalho). Deixa o arquivo no início."""
+    try:
+        arquivo.seek(0)
+        Image.open(arquivo).verify()
+        return True
+    except Exception:
+        return False
+    finally:
+        arquivo.seek(0)
+
+
+def _para_srgb(img):
+    """Converte para sRGB se a foto traz outro perfil de cor (ex: Display P3 do iPhone); o perfil não vai junto."""
+    icc = img.info.get('icc_profile')
+    if not icc:
+        return img
+    try:
+        origem = ImageCms.ImageCmsProfile(BytesIO(icc))
+        return ImageCms.profileToProfile(img, origem, ImageCms.createProfile('sRGB'), outputMode='RGB')
+    except (ImageCms.PyCMSError, OSError, ValueError):
+        return img
+
+
+def normalizar(image_file, lado_maximo=None, qualidade=None, rascunho=True):
+    """
+    Primeira etapa, antes da marca d'água: foto da câmera -> JPEG progressivo
+    "em pé", com no máximo `lado_maximo` px no lado maior e sem metadados.
+    Com `rascunho`, o JPEG já é decodificado reduzido (1/2, 1/4 ou 1/8) quando
+    a foto é bem maior que o limite. Devolve um BytesIO; se não for uma imagem,
+    devolve o próprio arquivo (como a marca d'água faz).
+    """
+    lado_maximo = lado_maximo or getattr(settings, 'FOTOS_LADO_MAXIMO', LADO_MAXIMO)
+    qualidade = qualidade or getattr(settings, 'FOTOS_QUALIDADE_JPEG', QUALIDADE_JPEG)
+    try:
+        image_file.seek(0)
+        img = Image.open(image_file)
+        escala = lado_maximo / max(img.size)
+        if rascunho and img.format == 'JPEG' and escala < 1:
+            # Pede o tamanho final: o draft escolhe a maior redução que ainda fica >= a ele
+            img.draft('RGB', (round(img.width * escala), round(img.height * escala)))
+        if img.mode not in ('RGB', 'CMYK'):
+            img = img.convert('RGB')
+        # Reduz primeiro: girar e converter as cores já na foto pequena
+        img.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+        img = ImageOps.exif_transpose(img)
+        img = _para_srgb(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        buffer = BytesIO()
+        # Sem exif=/icc_profile= no save: o JPEG sai sem os metadados do original
+        img.save(buffer, format='JPEG', quality=qualidade, optimize=True, progressive=True)
+        buffer.seek(0)
+        return buffer
+    except Exception as e:
+        print(f"!!! ERRO ao normalizar a foto: {e} !!!")
+        image_file.seek(0)
+        return image_file
+
+
+# --- NOVA FUNÇÃO: Adicionar marca d'água ---
+def add_watermark(image_file, watermark_text="USO EXCLUSIVO DE DOCELARMS", font_path=None):
+    """
+    Adiciona uma marca d'água centralizada e em negrito a uma imagem.
+    image_file: objeto de arquivo (BytesIO ou similar) da imagem (já normalizada, ver normalizar).
+    watermark_text: O texto da marca d'água.
+    font_path: Caminho para um arquivo de fonte .ttf. Se None, usará uma fonte padrão.
+    """
+    print(f"--- Adicionando marca d'água: '{watermark_text}' ---")
+    try:
+        # Abre a imagem; o texto é desenhado numa máscara à parte (a foto continua RGB)
+        img = Image.open(image_file).convert("RGB")
+        width, height = img.size
+
+        mascara = Image.new("L", img.size, 0)
+        draw = ImageDraw.Draw(mascara)
+
+        # Tenta carregar uma fonte negrito ou usa a padrão
+        try:
+            if font_path and os.path.exists(font_path):
+                # <--- MUDANÇA AQUI: De 20 para 30 para diminuir a fonte
+                font = ImageFont.truetype(font_path, int(height / 30)) 
+            else:
+                try:
+                    # <--- MUDANÇA AQUI: De 20 para 30 para diminuir a fonte
+                    font = ImageFont.truetype("arialbd.ttf", int(height / 30)) # Windows
+                except IOError:
+                    try:
+                        # <--- MUDANÇA AQUI: De 20 para 30 para diminuir a fonte
+                        font = ImageFont.truetype("DejaVuSans-Bold.ttf", int(height / 30)) # Linux/macOS
+                    except IOError:
+                        font = ImageFont.load_default()
+                        print("Aviso: Nenhuma fonte negrito específica encontrada, usando fonte padrão.")
+
+        except Exception as e:
+            print(f"Erro ao carregar fonte, usando padrão: {e}")
+            font = ImageFont.load_default()
+        
+        text_bbox = draw.textbbox((0, 0), watermark_text, font=font)
+        text_width = text_bbox[2] - text_bbox[0]
+        text_height = text_bbox[3] - text_bbox[1]
+
+        x = (width - text_width) / 2
+        y = (height - text_height) / 2
+
+        # <--- MUDANÇA AQUI: De 255 (opaco) para 128 (50% transparente)
+        draw.text((x, y), watermark_text, font=font, fill=128)
+        img.paste((0, 0, 0), mask=mascara)
+
+        buffer = BytesIO()
+        img.save(
+            buffer, format="JPEG", optimize=True, progressive=True,
+            quality=getattr(settings, 'FOTOS_QUALIDADE_JPEG', QUALIDADE_JPEG),
+        )
+
+        buffer.seek(0)
+        print("Marca d'água adicionada com sucesso.")
+        return buffer
+    except Exception as e:
+        print(f"!!! ERRO ao adicionar marca d'água: {e} !!!")
+        traceback.print_exc()
+        image_file.seek(0)
+        return image_file
+
+def nome_derivado(nome, largura, extensao):
+    """'fotos_galeria/<uuid>.jpg' -> 'fotos_galeria/<uuid>_640.webp'."""
+    return f"{os.path.splitext(nome)[0]}_{largura}.{extensao}"
+
+
+def gerar_derivados(imagem_file):
+    """
+    (largura, extensão, Content-Type, BytesIO) de cada LARGURAS_DERIVADAS menor que a
+    imagem, da maior para a menor (cada redução parte da anterior, que já é menor).
+    """
+    imagem = Image.open(imagem_file).convert('RGB')
+    for largura in sorted((l for l in LARGURAS_DERIVADAS if l < imagem.width), reverse=True):
+        imagem = imagem.resize((largura, max(1, round(imagem.height * largura / imagem.width))), Image.LANCZOS)
+        for extensao, (formato, content_type, opcoes) in FORMATOS_DERIVADOS.items():
+            buffer = BytesIO()
+            imagem.save(buffer, format=formato, **opcoes)
+            buffer.seek(0)
+            yield largura, extensao, content_type, buffer
+
+
+def enviar_com_marca(file_obj, object_name, s3_client=None, bucket_name=None, derivados=False):
+    """
+    Marca d'água + put_object (e, com `derivados`, as versões reduzidas). Devolve as
+    larguras geradas. Deixa a exceção subir (a fila de fotos decide se tenta de novo).
+    """
+    s3_client = s3_client or cliente_s3()
+    bucket_name = bucket_name or os.getenv("B2_BUCKET_NAME")
+
+    file_obj.seek(0)
+
+    normalizado = normalizar(file_obj)
+    if normalizado is file_obj:
+        # Sem normalizar não há marca d'água: o original nunca vai para o bucket
+        raise FotoInvalida(f"{getattr(file_obj, 'name', object_name)} não é uma imagem")
+    watermarked_file_buffer = add_watermark(normalizado)
+    # Com ou sem a marca, o corpo é o JPEG normalizado (chave .jpg, ver EXTENSAO_NORMALIZADA)
+    content_type = 'image/jpeg'
+
+    print(f"Executando put_object: Bucket={bucket_name}, Key={object_name}, ContentType={content_type}")
+    s3_client.put_object(
+        Bucket=bucket_name,
+        Key=object_name,
+        Body=watermarked_file_buffer,
+        ContentType=content_type
+    )
+    print(f"SUCESSO: Upload Boto3 concluído para {object_name}")
+
+    larguras = []
+    if derivados:
+        watermarked_file_buffer.seek(0)
+        for largura, extensao, tipo, conteudo in gerar_derivados(watermarked_file_buffer):
+            s3_client.put_object(
+                Bucket=bucket_name, Key=nome_derivado(object_name, largura, extensao), Body=conteudo, ContentType=tipo,
+            )
+            if largura not in larguras:
+                larguras.append(largura)
+        print(f"Derivados enviados para {object_name}: {sorted(larguras)}")
+    return sorted(larguras)
+
+
+# Função auxiliar para fazer o upload manual via Boto3
+def upload_to_b2(file_obj, object_name, s3_client=None, bucket_name=None):
+    """Faz upload de um objeto de arquivo para B2 usando o cliente Boto3 compartilhado."""
+    print(f"--- Iniciando upload_to_b2 para: {object_name} ---")
+    try:
+        enviar_com_marca(file_obj, object_name, s3_client, bucket_name)
+        return True
+    except Exception as e:
+        print(f"!!! ERRO no upload_to_b2 para {object_name} !!!")
+        print(f"Tipo do erro: {type(e)}")
+        print(f"Erro: {e}")
+        traceback.print_exc()
+        return False
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_UPLOADS_PARALELOS, thread_name_prefix='upload-b2')
+    return _executor
+
+
+def enviar_galeria(arquivos, pasta, prefixo, s3_client=None, bucket_name=None):
+    """
+    Envia as fotos em paralelo (no máximo MAX_UPLOADS_PARALELOS ao mesmo tempo
+    neste processo) para `prefixo/pasta/<uuid>.jpg`. Devolve um
+    ResultadoUpload por item, na ordem de `arquivos`. Vale qualquer
+    UploadedFile, em memória ou em disco (TemporaryUploadedFile, acima de
+    FILE_UPLOAD_MAX_MEMORY_SIZE); o que não é upload volta com nome_unico=None
+    e ok=False.
+    """
+    futuros = []
+    for arquivo in arquivos:
+        if not isinstance(arquivo, UploadedFile):
+            print(f"Aviso: {arquivo!r} não é um arquivo enviado; fora da galeria.")
+            futuros.append((getattr(arquivo, 'name', str(arquivo)), None, None))
+            continue
+        nome = generate_unique_filename(arquivo.name, EXTENSAO_NORMALIZADA)
+        futuro = _pool().submit(upload_to_b2, arquivo, f"{prefixo}/{pasta}/{nome}", s3_client, bucket_name)
+        futuros.append((arquivo.name, nome, futuro))
+    return [
+        ResultadoUpload(nome_original, nome, futuro is not None and futuro.result())
+        for nome_original, nome, futuro in futuros
+    ]
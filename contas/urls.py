@@ -14,6 +14,9 @@ urlpatterns = [
     path('editar-imovel/<int:imovel_id>/', views.editar_imovel, name='editar_imovel'),
     path('excluir-imovel/<int:imovel_id>/', views.excluir_imovel, name='excluir_imovel'),
     path('excluir-foto/<int:foto_id>/', views.excluir_foto, name='excluir_foto'),
+    path('minhas-buscas/', views.minhas_buscas, name='minhas_buscas'),
+    path('salvar-busca/', views.salvar_busca, name='salvar_busca'),
+    path('excluir-busca/<int:busca_id>/', views.excluir_busca, name='excluir_busca'),
 
     # --- ROTA DE PAGAMENTO ADICIONADA ---
     path('planos/', views.listar_planos, name='listar_planos'),
@@ -4,146 +4,27 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .forms import CustomUserCreationForm, UserUpdateForm, CustomPasswordChangeForm
 # 1. IMPORTAMOS O NOVO FORMULÁRIO DE IMOBILIÁRIA
-from imoveis.models import Imovel, Foto, Plano, Assinatura 
+from imoveis.models import Imovel, Foto, Plano, Assinatura, BuscaSalva, NotificacaoBusca
 from imoveis.forms import ImovelForm, ImobiliariaForm # <--- IMPORTADO AQUI
+from imoveis.buscas_salvas import LIMITE_BUSCAS_POR_USUARIO, criterios_do_get, descrever, notificar_ao_confirmar
+from imoveis.estatisticas import tendencias
 from django.contrib.auth import update_session_auth_hash
 import traceback 
-import os 
-import boto3 
 from django.conf import settings 
-from django.core.files.uploadedfile import InMemoryUploadedFile
-import uuid
-from pathlib import Path
+from django.core.files.uploadedfile import UploadedFile
 import mercadopago
 
-# Importar Pillow para manipulação de imagens
-from PIL import Image, ImageDraw, ImageFont
-from io import BytesIO
+# Fotos vão para a fila (marca d'água + B2 no worker processar_fotos, contas/fila_fotos.py)
+from .fila_fotos import enfileirar_foto_principal, enfileirar_galeria
 
 # --- [IMPORTAÇÕES ADICIONADAS] ---
 from django.utils import timezone
 from datetime import timedelta
+from django.http import QueryDict
+from django.urls import reverse
+from urllib.parse import urlencode
 # ---------------------------------
 
-# Função auxiliar para gerar nome de arquivo único
-def generate_unique_filename(filename):
-    """Gera um nome de arquivo único mantendo a extensão."""
-    ext = Path(filename).suffix
-    new_filename = f"{uuid.uuid4()}{ext}"
-    return new_filename
-
-# --- NOVA FUNÇÃO: Adicionar marca d'água ---
-def add_watermark(image_file, watermark_text="USO EXCLUSIVO DE DOCELARMS", font_path=None):
-    """
-    Adiciona uma marca d'água centralizada e em negrito a uma imagem.
-    image_file: objeto de arquivo (BytesIO ou similar) da imagem original.
-    watermark_text: O texto da marca d'água.
-    font_path: Caminho para um arquivo de fonte .ttf. Se None, usará uma fonte padrão.
-    """
-    print(f"--- Adicionando marca d'água: '{watermark_text}' ---")
-    try:
-        # Abre a imagem
-        img = Image.open(image_file).convert("RGBA")
-        width, height = img.size
-
-        draw = ImageDraw.Draw(img)
-
-        # Tenta carregar uma fonte negrito ou usa a padrão
-        try:
-            if font_path and os.path.exists(font_path):
-                # <--- MUDANÇA AQUI: De 20 para 30 para diminuir a fonte
-                font = ImageFont.truetype(font_path, int(height / 30)) 
-            else:
-                try:
-                    # <--- MUDANÇA AQUI: De 20 para 30 para diminuir a fonte
-                    font = ImageFont.truetype("arialbd.ttf", int(height / 30)) # Windows
-                except IOError:
-                    try:
-                        # <--- MUDANÇA AQUI: De 20 para 30 para diminuir a fonte
-                        font = ImageFont.truetype("DejaVuSans-Bold.ttf", int(height / 30)) # Linux/macOS
-                    except IOError:
-                        font = ImageFont.load_default()
-                        print("Aviso: Nenhuma fonte negrito específica encontrada, usando fonte padrão.")
-
-        except Exception as e:
-            print(f"Erro ao carregar fonte, usando padrão: {e}")
-            font = ImageFont.load_default()
-        
-        text_bbox = draw.textbbox((0, 0), watermark_text, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-
-        x = (width - text_width) / 2
-        y = (height - text_height) / 2
-
-        # <--- MUDANÇA AQUI: De 255 (opaco) para 128 (50% transparente)
-        draw.text((x, y), watermark_text, font=font, fill=(0, 0, 0, 128)) 
-
-        buffer = BytesIO()
-        if img.mode == "RGBA":
-            img.save(buffer, format="PNG")
-        else:
-            img.convert("RGB").save(buffer, format="JPEG")
-
-        buffer.seek(0)
-        print("Marca d'água adicionada com sucesso.")
-        return buffer
-    except Exception as e:
-        print(f"!!! ERRO ao adicionar marca d'água: {e} !!!")
-        traceback.print_exc()
-        image_file.seek(0)
-        return image_file
-
-# Função auxiliar para fazer o upload manual via Boto3
-def upload_to_b2(file_obj, object_name):
-    """Faz upload de um objeto de arquivo para B2 usando Boto3."""
-    print(f"--- Iniciando upload_to_b2 para: {object_name} ---")
-    try:
-        s3_client = boto3.client(
-            's3',
-            region_name=os.getenv("B2_REGION_NAME", "us-east-005"),
-            endpoint_url=f"https://{os.getenv('B2_ENDPOINT')}",
-            aws_access_key_id=os.getenv("B2_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("B2_SECRET_ACCESS_KEY")
-        )
-        print("Cliente S3 Boto3 criado.")
-
-        bucket_name = os.getenv("B2_BUCKET_NAME")
-        
-        file_obj.seek(0) 
-
-        watermarked_file_buffer = add_watermark(file_obj)
-        if watermarked_file_buffer != file_obj:
-            try:
-                temp_img = Image.open(watermarked_file_buffer)
-                if temp_img.format == 'PNG':
-                    content_type = 'image/png'
-                elif temp_img.format == 'JPEG':
-                    content_type = 'image/jpeg'
-                else:
-                    content_type = file_obj.content_type
-                watermarked_file_buffer.seek(0)
-            except Exception:
-                content_type = file_obj.content_type
-        else:
-            content_type = file_obj.content_type
-        
-        print(f"Executando put_object: Bucket={bucket_name}, Key={object_name}, ContentType={content_type}")
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key=object_name,
-            Body=watermarked_file_buffer,
-            ContentType=content_type
-        )
-        print(f"SUCESSO: Upload Boto3 concluído para {object_name}")
-        return True
-    except Exception as e:
-        print(f"!!! ERRO no upload_to_b2 para {object_name} !!!")
-        print(f"Tipo do erro: {type(e)}")
-        print(f"Erro: {e}")
-        traceback.print_exc()
-        return False
-        
 # --- [VIEW DE CADASTRO ATUALIZADA] ---
 def cadastro(request):
     if request.method == 'POST':
@@ -205,33 +86,13 @@ def cadastro(request):
 @login_required
 def meus_imoveis(request):
     
-    agora = timezone.now()
-
-    # --- [INÍCIO DA CORREÇÃO - O "VIGIA"] ---
-    try:
-        assinatura = request.user.assinatura
-        
-        if assinatura.status == 'ATIVA' and assinatura.data_expiracao and assinatura.data_expiracao < agora:
-            
-            print(f"Assinatura (ID: {assinatura.id}) do usuário {request.user.username} expirou. Atualizando status...")
-            
-            assinatura.status = Assinatura.StatusAssinatura.EXPIRADA
-            assinatura.save(update_fields=['status'])
-            
-            Imovel.objects.filter(
-                proprietario=request.user,
-                status_publicacao='ATIVO'
-            ).update(status_publicacao=Imovel.StatusPublicacao.EXPIRADO)
-            
-            print("Imóveis ativos do usuário foram atualizados para 'Expirado'.")
-            
-    except Assinatura.DoesNotExist:
-        pass 
-    except Exception as e:
-        print(f"Erro ao verificar expiração de assinatura: {e}")
-    # --- [FIM DA CORREÇÃO] ---
+    # Assinatura vencida (e os anúncios dela) é expirada pelo comando expirar_anuncios
+    imoveis_do_usuario = list(Imovel.objects.vitrine().filter(proprietario=request.user).order_by('-data_cadastro'))
 
-    imoveis_do_usuario = Imovel.objects.filter(proprietario=request.user).order_by('-data_cadastro')
+    # Visitantes dos últimos 30 dias: linhas diárias pré-agregadas (uma consulta)
+    por_imovel = tendencias([imovel.id for imovel in imoveis_do_usuario])
+    for imovel in imoveis_do_usuario:
+        imovel.tendencia = por_imovel[imovel.id]
     
     contexto = {
         'imoveis': imoveis_do_usuario
@@ -313,6 +174,8 @@ def anunciar_imovel(request):
                 imovel = form.save(commit=False)
                 imovel.proprietario = request.user
                 imovel.foto_principal = None 
+                nova_foto_principal = isinstance(foto_principal_obj, UploadedFile)
+                imovel.foto_principal_pendente = nova_foto_principal
                 
                 # --- [INÍCIO] LÓGICA DE VINCULAR IMOBILIÁRIA ---
                 try:
@@ -341,49 +204,30 @@ def anunciar_imovel(request):
                 print("Salvando dados do imóvel...")
                 imovel.save() 
                 print(f"Imóvel salvo (sem foto) ID: {imovel.id}, Status: {imovel.status_publicacao}")
+                if imovel.status_publicacao == Imovel.StatusPublicacao.ATIVO:
+                    # Auto-aprovado: avisa as buscas salvas que casam com ele
+                    notificar_ao_confirmar([imovel.id])
+
+                # As fotos só são gravadas no staging e entram na fila; a marca d'água e o
+                # envio ao B2 ficam com o worker processar_fotos (contas/fila_fotos.py)
+                if nova_foto_principal:
+                    print(f"Foto principal na fila: {enfileirar_foto_principal(imovel, foto_principal_obj).nome}")
+                if fotos_galeria_list:
+                    na_fila = enfileirar_galeria(imovel, fotos_galeria_list)
+                    print(f"Fotos da galeria na fila: {na_fila}")
+                    recusadas = len(fotos_galeria_list) - na_fila
+                    if recusadas:
+                        messages.warning(request, f"{recusadas} arquivo(s) da galeria não são imagens e foram ignorados.")
+
+                if imovel.status_publicacao == 'ATIVO':
+                    messages.success(request, 'Seu imóvel foi publicado com sucesso!')
+                else:
+                    messages.success(request, 'Seu imóvel foi enviado para análise! Ele aparecerá no site assim que o conteúdo for aprovado.')
+                if nova_foto_principal or fotos_galeria_list:
+                    messages.info(request, 'Suas fotos estão sendo processadas e aparecem no anúncio em instantes.')
 
-                upload_principal_success = True
-                if foto_principal_obj and isinstance(foto_principal_obj, InMemoryUploadedFile):
-                    original_filename = foto_principal_obj.name
-                    unique_filename = generate_unique_filename(original_filename)
-                    b2_object_name = f"{settings.AWS_LOCATION}/fotos_imoveis/{unique_filename}" 
-                    
-                    print(f"Iniciando upload manual para foto principal: {b2_object_name}")
-                    upload_principal_success = upload_to_b2(foto_principal_obj, b2_object_name)
-                    
-                    if upload_principal_success:
-                        imovel.foto_principal.name = f"fotos_imoveis/{unique_filename}" 
-                        print(f"Atualizando DB com caminho da foto principal: {imovel.foto_principal.name}")
-                        imovel.save(update_fields=['foto_principal'])
-                    else:
-                        messages.error(request, f'Falha ao fazer upload da foto principal: {original_filename}')
-
-                if upload_principal_success and fotos_galeria_list:
-                    print(f"Processando {len(fotos_galeria_list)} fotos da galeria manualmente...")
-                    for file_obj in fotos_galeria_list:
-                        if isinstance(file_obj, InMemoryUploadedFile):
-                            original_filename = file_obj.name
-                            unique_filename = generate_unique_filename(original_filename)
-                            b2_object_name = f"{settings.AWS_LOCATION}/fotos_galeria/{unique_filename}"
-                            
-                            print(f"Iniciando upload manual para foto galeria: {b2_object_name}")
-                            upload_galeria_success = upload_to_b2(file_obj, b2_object_name)
-                            
-                            if upload_galeria_success:
-                                Foto.objects.create(imovel=imovel, imagem=f"fotos_galeria/{unique_filename}")
-                                print(f"Salvo no DB foto galeria: fotos_galeria/{unique_filename}")
-                            else:
-                                messages.warning(request, f'Falha ao fazer upload da foto da galeria: {original_filename}')
-
-                if upload_principal_success:
-                    
-                    if imovel.status_publicacao == 'ATIVO':
-                        messages.success(request, 'Seu imóvel foi publicado com sucesso!')
-                    else:
-                        messages.success(request, 'Seu imóvel foi enviado para análise! Ele aparecerá no site assim que o conteúdo for aprovado.')
-                    
-                    print("Redirecionando para meus_imoveis...") 
-                    return redirect('meus_imoveis')
+                print("Redirecionando para meus_imoveis...") 
+                return redirect('meus_imoveis')
 
             except Exception as e: 
                 print(f"!!! ERRO CRÍTICO GERAL (anunciar_imovel) !!!")
@@ -490,54 +334,32 @@ def editar_imovel(request, imovel_id):
                 
                 foto_antiga = imovel.foto_principal.name if imovel.foto_principal else None
 
-                if limpar_foto_principal or (foto_principal_obj and isinstance(foto_principal_obj, InMemoryUploadedFile)):
+                nova_foto_principal = isinstance(foto_principal_obj, UploadedFile)
+                if limpar_foto_principal or nova_foto_principal:
                     imovel_atualizado.foto_principal = None 
+                    # Limpar também cancela uma foto que ainda estava na fila
+                    imovel_atualizado.foto_principal_pendente = nova_foto_principal
 
                 print("Salvando dados do imóvel (sem/com foto antiga)...")
                 imovel_atualizado.save()
                 print(f"Imóvel atualizado (passo 1) ID: {imovel_atualizado.id}")
 
-                upload_principal_success = True
-
                 if limpar_foto_principal:
                     print("Limpando foto principal (já feito no save anterior).")
-                
-                elif foto_principal_obj and isinstance(foto_principal_obj, InMemoryUploadedFile):
-                    original_filename = foto_principal_obj.name
-                    unique_filename = generate_unique_filename(original_filename)
-                    b2_object_name = f"{settings.AWS_LOCATION}/fotos_imoveis/{unique_filename}"
-                    
-                    print(f"Iniciando upload manual para NOVA foto principal: {b2_object_name}")
-                    upload_principal_success = upload_to_b2(foto_principal_obj, b2_object_name)
-
-                    if upload_principal_success:
-                        imovel_atualizado.foto_principal.name = f"fotos_imoveis/{unique_filename}"
-                        print(f"Atualizando DB com caminho da NOVA foto principal: {imovel_atualizado.foto_principal.name}")
-                        imovel_atualizado.save(update_fields=['foto_principal'])
-                    else:
-                        messages.error(request, f'Falha ao fazer upload da NOVA foto principal: {original_filename}')
-
-                if upload_principal_success and fotos_galeria_list:
-                    print(f"Processando {len(fotos_galeria_list)} NOVAS fotos da galeria manualmente...")
-                    for file_obj in fotos_galeria_list:
-                        if isinstance(file_obj, InMemoryUploadedFile):
-                            original_filename = file_obj.name
-                            unique_filename = generate_unique_filename(original_filename)
-                            b2_object_name = f"{settings.AWS_LOCATION}/fotos_galeria/{unique_filename}"
-                            
-                            print(f"Iniciando upload manual para NOVA foto galeria: {b2_object_name}")
-                            upload_galeria_success = upload_to_b2(file_obj, b2_object_name)
-                            
-                            if upload_galeria_success:
-                                Foto.objects.create(imovel=imovel_atualizado, imagem=f"fotos_galeria/{unique_filename}")
-                                print(f"Salvo no DB NOVA foto galeria: fotos_galeria/{unique_filename}")
-                            else:
-                                messages.warning(request, f'Falha ao fazer upload da NOVA foto da galeria: {original_filename}')
-                
-                if upload_principal_success:
-                    messages.success(request, 'Imóvel atualizado com sucesso!')
-                    print("Redirecionando para meus_imoveis...") 
-                    return redirect('meus_imoveis')
+                elif nova_foto_principal:
+                    print(f"NOVA foto principal na fila: {enfileirar_foto_principal(imovel_atualizado, foto_principal_obj).nome}")
+                if fotos_galeria_list:
+                    na_fila = enfileirar_galeria(imovel_atualizado, fotos_galeria_list)
+                    print(f"NOVAS fotos da galeria na fila: {na_fila}")
+                    recusadas = len(fotos_galeria_list) - na_fila
+                    if recusadas:
+                        messages.warning(request, f"{recusadas} arquivo(s) da galeria não são imagens e foram ignorados.")
+
+                messages.success(request, 'Imóvel atualizado com sucesso!')
+                if nova_foto_principal or fotos_galeria_list:
+                    messages.info(request, 'Suas fotos estão sendo processadas e aparecem no anúncio em instantes.')
+                print("Redirecionando para meus_imoveis...") 
+                return redirect('meus_imoveis')
 
             except Exception as e: 
                 print(f"!!! ERRO CRÍTICO GERAL (editar_imovel) !!!")
@@ -592,6 +414,53 @@ def excluir_foto(request, foto_id):
         messages.error(request, 'Você não tem permissão para excluir esta foto.')
     return redirect('editar_imovel', imovel_id=imovel_id) 
 
+# --- Buscas salvas (imoveis/buscas_salvas.py) ---
+@login_required
+def salvar_busca(request):
+    """Guarda os filtros atuais de lista_imoveis (POST com a querystring da busca)."""
+    if request.method != 'POST':
+        return redirect('lista_imoveis')
+    criterios = criterios_do_get(QueryDict(request.POST.get('querystring', '')))
+    voltar = f"{reverse('lista_imoveis')}?{urlencode(criterios)}"
+    if not criterios:
+        messages.error(request, 'Escolha pelo menos um filtro antes de salvar a busca.')
+        return redirect(voltar)
+    if request.user.buscas_salvas.count() >= LIMITE_BUSCAS_POR_USUARIO:
+        messages.error(request, f'Você já tem {LIMITE_BUSCAS_POR_USUARIO} buscas salvas. Exclua alguma para salvar outra.')
+        return redirect('minhas_buscas')
+    nome = (request.POST.get('nome') or '').strip()[:150] or descrever(criterios)
+    BuscaSalva.objects.create(usuario=request.user, nome=nome, criterios=criterios)
+    messages.success(request, f'Busca "{nome}" salva! Avisaremos aqui quando aparecerem imóveis novos.')
+    return redirect('minhas_buscas')
+
+
+@login_required
+def minhas_buscas(request):
+    buscas = list(request.user.buscas_salvas.all())
+    notificacoes = (
+        NotificacaoBusca.objects.filter(busca__usuario=request.user)
+        .select_related('busca', 'imovel', 'imovel__cidade')
+        .order_by('-criada_em')[:50]
+    )
+    for busca in buscas:
+        busca.querystring = urlencode(busca.criterios)
+    contexto = {
+        'buscas': buscas,
+        'notificacoes': list(notificacoes),
+    }
+    # As novidades ficam destacadas nesta visita e contam como lidas a partir da próxima
+    NotificacaoBusca.objects.filter(busca__usuario=request.user, lida=False).update(lida=True)
+    return render(request, 'contas/minhas_buscas.html', contexto)
+
+
+@login_required
+def excluir_busca(request, busca_id):
+    busca = get_object_or_404(BuscaSalva, id=busca_id, usuario=request.user)
+    if request.method == 'POST':
+        busca.delete()
+        messages.success(request, 'Busca excluída.')
+    return redirect('minhas_buscas')
+
 # --- View "Perfil" (Original - Sem mudanças) ---
 @login_required
 def perfil(request):
@@ -1,9 +1,12 @@
 # imoveis/admin.py
 from django.contrib import admin
 # 1. Importamos os novos modelos, incluindo 'Assinatura'
-from .models import Imovel, Foto, Cidade, Imobiliaria, Bairro, Plano, Assinatura, NichoParceiro, Parceiro
+from .models import Imovel, Foto, Cidade, Imobiliaria, Bairro, Plano, Assinatura, NichoParceiro, Parceiro, BuscaSalva, ProcessamentoFoto
 from django.utils import timezone
 from datetime import timedelta
+from .busca_texto import filtrar_texto
+from .catalogo import incrementar_versao_catalogo
+from .buscas_salvas import notificar_ao_confirmar
 
 class FotoInline(admin.TabularInline):
     model = Foto
@@ -41,13 +44,21 @@ class ImovelAdmin(admin.ModelAdmin):
     
     actions = ['aprovar_anuncios', 'marcar_como_destaque']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Usa o índice de texto (FTS5/GIN) em vez de LIKE '%...%' em três colunas
+        if not search_term:
+            return queryset, False
+        return filtrar_texto(queryset, search_term), False
+
     # 4. Ação 'aprovar_anuncios' ATUALIZADA para usar a Assinatura do usuário
     @admin.action(description="Aprovar anúncios (mudar status para Ativo)")
     def aprovar_anuncios(self, request, queryset):
         """
         Muda o status de 'Pendente de Aprovação' para 'Ativo' 
         e calcula a data de expiração baseado na ASSINATURA do proprietário.
+        Os aprovados são casados com as buscas salvas num lote só, no fim.
         """
+        aprovados = []
         for imovel in queryset:
             # Só aprova se já estiver Pendente de Aprovação
             if imovel.status_publicacao == Imovel.StatusPublicacao.PENDENTE_APROVACAO:
@@ -67,6 +78,7 @@ class ImovelAdmin(admin.ModelAdmin):
                         imovel.data_expiracao = timezone.now() + timedelta(days=duracao_dias)
                         
                         imovel.save(update_fields=['status_publicacao', 'data_aprovacao', 'data_expiracao'])
+                        aprovados.append(imovel.id)
                     
                     else:
                         # Se a assinatura não estiver ativa, avisa o admin
@@ -77,11 +89,15 @@ class ImovelAdmin(admin.ModelAdmin):
                 except Exception as e:
                      self.message_user(request, f"Erro ao aprovar '{imovel.titulo}': {e}", level='ERROR')
 
+        notificar_ao_confirmar(aprovados)
+
 
     # Ação 'marcar_como_destaque' (Sem mudanças)
     @admin.action(description="Marcar como destaque os anúncios selecionados")
     def marcar_como_destaque(self, request, queryset):
-        queryset.update(destaque=True)
+        queryset.update(destaque=True, atualizado_em=timezone.now())
+        # update() não dispara sinais: invalida o cache da vitrine manualmente
+        incrementar_versao_catalogo()
 
 # --- Classe Admin para BAIRROS (Sem mudanças) ---
 @admin.register(Bairro)
@@ -187,7 +203,7 @@ class CidadeAdmin(admin.ModelAdmin):
 # Registra 'Foto' (boa prática, mas não obrigatório para o bug)
 @admin.register(Foto)
 class FotoAdmin(admin.ModelAdmin):
-    list_display = ('imovel', 'imagem')
+    list_display = ('imovel', 'imagem', 'pronta')
     search_fields = ('imovel__titulo',)
     autocomplete_fields = ['imovel']
 # --- [FIM DA CORREÇÃO] ---
@@ -209,4 +225,23 @@ class ParceiroAdmin(admin.ModelAdmin):
 
 # ✅ 4. Registre os novos modelos
 admin.site.register(NichoParceiro)
-admin.site.register(Parceiro, ParceiroAdmin)
\ No newline at end of file
+admin.site.register(Parceiro, ParceiroAdmin)
+
+
+# --- Buscas salvas (os critérios são montados pela vitrine; aqui é só consulta) ---
+@admin.register(BuscaSalva)
+class BuscaSalvaAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'usuario', 'cidade', 'finalidade', 'ativa', 'criada_em')
+    list_filter = ('ativa', 'finalidade')
+    search_fields = ('nome', 'usuario__username')
+    readonly_fields = ('criterios',)
+
+
+# --- Fila de fotos (contas/fila_fotos.py; quem mexe é o worker processar_fotos) ---
+@admin.register(ProcessamentoFoto)
+class ProcessamentoFotoAdmin(admin.ModelAdmin):
+    list_display = ('imovel', 'destino', 'nome_original', 'status', 'tentativas', 'proxima_tentativa', 'criado_em')
+    list_filter = ('status', 'destino')
+    search_fields = ('imovel__titulo', 'nome_original', 'nome')
+    raw_id_fields = ('imovel', 'foto')
+    readonly_fields = ('erro',)
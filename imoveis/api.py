@@ -0,0 +1,237 @@
+# imoveis/api.py
+"""
+API JSON da busca pública: GET /api/imoveis/ (e os grupos do mapa: GET /api/mapa/;
+o autocompletar de cidade/bairro: GET /api/autocompletar/)
+
+Aceita os mesmos filtros de lista_imoveis (imoveis/filtros.py) e mais:
+
+* `fields=id,titulo,preco` -> escolhe os campos devolvidos (ver CAMPOS_API);
+* `limite=N` -> itens por página (padrão 20, máximo 100);
+* `ordem=menor_preco|maior_preco|maior_area|menor_preco_m2` -> ver imoveis/ordenacao.py;
+* `caixa=sul,oeste,norte,leste` ou `lat=..&lng=..&raio=km` -> busca por área (imoveis/geo.py);
+* `cursor=<token>` -> próxima/anterior página (valores de next_cursor/prev_cursor).
+
+Cada linha sai de um .values() com só as colunas pedidas (sem montar
+instâncias do Imovel). A resposta leva um ETag forte derivado da versão do
+catálogo (imoveis/catalogo.py): enquanto nenhum imóvel mudar, o cliente que
+mandar If-None-Match recebe 304 sem nenhuma consulta de imóveis.
+"""
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele usamos o json da biblioteca padrão
+    orjson = None
+
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+
+from . import autocompletar
+from .busca import fonte_da_busca
+from .catalogo import versao_catalogo, versao_referencia
+from .filtros import PARAMETROS_NAVEGACAO, chave_filtros
+from .geo import ler_area
+from .mapa import ZOOM_MAXIMO, ZOOM_MINIMO, grupos_do_mapa
+from .models import Imovel
+from .ordenacao import ordenacao_do_get
+from .paginacao import paginar_por_cursor
+
+# Nome público do campo -> coluna usada no .values()
+CAMPOS_API = {
+    'id': 'id',
+    'titulo': 'titulo',
+    'finalidade': 'finalidade',
+    'destaque': 'destaque',
+    'preco': 'preco',
+    'quartos': 'quartos',
+    'suites': 'suites',
+    'banheiros': 'banheiros',
+    'salas': 'salas',
+    'cozinhas': 'cozinhas',
+    'closets': 'closets',
+    'area': 'area',
+    'preco_m2': 'preco_m2',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'localizacao_aproximada': 'localizacao_aproximada',
+    'cidade_id': 'cidade_id',
+    'cidade': 'cidade__nome',
+    'bairro_id': 'bairro_id',
+    'bairro': 'bairro__nome',
+    'imobiliaria_id': 'imobiliaria_id',
+    'imobiliaria': 'imobiliaria__nome',
+    'foto_principal': 'foto_principal',
+    'data_cadastro': 'data_cadastro',
+    'url': None,  # calculado (link da página de detalhe)
+}
+
+CAMPOS_PADRAO = (
+    'id', 'titulo', 'finalidade', 'destaque', 'preco', 'quartos', 'banheiros',
+    'area', 'cidade', 'bairro', 'foto_principal', 'url',
+)
+
+# Colunas sempre lidas: a paginação por cursor precisa delas (mais a coluna da ordenação)
+COLUNAS_CURSOR = ('id', 'destaque')
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+CACHE_CONTROL = 'public, max-age=60'
+
+
+def _json_padrao(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def dumps(dados):
+    """JSON em bytes (orjson quando instalado, que é várias vezes mais rápido)."""
+    if orjson is not None:
+        return orjson.dumps(dados, default=_json_padrao)
+    return json.dumps(dados, default=_json_padrao, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _ler_campos(params):
+    """Lista de campos pedidos em `fields=` (ou os padrão). Levanta ValueError com os desconhecidos."""
+    bruto = params.get('fields', '')
+    if not bruto:
+        return list(CAMPOS_PADRAO)
+    campos = list(dict.fromkeys(c.strip() for c in bruto.split(',') if c.strip()))
+    desconhecidos = [c for c in campos if c not in CAMPOS_API]
+    if desconhecidos or not campos:
+        raise ValueError(', '.join(desconhecidos))
+    return campos
+
+
+def _ler_limite(params):
+    limite = params.get('limite', '')
+    if limite.isdigit() and int(limite) > 0:
+        return min(int(limite), LIMITE_MAXIMO)
+    return LIMITE_PADRAO
+
+
+def _etag(params):
+    # Mesmas versões + mesmos filtros + mesma navegação = mesma resposta (parâmetros que a API
+    # não lê, como utm_*, ficam de fora). A de referência porque a resposta traz os nomes de
+    # cidade/bairro/imobiliária (renomear não muda o imóvel)
+    navegacao = '&'.join(f"{chave}={params.get(chave, '')}" for chave in PARAMETROS_NAVEGACAO)
+    bruto = f"{versao_catalogo()}|{versao_referencia()}|{chave_filtros(params)}|{navegacao}"
+    return '"' + hashlib.md5(bruto.encode('utf-8')).hexdigest() + '"'
+
+
+@require_GET
+def api_imoveis(request):
+    try:
+        campos = _ler_campos(request.GET)
+    except ValueError as erro:
+        return JsonResponse(
+            {'erro': f"Campo(s) inválido(s) em 'fields': {erro}", 'campos_validos': list(CAMPOS_API)},
+            status=400,
+        )
+
+    etag = _etag(request.GET)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        resposta = HttpResponseNotModified()
+        resposta['ETag'] = etag
+        resposta['Cache-Control'] = CACHE_CONTROL
+        return resposta
+
+    agora = timezone.now()
+    ordenacao = ordenacao_do_get(request.GET)
+    colunas = list(dict.fromkeys(
+        list(COLUNAS_CURSOR) + [ordenacao.campo] + [CAMPOS_API[c] for c in campos if CAMPOS_API[c]]
+    ))
+    vitrine_ativa = Imovel.objects.filter(
+        status_publicacao='ATIVO',
+        data_expiracao__gt=agora,
+    ).values(*colunas)
+
+    fonte = fonte_da_busca(vitrine_ativa, request.GET, agora, ordenacao)
+    pagina = paginar_por_cursor(
+        vitrine_ativa, request.GET, por_pagina=_ler_limite(request.GET), fonte=fonte, ordenacao=ordenacao,
+    )
+
+    storage_fotos = Imovel._meta.get_field('foto_principal').storage
+    resultados = []
+    for linha in pagina.object_list:
+        item = {}
+        for campo in campos:
+            if campo == 'url':
+                item['url'] = reverse('detalhe_imovel', args=[linha['id']])
+            elif campo == 'foto_principal':
+                nome = linha['foto_principal']
+                item['foto_principal'] = storage_fotos.url(nome) if nome else None
+            else:
+                item[campo] = linha[CAMPOS_API[campo]]
+        resultados.append(item)
+
+    dados = {
+        'total': pagina.total,
+        'next_cursor': pagina.next_cursor,
+        'prev_cursor': pagina.prev_cursor,
+        'resultados': resultados,
+    }
+    resposta = HttpResponse(dumps(dados), content_type='application/json')
+    resposta['ETag'] = etag
+    resposta['Cache-Control'] = CACHE_CONTROL
+    return resposta
+
+
+@require_GET
+def api_mapa(request):
+    """
+    Grupos de imóveis para o mapa: `caixa=sul,oeste,norte,leste` (obrigatório),
+    `zoom=N` e os mesmos filtros da vitrine. Mesmo ETag/304 da api_imoveis.
+    """
+    area = ler_area(request.GET)
+    if area is None or area.centro is not None:
+        return JsonResponse({'erro': "Informe a área visível em 'caixa=sul,oeste,norte,leste'."}, status=400)
+    zoom = request.GET.get('zoom', '')
+    zoom = min(max(int(zoom), ZOOM_MINIMO), ZOOM_MAXIMO) if zoom.isdigit() else 12
+
+    etag = _etag(request.GET)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        resposta = HttpResponseNotModified()
+        resposta['ETag'] = etag
+        resposta['Cache-Control'] = CACHE_CONTROL
+        return resposta
+
+    vitrine_ativa = Imovel.objects.filter(status_publicacao='ATIVO', data_expiracao__gt=timezone.now())
+    try:
+        grupos = grupos_do_mapa(vitrine_ativa, request.GET, area, zoom)
+    except ValueError as erro:
+        return JsonResponse({'erro': str(erro)}, status=400)
+
+    resposta = HttpResponse(dumps({'zoom': zoom, 'grupos': grupos}), content_type='application/json')
+    resposta['ETag'] = etag
+    resposta['Cache-Control'] = CACHE_CONTROL
+    return resposta
+
+
+@require_GET
+def api_autocompletar(request):
+    """
+    Cidades e bairros cujo nome começa com `q` (sem acento: "agua" acha "Água Clara").
+    Opcionais: `tipo=cidade|bairro`, `cidade=<id>` (só bairros dela) e `limite=N`.
+    Sai do índice em memória de imoveis/autocompletar.py, sem consultar o banco.
+    """
+    params = request.GET
+    tipo = params.get('tipo') if params.get('tipo') in ('cidade', 'bairro') else None
+    cidade = params.get('cidade', '')
+    limite = params.get('limite', '')
+    limite = min(int(limite), autocompletar.LIMITE_MAXIMO) if limite.isdigit() and int(limite) > 0 else autocompletar.LIMITE_PADRAO
+
+    resultados = autocompletar.obter_indice().buscar(
+        params.get('q', ''), limite=limite, tipo=tipo, cidade_id=int(cidade) if cidade.isdigit() else None,
+    )
+    resposta = HttpResponse(dumps({'resultados': resultados}), content_type='application/json')
+    resposta['Cache-Control'] = CACHE_CONTROL
+    return resposta
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _garantir_indice_texto(sender, using, **kwargs):
+    from django.db import connections
+    from .busca_texto import garantir_indice_texto
+    garantir_indice_texto(connections[using])
 
 
 class ImoveisConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'imoveis'
+
+    def ready(self):
+        # Registra os receivers de post_save/post_delete
+        from . import signals  # noqa: F401
+
+        # O SQLite recria a tabela em várias migrações e perde os triggers do FTS5
+        post_migrate.connect(_garantir_indice_texto, sender=self)
@@ -0,0 +1,106 @@
+# imoveis/autocompletar.py
+"""
+Autocompletar de cidade/bairro do formulário de busca: GET /api/autocompletar/?q=agu
+
+Cada worker guarda um índice em memória (lista ordenada de chaves sem
+acento + bisect) montado a partir de Cidade e Bairro. Cada nome entra uma
+vez por palavra, então "clara" também acha "Água Clara". Uma busca é um
+bisect_left até a primeira chave >= prefixo e uma varredura enquanto a
+chave começar com ele: nenhuma consulta ao banco por tecla digitada.
+
+O índice vale para uma versão de referência (imoveis/catalogo.py): quando
+uma Cidade ou um Bairro é gravado, a versão muda (imoveis/signals.py) e o
+próximo pedido em cada worker reconstrói o índice (duas consultas).
+"""
+import bisect
+import re
+import threading
+
+from .busca_texto import normalizar_texto
+from .catalogo import versao_referencia
+
+LIMITE_PADRAO = 8
+LIMITE_MAXIMO = 20
+TAMANHO_MINIMO = 2
+# Quantas chaves, no máximo, uma busca varre antes de ordenar (prefixos muito curtos)
+VARREDURA_MAXIMA = 200
+
+
+class IndiceNomes:
+    """Chaves normalizadas ordenadas, cada uma apontando para uma entrada (cidade ou bairro)."""
+
+    def __init__(self, cidades, bairros):
+        """`cidades`: (id, nome, estado); `bairros`: (id, nome, cidade_id, nome da cidade)."""
+        self.entradas = []
+        for cidade_id, nome, estado in cidades:
+            self.entradas.append({
+                'tipo': 'cidade', 'id': cidade_id, 'nome': nome,
+                'rotulo': f"{nome}, {estado}", 'cidade_id': cidade_id,
+            })
+        for bairro_id, nome, cidade_id, nome_cidade in bairros:
+            self.entradas.append({
+                'tipo': 'bairro', 'id': bairro_id, 'nome': nome,
+                'rotulo': f"{nome} ({nome_cidade})", 'cidade_id': cidade_id,
+            })
+
+        self.nomes = []  # nome normalizado de cada entrada (desempate e "começo do nome")
+        pares = []
+        for posicao, entrada in enumerate(self.entradas):
+            palavras = re.findall(r'[a-z0-9]+', normalizar_texto(entrada['nome']))
+            self.nomes.append(' '.join(palavras))
+            # "agua clara" e "clara": o nome a partir de cada palavra
+            for inicio in range(len(palavras)):
+                pares.append((' '.join(palavras[inicio:]), posicao))
+        pares.sort()
+        self.chaves = [chave for chave, _ in pares]
+        self.posicoes = [posicao for _, posicao in pares]
+
+    def buscar(self, texto, limite=LIMITE_PADRAO, tipo=None, cidade_id=None):
+        prefixo = ' '.join(re.findall(r'[a-z0-9]+', normalizar_texto(texto)))
+        if len(prefixo) < TAMANHO_MINIMO:
+            return []
+
+        achados = {}
+        i = bisect.bisect_left(self.chaves, prefixo)
+        while i < len(self.chaves) and len(achados) < VARREDURA_MAXIMA and self.chaves[i].startswith(prefixo):
+            posicao = self.posicoes[i]
+            entrada = self.entradas[posicao]
+            if (tipo is None or entrada['tipo'] == tipo) and (cidade_id is None or entrada['cidade_id'] == cidade_id):
+                # Começo do nome vale mais que começo de outra palavra
+                no_inicio = self.nomes[posicao].startswith(prefixo)
+                achados[posicao] = min(achados.get(posicao, 1), 0 if no_inicio else 1)
+            i += 1
+
+        # Cidades antes de bairros; depois começo do nome; depois ordem alfabética
+        ordem = sorted(
+            achados,
+            key=lambda p: (self.entradas[p]['tipo'] != 'cidade', achados[p], self.nomes[p]),
+        )
+        return [self.entradas[posicao] for posicao in ordem[:limite]]
+
+
+def construir_indice():
+    from .models import Bairro, Cidade
+
+    return IndiceNomes(
+        Cidade.objects.values_list('id', 'nome', 'estado'),
+        Bairro.objects.values_list('id', 'nome', 'cidade_id', 'cidade__nome'),
+    )
+
+
+_indice = None
+_versao = None
+_indice_lock = threading.Lock()
+
+
+def obter_indice():
+    """O índice deste worker, reconstruído só quando a versão de referência muda."""
+    global _indice, _versao
+    versao = versao_referencia()
+    if _indice is not None and _versao == versao:
+        return _indice
+    with _indice_lock:
+        if _indice is None or _versao != versao:
+            _indice = construir_indice()
+            _versao = versao
+    return _indice
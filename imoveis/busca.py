@@ -0,0 +1,65 @@
+# imoveis/busca.py
+"""
+Monta a "fonte" de resultados da busca pública a partir dos filtros do GET.
+
+Usada pela vitrine HTML (lista_imoveis) e pela API JSON (imoveis/api.py), que
+assim compartilham o mesmo cache de resultados (imoveis/catalogo.py):
+
+* `?q=` (sem `ordem`) -> ids ranqueados pelo índice de texto (imoveis/busca_texto.py);
+* ordem padrão -> índice NumPy em memória, se ligado (imoveis/vitrine.py),
+  ou o banco com paginação por cursor (imoveis/paginacao.py);
+* `?ordem=` (preço, área, preço/m²) -> sempre o banco, pelo índice de cada
+  ordenação (imoveis/ordenacao.py).
+"""
+from .busca_texto import ids_por_relevancia, termos_busca
+from .catalogo import resultado_em_cache, LIMITE_IDS
+from .filtros import aplicar_filtros
+from .ordenacao import ORDENACAO_PADRAO, ORDENACOES
+from .paginacao import FonteIds, FonteQueryset
+from .vitrine import obter_indice_vitrine
+
+
+def fonte_da_busca(vitrine_ativa, params, agora, ordenacao=ORDENACAO_PADRAO):
+    """
+    Devolve uma fonte (total/fatia/ultimos/depois/antes) para `paginar_por_cursor`.
+
+    `vitrine_ativa` é o queryset ATIVO/não expirado SEM os filtros do GET; ele
+    também define o que é carregado em cada página (instâncias ou .values()).
+    """
+    busca = (params.get('q') or '').strip()
+    # Com uma ordem escolhida, a palavra-chave só filtra (ver aplicar_filtros)
+    tem_busca = bool(termos_busca(busca)) and params.get('ordem') not in ORDENACOES
+    filtrados = aplicar_filtros(vitrine_ativa, params)
+    # O índice NumPy só conhece a ordem padrão e não filtra por palavra-chave
+    usar_vitrine = ordenacao is ORDENACAO_PADRAO and not termos_busca(busca)
+
+    def indice_vitrine():
+        return obter_indice_vitrine() if usar_vitrine else None
+
+    def fonte_sem_cache():
+        indice = indice_vitrine()
+        if indice is not None:
+            return indice.buscar(params, agora, vitrine_ativa)
+        return FonteQueryset(filtrados, params, ordenacao)
+
+    def calcular_resultado():
+        if tem_busca:
+            # Busca por palavra-chave: ordena por relevância (índice de texto) em vez da data
+            sem_texto = aplicar_filtros(vitrine_ativa, params, ignorar=('q',))
+            ids = ids_por_relevancia(sem_texto, busca)
+            return {'ids': ids, 'total': len(ids)}
+        indice = indice_vitrine()
+        if indice is not None:
+            resultado = indice.buscar(params, agora, vitrine_ativa)
+            return {'ids': [int(pk) for pk in resultado.ids[:LIMITE_IDS]], 'total': resultado.total()}
+        ordenados = filtrados.order_by(*ordenacao.order_by())
+        ids = list(ordenados.values_list('id', flat=True)[:LIMITE_IDS])
+        total = len(ids) if len(ids) < LIMITE_IDS else ordenados.count()
+        return {'ids': ids, 'total': total}
+
+    resultado = resultado_em_cache(params, calcular_resultado)
+    return FonteIds(
+        resultado['ids'], vitrine_ativa, total=resultado['total'],
+        # Páginas além dos ids guardados (busca textual já vem completa)
+        reserva=None if tem_busca else fonte_sem_cache,
+    )
@@ -0,0 +1,175 @@
+# imoveis/busca_texto.py
+"""
+Busca por palavra-chave (parâmetro `q` da vitrine).
+
+Cada imóvel guarda um "documento de busca" (Imovel.documento_busca): título,
+descrição, endereço, bairro e cidade, tudo em minúsculas e sem acentos.
+Sobre essa coluna existe um índice de texto de verdade:
+
+* PostgreSQL: coluna gerada `busca_vetor` (tsvector) + índice GIN.
+* SQLite (desenvolvimento): tabela virtual FTS5 `imoveis_imovel_fts`,
+  sincronizada por triggers.
+
+As duas estruturas são criadas pela migração 0025 e conferidas de novo a
+cada `migrate` (ver garantir_indice_texto): no SQLite o Django recria a
+tabela em várias alterações de schema e os triggers se perdem.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+
+TABELA_IMOVEL = 'imoveis_imovel'
+TABELA_FTS = 'imoveis_imovel_fts'
+CONFIG_PG = 'portuguese'
+
+# Busca ranqueada: quantos ids (no máximo) entram na lista paginada
+LIMITE_RESULTADOS = 1000
+MAXIMO_TERMOS = 8
+
+
+def normalizar_texto(texto):
+    """'Água Clara' -> 'agua clara' (minúsculas, sem acentos)."""
+    if not texto:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acento = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return sem_acento.lower()
+
+
+def montar_documento_busca(imovel):
+    """Texto indexado de um imóvel (chamado por Imovel.save)."""
+    partes = [
+        imovel.titulo,
+        imovel.descricao,
+        imovel.endereco,
+        imovel.bairro.nome if imovel.bairro_id else None,
+        imovel.cidade.nome if imovel.cidade_id else None,
+    ]
+    return normalizar_texto(' '.join(p for p in partes if p))
+
+
+def termos_busca(q):
+    """Quebra a busca em termos alfanuméricos (também impede injeção de sintaxe FTS/tsquery)."""
+    return re.findall(r'[a-z0-9]+', normalizar_texto(q))[:MAXIMO_TERMOS]
+
+
+def _consulta_fts(termos):
+    # "termo"* = prefixo; termos separados por espaço = AND
+    return ' '.join(f'"{termo}"*' for termo in termos)
+
+
+def _consulta_tsquery(termos):
+    return ' & '.join(f'{termo}:*' for termo in termos)
+
+
+def filtrar_texto(queryset, q):
+    """Restringe o queryset aos imóveis que casam com `q` (sem ordenar)."""
+    termos = termos_busca(q)
+    if not termos:
+        return queryset
+    if connection.vendor == 'postgresql':
+        return queryset.extra(
+            where=[f'"{TABELA_IMOVEL}"."busca_vetor" @@ to_tsquery(%s, %s)'],
+            params=[CONFIG_PG, _consulta_tsquery(termos)],
+        )
+    if connection.vendor == 'sqlite':
+        from django.db.models.expressions import RawSQL
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s',
+            [_consulta_fts(termos)],
+        ))
+    # Outros bancos: LIKE simples sobre o documento já normalizado
+    for termo in termos:
+        queryset = queryset.filter(documento_busca__contains=termo)
+    return queryset
+
+
+def ordenar_por_relevancia(queryset, q):
+    """
+    Filtra por `q` e ordena pela relevância do índice de texto
+    (ts_rank no PostgreSQL, bm25 no SQLite), desempatando pela ordem da vitrine.
+    """
+    termos = termos_busca(q)
+    if not termos:
+        return queryset
+    ordem = ('-relevancia', '-destaque', '-data_cadastro', '-id')
+
+    if connection.vendor == 'postgresql':
+        tsquery = _consulta_tsquery(termos)
+        return queryset.extra(
+            select={'relevancia': f'ts_rank("{TABELA_IMOVEL}"."busca_vetor", to_tsquery(%s, %s))'},
+            select_params=[CONFIG_PG, tsquery],
+            where=[f'"{TABELA_IMOVEL}"."busca_vetor" @@ to_tsquery(%s, %s)'],
+            params=[CONFIG_PG, tsquery],
+        ).order_by(*ordem)
+    if connection.vendor == 'sqlite':
+        # JOIN com a tabela FTS; 'rank' é o bm25 (quanto menor, melhor)
+        return queryset.extra(
+            tables=[TABELA_FTS],
+            select={'relevancia': f'-{TABELA_FTS}.rank'},
+            where=[f'{TABELA_FTS}.rowid = "{TABELA_IMOVEL}"."id"', f'{TABELA_FTS} MATCH %s'],
+            params=[_consulta_fts(termos)],
+        ).order_by(*ordem)
+    return filtrar_texto(queryset, q).order_by('-destaque', '-data_cadastro', '-id')
+
+
+def ids_por_relevancia(queryset, q, limite=LIMITE_RESULTADOS):
+    """Lista ordenada dos ids mais relevantes (usada pela paginação da busca)."""
+    return list(ordenar_por_relevancia(queryset, q).values_list('id', flat=True)[:limite])
+
+
+# --- Estruturas do índice (chamado pela migração e pelo post_migrate) ---
+SQL_SQLITE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5(
+        documento_busca, content='{TABELA_IMOVEL}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON {TABELA_IMOVEL} BEGIN
+        INSERT INTO {TABELA_FTS}(rowid, documento_busca) VALUES (new.id, new.documento_busca);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON {TABELA_IMOVEL} BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, documento_busca) VALUES ('delete', old.id, old.documento_busca);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE OF documento_busca ON {TABELA_IMOVEL} BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, documento_busca) VALUES ('delete', old.id, old.documento_busca);
+        INSERT INTO {TABELA_FTS}(rowid, documento_busca) VALUES (new.id, new.documento_busca);
+    END""",
+]
+
+SQL_POSTGRES = [
+    f"""ALTER TABLE {TABELA_IMOVEL} ADD COLUMN IF NOT EXISTS busca_vetor tsvector
+        GENERATED ALWAYS AS (to_tsvector('{CONFIG_PG}'::regconfig, coalesce(documento_busca, ''))) STORED""",
+    f"CREATE INDEX IF NOT EXISTS imovel_busca_gin_idx ON {TABELA_IMOVEL} USING GIN (busca_vetor)",
+]
+
+
+def garantir_indice_texto(conexao=None):
+    """Cria (se faltar) o índice de texto. No SQLite, reconstrói o FTS quando os triggers tinham sumido."""
+    conexao = conexao or connection
+    with conexao.cursor() as cursor:
+        if conexao.vendor == 'postgresql':
+            for sql in SQL_POSTGRES:
+                cursor.execute(sql)
+        elif conexao.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                [f'{TABELA_FTS}_%'],
+            )
+            faltavam_triggers = cursor.fetchone()[0] < 3
+            for sql in SQL_SQLITE:
+                cursor.execute(sql)
+            if faltavam_triggers:
+                cursor.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')")
+
+
+def remover_indice_texto(conexao=None):
+    conexao = conexao or connection
+    with conexao.cursor() as cursor:
+        if conexao.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS imovel_busca_gin_idx")
+            cursor.execute(f"ALTER TABLE {TABELA_IMOVEL} DROP COLUMN IF EXISTS busca_vetor")
+        elif conexao.vendor == 'sqlite':
+            for sufixo in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {TABELA_FTS}_{sufixo}")
+            cursor.execute(f"DROP TABLE IF EXISTS {TABELA_FTS}")
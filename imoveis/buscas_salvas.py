@@ -0,0 +1,228 @@
+# imoveis/buscas_salvas.py
+"""
+Buscas salvas: o usuário guarda os filtros de lista_imoveis (BuscaSalva) e
+é avisado (NotificacaoBusca) quando um imóvel aprovado casa com eles.
+
+Rodar cada busca salva como uma consulta a cada aprovação não escala (50 mil
+buscas = 50 mil consultas por lote). Em vez disso, os imóveis aprovados são
+casados EM LOTE (notificar_novos_imoveis), com um índice invertido em memória:
+
+1. Uma consulta traz as buscas candidatas: ativas e com a cidade de algum
+   imóvel do lote ou sem cidade (índice busca_salva_ativa_cidade_idx).
+2. As buscas são agrupadas pela chave (cidade, finalidade, bairro), com None
+   onde o filtro não foi usado. Para um imóvel só 8 chaves podem casar: cada
+   posição com o valor do imóvel ou com None.
+3. As buscas dessas chaves passam pelas comparações de faixa (quartos >=,
+   preço <=, ...), imobiliária, área e palavra-chave, compiladas uma vez por busca.
+4. Os pares (busca, imóvel) entram em NotificacaoBusca num bulk_create só.
+
+A palavra-chave casa por prefixo de termo, como o FTS5 (imoveis/busca_texto.py);
+no PostgreSQL a vitrine usa stemming, então pode haver pequenas diferenças.
+"""
+import itertools
+import operator
+import re
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .busca_texto import termos_busca
+from .filtros import FILTROS_EXATOS, FILTROS_FAIXA
+from .geo import PARAMETROS_AREA, ler_area
+from .models import Bairro, BuscaSalva, Cidade, Imobiliaria, Imovel, NotificacaoBusca
+
+# Chaves do índice invertido, na ordem da tupla
+CAMPOS_INDICE = ('cidade', 'finalidade', 'bairro')
+LIMITE_BUSCAS_POR_USUARIO = 20
+LOTE_NOTIFICACOES = 1000
+
+# 'quartos__gte' -> ('quartos', >=); 'imobiliaria__id' -> 'imobiliaria_id'
+OPERADORES = {'gte': operator.ge, 'lte': operator.le}
+FAIXAS = tuple(
+    (parametro, lookup.split('__')[0], OPERADORES[lookup.split('__')[1]])
+    for parametro, lookup in FILTROS_FAIXA.items()
+)
+EXATOS_FORA_DO_INDICE = tuple(
+    (parametro, lookup.replace('__', '_'))
+    for parametro, lookup in FILTROS_EXATOS.items() if parametro not in CAMPOS_INDICE
+)
+
+CAMPOS_IMOVEL = (
+    'id', 'proprietario_id', 'cidade_id', 'bairro_id', 'imobiliaria_id', 'finalidade',
+    'latitude', 'longitude', 'documento_busca',
+    *(campo for _, campo, _ in FAIXAS),
+)
+
+ROTULOS_FAIXA = {
+    'quartos': '{} quarto(s) ou mais',
+    'suites': '{} suíte(s) ou mais',
+    'banheiros': '{} banheiro(s) ou mais',
+    'salas': '{} sala(s) ou mais',
+    'cozinhas': '{} cozinha(s) ou mais',
+    'closets': '{} closet(s) ou mais',
+    'area': 'a partir de {} m²',
+    'preco_max': 'até R$ {}',
+}
+
+
+# --- Critérios (o que fica guardado em BuscaSalva.criterios) ---
+def criterios_do_get(params):
+    """Só os filtros válidos do GET (as mesmas regras de filtros.aplicar_filtros), como strings."""
+    criterios = {}
+    q = (params.get('q') or '').strip()
+    if termos_busca(q):
+        criterios['q'] = q
+    finalidade = params.get('finalidade')
+    if finalidade in Imovel.Finalidade.values:
+        criterios['finalidade'] = finalidade
+    for parametro in list(FILTROS_EXATOS) + list(FILTROS_FAIXA):
+        valor = params.get(parametro)
+        if valor and valor.isdigit():
+            criterios[parametro] = valor
+    if ler_area(params) is not None:
+        criterios.update({p: params[p] for p in PARAMETROS_AREA if params.get(p)})
+    return criterios
+
+
+def descrever(criterios):
+    """Nome padrão de uma busca: 'Venda · Campo Grande · 3 quarto(s) ou mais · até R$ 500.000'."""
+    partes = []
+    if criterios.get('finalidade'):
+        partes.append(Imovel.Finalidade(criterios['finalidade']).label)
+    for parametro, modelo in (('bairro', Bairro), ('cidade', Cidade), ('imobiliaria', Imobiliaria)):
+        if criterios.get(parametro):
+            nome = modelo.objects.filter(pk=criterios[parametro]).values_list('nome', flat=True).first()
+            if nome:
+                partes.append(nome)
+    for parametro, rotulo in ROTULOS_FAIXA.items():
+        if criterios.get(parametro):
+            partes.append(rotulo.format(f"{int(criterios[parametro]):,}".replace(',', '.')))
+    if criterios.get('q'):
+        partes.append(f'"{criterios["q"]}"')
+    if criterios.get('caixa'):
+        partes.append('na área do mapa')
+    elif criterios.get('lat'):
+        partes.append('perto de um ponto')
+    return (' · '.join(partes) or 'Todos os imóveis')[:150]
+
+
+# --- Índice invertido ---
+class _Busca:
+    """Condições de uma busca salva fora da chave do índice, prontas para comparar com um imóvel."""
+    __slots__ = ('id', 'usuario_id', 'faixas', 'exatos', 'termos', 'area')
+
+    def __init__(self, busca_id, usuario_id, criterios):
+        self.id = busca_id
+        self.usuario_id = usuario_id
+        self.faixas = tuple(
+            (campo, comparar, int(criterios[parametro]))
+            for parametro, campo, comparar in FAIXAS if criterios.get(parametro)
+        )
+        self.exatos = tuple(
+            (campo, int(criterios[parametro]))
+            for parametro, campo in EXATOS_FORA_DO_INDICE if criterios.get(parametro)
+        )
+        self.termos = tuple(termos_busca(criterios.get('q')))
+        self.area = ler_area(criterios)
+
+    def casa(self, imovel):
+        for campo, comparar, limite in self.faixas:
+            valor = imovel[campo]
+            if valor is None or not comparar(valor, limite):
+                return False
+        for campo, valor in self.exatos:
+            if imovel[campo] != valor:
+                return False
+        if self.area is not None and not self.area.contem(imovel['latitude'], imovel['longitude']):
+            return False
+        if self.termos:
+            palavras = imovel['palavras']
+            if not all(any(palavra.startswith(termo) for palavra in palavras) for termo in self.termos):
+                return False
+        return True
+
+
+def _chave_indice(cidade, finalidade, bairro):
+    return (str(cidade) if cidade else None, finalidade or None, str(bairro) if bairro else None)
+
+
+class IndiceBuscas:
+    """Buscas salvas agrupadas por (cidade, finalidade, bairro); None = 'qualquer'."""
+
+    def __init__(self, linhas):
+        """`linhas`: iterável de (id, usuario_id, criterios)."""
+        self.grupos = defaultdict(list)
+        self.total = 0
+        for busca_id, usuario_id, criterios in linhas:
+            chave = _chave_indice(*(criterios.get(campo) for campo in CAMPOS_INDICE))
+            self.grupos[chave].append(_Busca(busca_id, usuario_id, criterios))
+            self.total += 1
+
+    def casar(self, imovel):
+        """Ids das buscas que casam com o imóvel (dict com CAMPOS_IMOVEL)."""
+        if 'palavras' not in imovel:
+            imovel['palavras'] = set(re.findall(r'[a-z0-9]+', imovel['documento_busca'] or ''))
+        valores = _chave_indice(imovel['cidade_id'], imovel['finalidade'], imovel['bairro_id'])
+        # Cada posição da chave: o valor do imóvel ou None (a busca não filtrou aquele campo)
+        opcoes = [(valor, None) if valor is not None else (None,) for valor in valores]
+        return [
+            busca.id
+            for chave in itertools.product(*opcoes)
+            for busca in self.grupos.get(chave, ())
+            if busca.usuario_id != imovel['proprietario_id'] and busca.casa(imovel)
+        ]
+
+
+def carregar_indice(imoveis):
+    """Índice só com as buscas que podem casar com algum dos `imoveis` (filtro por cidade no banco)."""
+    cidades = {imovel['cidade_id'] for imovel in imoveis if imovel['cidade_id']}
+    buscas = (
+        BuscaSalva.objects.filter(ativa=True)
+        .filter(Q(cidade__in=cidades) | Q(cidade=None))
+        .values_list('id', 'usuario_id', 'criterios')
+    )
+    return IndiceBuscas(buscas.iterator(chunk_size=5000))
+
+
+# --- Lote de notificações ---
+def notificar_novos_imoveis(imovel_ids):
+    """
+    Casa os imóveis aprovados com todas as buscas salvas e grava as notificações.
+    Pode ser repetido sem duplicar nada. Devolve quantos pares (busca, imóvel) casaram.
+    """
+    imoveis = list(
+        Imovel.objects.filter(
+            id__in=list(imovel_ids),
+            status_publicacao=Imovel.StatusPublicacao.ATIVO,
+            data_expiracao__gt=timezone.now(),
+        ).values(*CAMPOS_IMOVEL)
+    )
+    if not imoveis:
+        return 0
+
+    indice = carregar_indice(imoveis)
+    notificacoes = [
+        NotificacaoBusca(busca_id=busca_id, imovel_id=imovel['id'])
+        for imovel in imoveis
+        for busca_id in indice.casar(imovel)
+    ]
+    NotificacaoBusca.objects.bulk_create(notificacoes, batch_size=LOTE_NOTIFICACOES, ignore_conflicts=True)
+    return len(notificacoes)
+
+
+def notificar_ao_confirmar(imovel_ids):
+    """Agenda notificar_novos_imoveis para depois do commit: a aprovação não espera nem falha por causa dele."""
+    ids = list(imovel_ids)
+    if not ids:
+        return
+
+    def executar():
+        try:
+            total = notificar_novos_imoveis(ids)
+            print(f"Buscas salvas: {total} notificação(ões) para {len(ids)} imóvel(is) aprovado(s).")
+        except Exception as e:
+            print(f"Erro ao notificar as buscas salvas: {e}")
+
+    transaction.on_commit(executar)
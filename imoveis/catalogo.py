@@ -0,0 +1,176 @@
+# imoveis/catalogo.py
+"""
+Versões globais (catálogo e dados de referência) e cache da busca pública.
+
+A "versão do catálogo" é um número guardado no cache e incrementado sempre
+que um imóvel muda (sinais post_save/post_delete em imoveis/signals.py, a
+expiração em imoveis/expiracao.py e as ações em massa do admin). Ela entra na chave de tudo
+que é derivado da vitrine (resultado, total, facetas), então um incremento
+invalida tudo de uma vez, sem precisar saber quais chaves existem.
+
+A "versão de referência" faz o mesmo para Cidade/Imobiliária: as opções do
+formulário de busca (fragmentos {% cache %} de lista_imoveis.html) e a
+lista de cidades usada pelas facetas só são refeitas quando ela muda.
+
+O resultado de uma combinação de filtros (ids ordenados + total) fica em
+cache com proteção contra "estouro" (cache stampede): numa chave fria, só
+quem consegue a trava (cache.add) calcula; os outros esperam o valor
+aparecer.
+
+As versões precisam ser as mesmas para todos os processos (workers web,
+cron, processar_fotos) e o incremento precisa ser atômico. Com Redis
+(settings.CACHE_COMPARTILHADO) elas ficam no cache (INCR). Sem Redis ficam
+na tabela VersaoGlobal (UPDATE valor = valor + 1), e o cache é o
+LocMemCache de cada processo: os derivados ficam por worker, mas continuam
+amarrados à versão do banco, e a trava contra estouro só vale dentro do
+processo. Nunca o DatabaseCache, onde incr é ler e depois gravar (dois
+processos podem ler o mesmo valor e um incremento se perde).
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .filtros import chave_filtros
+
+logger = logging.getLogger(__name__)
+
+CHAVE_VERSAO = 'catalogo:versao'
+CHAVE_VERSAO_REFERENCIA = 'referencia:versao'
+REFERENCIA_CACHE_SEGUNDOS = 24 * 60 * 60
+
+RESULTADO_CACHE_SEGUNDOS = 600
+# Quantos ids (no máximo) são guardados por busca; páginas além disso vão ao banco
+LIMITE_IDS = 1000
+
+TRAVA_SEGUNDOS = 30
+ESPERA_MAXIMA_SEGUNDOS = 3.0
+INTERVALO_ESPERA_SEGUNDOS = 0.05
+
+
+def cache_compartilhado():
+    """True com Redis: só então versões, travas entre processos e o buffer de visitas vão para o cache."""
+    return getattr(settings, 'CACHE_COMPARTILHADO', False)
+
+
+def _versao_no_banco(chave):
+    from .models import VersaoGlobal
+
+    versao = VersaoGlobal.objects.filter(chave=chave).values_list('valor', flat=True).first()
+    if versao is None:
+        versao = VersaoGlobal.objects.get_or_create(chave=chave, defaults={'valor': int(time.time())})[0].valor
+    return versao
+
+
+def _incrementar_no_banco(chave):
+    from .models import VersaoGlobal
+
+    if not VersaoGlobal.objects.filter(chave=chave).update(valor=F('valor') + 1):
+        # Primeira vez: cria a linha e incrementa (o UPDATE é atômico, o get_or_create não)
+        _versao_no_banco(chave)
+        VersaoGlobal.objects.filter(chave=chave).update(valor=F('valor') + 1)
+    return _versao_no_banco(chave)
+
+
+def _versao(chave):
+    if not cache_compartilhado():
+        return _versao_no_banco(chave)
+    versao = cache.get(chave)
+    if versao is None:
+        # Começa pelo relógio: se o cache for esvaziado, as chaves antigas não voltam a valer
+        cache.add(chave, int(time.time()), None)
+        versao = cache.get(chave, 0)
+    return versao
+
+
+def _incrementar(chave):
+    if not cache_compartilhado():
+        return _incrementar_no_banco(chave)
+    try:
+        return cache.incr(chave)
+    except ValueError:
+        # A chave ainda não existia (ou foi despejada do cache)
+        _versao(chave)
+        return cache.incr(chave)
+
+
+def versao_catalogo():
+    """Versão atual do catálogo (criada na primeira leitura)."""
+    return _versao(CHAVE_VERSAO)
+
+
+def incrementar_versao_catalogo():
+    """Invalida todos os resultados/totais/facetas em cache da vitrine."""
+    return _incrementar(CHAVE_VERSAO)
+
+
+def versao_referencia():
+    """Versão atual das cidades/imobiliárias (opções do formulário de busca)."""
+    return _versao(CHAVE_VERSAO_REFERENCIA)
+
+
+def incrementar_versao_referencia():
+    return _incrementar(CHAVE_VERSAO_REFERENCIA)
+
+
+def chave_vitrine(prefixo, params, versao=None):
+    """
+    Chave de cache de um derivado da vitrine, amarrada à versão atual do catálogo
+    (ou a `versao`, para quem monta várias chaves com uma leitura só).
+    """
+    versao = versao_catalogo() if versao is None else versao
+    return f"{prefixo}:v{versao}:{chave_filtros(params)}"
+
+
+def em_cache_com_trava(chave, calcular, timeout):
+    """
+    cache.get(chave) ou, se faltar, calcular() UMA vez e guardar.
+
+    Enquanto um processo calcula, os outros esperam (até ESPERA_MAXIMA_SEGUNDOS)
+    pelo valor; se ele não aparecer, calculam por conta própria. Sem Redis a
+    trava (e o valor) é do processo: cada worker calcula a sua vez.
+    """
+    valor = cache.get(chave)
+    if valor is not None:
+        return valor
+
+    trava = f"{chave}:trava"
+    if cache.add(trava, 1, TRAVA_SEGUNDOS):
+        try:
+            valor = calcular()
+            cache.set(chave, valor, timeout)
+        finally:
+            cache.delete(trava)
+        return valor
+
+    limite = time.monotonic() + ESPERA_MAXIMA_SEGUNDOS
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA_SEGUNDOS)
+        valor = cache.get(chave)
+        if valor is not None:
+            return valor
+    logger.warning("Cache: trava de '%s' expirou sem resultado; calculando de novo.", chave)
+    return calcular()
+
+
+def cidades_em_cache():
+    """[{'id': ..., 'nome': ...}] de todas as cidades, refeita só quando a versão de referência muda."""
+    from .models import Cidade
+
+    return em_cache_com_trava(
+        f"referencia:cidades:v{versao_referencia()}",
+        lambda: list(Cidade.objects.values('id', 'nome')),
+        REFERENCIA_CACHE_SEGUNDOS,
+    )
+
+
+def resultado_em_cache(params, calcular):
+    """
+    Resultado da busca para os filtros do GET: {'ids': [...], 'total': n}.
+
+    `calcular()` devolve esse mesmo dicionário (com no máximo LIMITE_IDS ids).
+    """
+    chave = chave_vitrine('lista_imoveis:resultado', params)
+    return em_cache_com_trava(chave, calcular, RESULTADO_CACHE_SEGUNDOS)
@@ -0,0 +1,71 @@
+# imoveis/condicional.py
+"""
+GET condicional (ETag / Last-Modified -> 304) das páginas públicas.
+
+A ETag sai das versões globais de imoveis/catalogo.py: enquanto nenhum
+imóvel (versão do catálogo) nem cidade/bairro/imobiliária (versão de
+referência) muda, a mesma URL gera a mesma página. O cliente que já tem
+essa versão recebe um 304 antes de qualquer consulta da busca/render.
+
+Listagem e detalhe mudam com o usuário logado (menu, formulários com CSRF),
+então o usuário e o segredo CSRF do cookie entram na ETag e a resposta é
+`private, no-cache` (o navegador guarda, mas revalida sempre). O login gira
+o segredo: quem saiu e entrou de novo recebe a página com o token novo, e
+não um 304 com o token antigo (que daria 403 no salvar_busca). Com mensagens pendentes a página é sempre
+renderizada (senão o aviso se perderia num 304).
+
+O número de visualizações do detalhe não entra na ETag: quem revalida vê o
+número da última página completa que recebeu.
+"""
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .catalogo import versao_catalogo, versao_referencia
+
+
+def etag_pagina(request, *partes):
+    """ETag (com aspas) das partes + usuário + segredo CSRF; None se a página não pode virar 304."""
+    if len(get_messages(request)):
+        return None
+    usuario = request.user.pk if request.user.is_authenticated else 0
+    # CSRF_COOKIE: o segredo que o CsrfViewMiddleware leu do cookie (ausente na primeira visita)
+    csrf = request.META.get('CSRF_COOKIE', '')
+    texto = '|'.join(str(parte) for parte in (*partes, f'u{usuario}', csrf))
+    return quote_etag(hashlib.md5(texto.encode('utf-8')).hexdigest())
+
+
+def nao_modificado(request, etag, ultima_modificacao=None):
+    """Um 304 (com os mesmos cabeçalhos) se o cliente já tem esta versão; senão None."""
+    if etag is None or request.method not in ('GET', 'HEAD'):
+        return None
+    resposta = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(ultima_modificacao.timestamp()) if ultima_modificacao else None,
+    )
+    if resposta is not None:
+        marcar(resposta, etag, ultima_modificacao)
+    return resposta
+
+
+def marcar(resposta, etag, ultima_modificacao=None):
+    if etag is None:
+        return resposta
+    resposta['ETag'] = etag
+    if ultima_modificacao:
+        resposta['Last-Modified'] = http_date(ultima_modificacao.timestamp())
+    patch_cache_control(resposta, private=True, no_cache=True)
+    patch_vary_headers(resposta, ['Cookie'])
+    return resposta
+
+
+# --- Funções para @condition (respostas iguais para todos os usuários) ---
+def etag_sitemap(request, *args, **kwargs):
+    return f"sitemap-{versao_catalogo()}"
+
+
+def etag_bairros(request, *args, **kwargs):
+    return f"bairros-{versao_referencia()}-{request.GET.get('cidade_id', '')}"
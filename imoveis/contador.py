@@ -0,0 +1,383 @@
+# imoveis/contador.py
+"""
+Contador de visitantes únicos do detalhe, com buffer no cache (Redis) ou,
+sem Redis, gravado direto no banco.
+
+Quem é o visitante: um cookie `visitante` (token aleatório; nada de sessão,
+então navegar nunca grava uma linha em django_session). O token passa por
+um hash de 64 bits com a SECRET_KEY e entra em sketches HyperLogLog
+(imoveis/hll.py, 1 KB cada, ~3% de erro):
+
+    visitantes:<dia>:<imovel_id>  -> sketch dos visitantes do imóvel no dia (cache)
+    VisitantesImovel.registros    -> sketch de todos os visitantes (banco)
+
+Cada visita só mexe no cache. Se o sketch do dia mudou, o imóvel entra na
+lista do "balde" de INTERVALO_SEGUNDOS (add/incr), para a descarga saber
+quais sketches ler:
+
+    visitas:<balde>:<imovel_id>   -> marca: o imóvel já está na lista do balde
+    visitas:<balde>:n             -> quantos imóveis diferentes o balde tem
+    visitas:<balde>:vaga:<k>      -> id do k-ésimo imóvel (a "lista" do balde)
+
+`descarregar()` (comando `descarregar_visualizacoes` ou a thread opcional
+deste módulo) pega os imóveis dos baldes já fechados, mescla os sketches do
+dia no sketch do banco e grava a estimativa num UPDATE só por lote. O total
+do dia (ImovelVisualizacaoDiaria, imoveis/estatisticas.py) também sai da
+estimativa do sketch do dia, nunca de quantas vezes ele mudou (um visitante
+novo nem sempre muda um registrador: com milhares no dia, a maioria não muda):
+
+    UPDATE imoveis_imovel
+       SET visualizacoes = CASE id WHEN 1 THEN 130 WHEN 7 THEN 12 ... ELSE visualizacoes END
+     WHERE id IN (1, 7, ...)
+
+Mesclar é idempotente (máximo de cada registrador), então o sketch do dia
+não precisa ser apagado. O número exibido é o gravado + os pendentes
+(visualizacoes_pendentes: estimativa do sketch de hoje/ontem menos o que a
+última descarga gravou desse dia, `visitantes:<dia>:<imovel_id>:gravados`),
+que pode contar a mais quem voltou em outro dia até a próxima descarga.
+
+O sketch do dia é lido e regravado sem trava (a API de cache não tem um
+"máximo por registrador" atômico): se dois visitantes novos do mesmo imóvel
+chegam entre o get e o set um do outro, a mudança de registrador do
+primeiro se perde e ele não é contado. A perda fica nas visitas simultâneas
+ao mesmo imóvel, e aceitamos a subestima.
+
+O buffer só existe com Redis (settings.CACHE_COMPARTILHADO): add e incr
+atômicos, nada descartado por estar cheio, e o comando enxerga o mesmo
+buffer de qualquer processo (rode-o num cron). Sem Redis não há buffer: um
+visitante novo é gravado direto no banco (_registrar_no_banco, com trava de
+linha), e quem já foi visto hoje custa só uma leitura.
+
+As gravações no banco vão numa transação só, e a marca do último balde
+descarregado só depois do commit: se algo falhar no meio, a próxima
+descarga refaz os mesmos baldes. Refazer não soma nada duas vezes (mesclar
+sketches é idempotente).
+"""
+import hashlib
+import re
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .catalogo import cache_compartilhado
+from .estatisticas import dia_do_texto, gravar_diarias
+from .hll import HyperLogLog, hash64
+
+INTERVALO_SEGUNDOS = 60
+# Baldes não descarregados depois disso expiram (o pendente se perde)
+VALIDADE_SEGUNDOS = 24 * 60 * 60
+DIA_EM_BALDES = 24 * 60 * 60 // INTERVALO_SEGUNDOS
+LOTE_UPDATE = 500
+
+# O sketch do dia precisa sobreviver até a descarga do último balde do dia
+VALIDADE_SKETCH_SEGUNDOS = 2 * VALIDADE_SEGUNDOS
+
+COOKIE_VISITANTE = 'visitante'
+COOKIE_VALIDADE_SEGUNDOS = 365 * 24 * 60 * 60
+_TOKEN_VALIDO = re.compile(r'^[0-9a-f]{32}$')
+
+CHAVE_DESCARREGADO = 'visitas:descarregado'
+CHAVE_TRAVA = 'visitas:trava'
+TRAVA_SEGUNDOS = 300
+
+
+def _balde(agora=None):
+    return int((time.time() if agora is None else agora) // INTERVALO_SEGUNDOS)
+
+
+def _chave(balde, imovel_id):
+    return f'visitas:{balde}:{imovel_id}'
+
+
+def _dia(balde):
+    """Dia (fuso do site) em que o balde começa, como texto AAAAMMDD."""
+    inicio = datetime.fromtimestamp(balde * INTERVALO_SEGUNDOS, tz=dt_timezone.utc)
+    return timezone.localtime(inicio).strftime('%Y%m%d')
+
+
+def _chave_sketch(dia, imovel_id):
+    return f'visitantes:{dia}:{imovel_id}'
+
+
+def _chave_hash():
+    # Sem a SECRET_KEY não dá para forjar tokens que caiam em registradores escolhidos
+    return settings.SECRET_KEY.encode('utf-8')[:64]
+
+
+def ip_cliente(request):
+    """
+    IP do visitante: o que o proxy mais externo nosso (settings.PROXIES_CONFIAVEIS)
+    acrescentou ao X-Forwarded-For. O que vem antes no cabeçalho o cliente escreve
+    o que quiser (um IP novo por página contaria como visitante novo).
+    """
+    proxies = getattr(settings, 'PROXIES_CONFIAVEIS', 0)
+    encaminhado = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    if proxies and len(encaminhado) >= proxies:
+        return encaminhado[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def token_visitante(request):
+    """
+    (token, novo): o token do cookie `visitante`, ou um novo para gravar no cookie.
+    Sem cookie (robôs, primeira visita) o token sai de IP + User-Agent + dia,
+    para um cliente que nunca guarda o cookie não contar como novo a cada página.
+    """
+    token = request.COOKIES.get(COOKIE_VISITANTE, '')
+    if _TOKEN_VALIDO.match(token):
+        return token, False
+
+    ip = ip_cliente(request)
+    agente = request.META.get('HTTP_USER_AGENT', '')
+    if not ip and not agente:
+        return secrets.token_hex(16), True
+    base = f"{ip}|{agente}|{timezone.localdate().isoformat()}"
+    return hashlib.blake2b(base.encode('utf-8'), digest_size=16, key=_chave_hash()).hexdigest(), True
+
+
+def _chave_gravados(dia, imovel_id):
+    return f'visitantes:{dia}:{imovel_id}:gravados'
+
+
+def _dias_abertos(balde):
+    """Hoje e ontem: o fim de ontem pode ainda não ter sido descarregado."""
+    return [_dia(balde), _dia(balde - DIA_EM_BALDES)]
+
+
+def _ler_dias(imovel_id, dias):
+    return cache.get_many([
+        chave for dia in dias for chave in (_chave_sketch(dia, imovel_id), _chave_gravados(dia, imovel_id))
+    ])
+
+
+def _pendentes(imovel_id, dias, valores):
+    """Por dia: estimativa do sketch do cache - o que a última descarga gravou desse dia."""
+    pendentes = 0
+    for dia in dias:
+        registros = valores.get(_chave_sketch(dia, imovel_id))
+        if registros:
+            pendentes += max(0, HyperLogLog(registros).estimar() - valores.get(_chave_gravados(dia, imovel_id), 0))
+    return pendentes
+
+
+def registrar_visita(imovel_id, token):
+    """
+    Conta o visitante no sketch do dia. Com Redis só mexe no cache e devolve
+    quantos visitantes do imóvel ainda não foram gravados no banco; sem Redis
+    grava direto (_registrar_no_banco) e devolve quanto `visualizacoes` subiu.
+    """
+    if not cache_compartilhado():
+        return _registrar_no_banco(imovel_id, hash64(token, _chave_hash()))
+    if getattr(settings, 'VISUALIZACOES_DESCARGA_EM_THREAD', False):
+        iniciar_descarga_periodica()
+
+    balde = _balde()
+    dias = _dias_abertos(balde)
+    valores = _ler_dias(imovel_id, dias)
+    chave = _chave_sketch(dias[0], imovel_id)
+    sketch = HyperLogLog(valores.get(chave))
+    if sketch.adicionar(hash64(token, _chave_hash())):
+        # Algum registrador mudou: o imóvel entra na lista do balde para a descarga
+        valores[chave] = sketch.para_bytes()
+        cache.set(chave, valores[chave], VALIDADE_SKETCH_SEGUNDOS)
+        _marcar(imovel_id, balde)
+    return _pendentes(imovel_id, dias, valores)
+
+
+def _registrar_no_banco(imovel_id, valor_hash):
+    """
+    Sem Redis: o visitante entra direto no sketch do dia (ImovelVisualizacaoDiaria)
+    e no do imóvel (VisitantesImovel). Quem já foi visto hoje custa uma leitura;
+    um visitante novo trava a linha do imóvel (select_for_update, um escritor
+    por imóvel) e grava as duas.
+    """
+    from .models import Imovel, ImovelVisualizacaoDiaria, VisitantesImovel
+
+    hoje = timezone.localdate()
+    registros = ImovelVisualizacaoDiaria.objects.filter(imovel_id=imovel_id, dia=hoje).values_list('registros', flat=True).first()
+    if not HyperLogLog(registros).adicionar(valor_hash):
+        return 0  # já visto hoje (ou colisão no sketch)
+
+    with transaction.atomic():
+        antes = Imovel.objects.select_for_update().filter(id=imovel_id).values_list('visualizacoes', flat=True).first()
+        if antes is None:
+            return 0  # imóvel apagado
+        diaria, _ = ImovelVisualizacaoDiaria.objects.get_or_create(imovel_id=imovel_id, dia=hoje)
+        sketch = HyperLogLog(diaria.registros)
+        if sketch.adicionar(valor_hash):
+            diaria.registros = sketch.para_bytes()
+            diaria.total = max(diaria.total, sketch.estimar())
+            diaria.save(update_fields=['registros', 'total'])
+
+        visitantes = VisitantesImovel.objects.filter(imovel_id=imovel_id).first()
+        novo = visitantes is None
+        if novo:
+            # Primeira vez: o que o contador antigo já tinha vira a base
+            visitantes = VisitantesImovel(imovel_id=imovel_id, base=antes)
+        sketch = HyperLogLog(visitantes.registros)
+        if not sketch.adicionar(valor_hash) and not novo:
+            return 0  # novo hoje, mas já visto em outro dia
+        visitantes.registros = sketch.para_bytes()
+        visitantes.save(force_insert=novo)
+        depois = visitantes.base + sketch.estimar()
+        Imovel.objects.filter(id=imovel_id).update(visualizacoes=depois)
+    return depois - antes
+
+
+def _incrementar(chave):
+    try:
+        return cache.incr(chave)
+    except ValueError:
+        # Expirou/foi despejada entre o add e o incr
+        cache.add(chave, 0, VALIDADE_SEGUNDOS)
+        return cache.incr(chave)
+
+
+def _marcar(imovel_id, balde):
+    """Põe o imóvel na lista do balde (uma vez por balde)."""
+    if cache.add(_chave(balde, imovel_id), 1, VALIDADE_SEGUNDOS):
+        vaga = _incrementar(f'visitas:{balde}:n')
+        cache.set(f'visitas:{balde}:vaga:{vaga}', imovel_id, VALIDADE_SEGUNDOS)
+
+
+def visualizacoes_pendentes(imovel_id):
+    """Visitantes únicos de hoje/ontem no cache que ainda não estão no banco (um get_many)."""
+    dias = _dias_abertos(_balde())
+    return _pendentes(imovel_id, dias, _ler_dias(imovel_id, dias))
+
+
+def _coletar(baldes):
+    """{(imovel_id, dia)} que tiveram visitante novo nos baldes, e as chaves lidas (para apagar depois)."""
+    chaves_n = {balde: f'visitas:{balde}:n' for balde in baldes}
+    tamanhos = cache.get_many(chaves_n.values())
+    vagas = {
+        f'visitas:{balde}:vaga:{vaga}': balde
+        for balde, chave in chaves_n.items()
+        for vaga in range(1, tamanhos.get(chave, 0) + 1)
+    }
+    ids = cache.get_many(vagas)
+    pares = {(imovel_id, _dia(vagas[vaga])) for vaga, imovel_id in ids.items()}
+    marcas = [_chave(vagas[vaga], imovel_id) for vaga, imovel_id in ids.items()]
+    return pares, list(chaves_n.values()) + list(vagas) + marcas
+
+
+def gravar_visitantes(do_dia):
+    """
+    Mescla os sketches do dia {(imovel_id, dia): bytes} no sketch de cada imóvel e
+    grava visualizacoes = base + estimativa com UPDATE ... CASE em lotes de
+    LOTE_UPDATE (update() não dispara sinais nem mexe no catálogo).
+    """
+    from .models import Imovel, VisitantesImovel
+
+    por_imovel = defaultdict(list)
+    for (imovel_id, _), registros in do_dia.items():
+        por_imovel[imovel_id].append(registros)
+    ids = sorted(por_imovel)
+    for inicio in range(0, len(ids), LOTE_UPDATE):
+        lote = ids[inicio:inicio + LOTE_UPDATE]
+        salvos = {v.imovel_id: v for v in VisitantesImovel.objects.filter(imovel_id__in=lote)}
+        # Primeira vez: o que o contador antigo já tinha vira a base
+        bases = dict(
+            Imovel.objects.filter(id__in=[i for i in lote if i not in salvos]).values_list('id', 'visualizacoes')
+        )
+
+        gravar, valores = [], {}
+        for imovel_id in lote:
+            salvo = salvos.get(imovel_id)
+            if salvo is None and imovel_id not in bases:
+                continue  # imóvel apagado
+            sketch = HyperLogLog(salvo.registros if salvo else None)
+            for registros in por_imovel[imovel_id]:
+                sketch.mesclar(HyperLogLog(registros))
+            base = salvo.base if salvo else bases[imovel_id]
+            gravar.append(VisitantesImovel(imovel_id=imovel_id, registros=sketch.para_bytes(), base=base))
+            valores[imovel_id] = base + sketch.estimar()
+
+        VisitantesImovel.objects.bulk_create(
+            gravar, update_conflicts=True, unique_fields=['imovel'], update_fields=['registros', 'atualizado_em'],
+        )
+        if valores:
+            Imovel.objects.filter(id__in=valores).update(visualizacoes=Case(
+                *(When(id=imovel_id, then=Value(valor)) for imovel_id, valor in valores.items()),
+                default=F('visualizacoes'),
+                output_field=IntegerField(),
+            ))
+
+
+def descarregar(agora=None):
+    """
+    Grava no banco os baldes já fechados. O balde atual e o anterior ficam para
+    a próxima vez (ainda podem receber uma visita atrasada). Devolve {imovel_id:
+    quanto os visitantes únicos dos dias subiram}. Sem Redis não há buffer: {}.
+    """
+    if not cache_compartilhado():
+        return {}
+    if not cache.add(CHAVE_TRAVA, 1, TRAVA_SEGUNDOS):
+        return {}  # outra descarga em andamento
+    try:
+        ultimo_fechado = _balde(agora) - 2
+        descarregado = cache.get(CHAVE_DESCARREGADO)
+        if descarregado is None:
+            descarregado = ultimo_fechado - VALIDADE_SEGUNDOS // INTERVALO_SEGUNDOS
+        baldes = range(descarregado + 1, ultimo_fechado + 1)
+        if not baldes:
+            return {}
+
+        pares, chaves = _coletar(baldes)
+        sketches = cache.get_many([_chave_sketch(dia, imovel_id) for imovel_id, dia in pares])
+        do_dia = {
+            (imovel_id, dia): sketches[_chave_sketch(dia, imovel_id)]
+            for imovel_id, dia in pares if _chave_sketch(dia, imovel_id) in sketches
+        }
+        with transaction.atomic():
+            gravar_visitantes(do_dia)
+            gravados = gravar_diarias({(imovel_id, dia_do_texto(dia)): registros for (imovel_id, dia), registros in do_dia.items()})
+        # Só depois do commit: se cair antes daqui, a próxima descarga refaz os mesmos baldes
+        cache.set_many({
+            _chave_gravados(data.strftime('%Y%m%d'), imovel_id): total
+            for (imovel_id, data), (total, _) in gravados.items()
+        }, VALIDADE_SKETCH_SEGUNDOS)
+        cache.set(CHAVE_DESCARREGADO, ultimo_fechado, None)
+        cache.delete_many(chaves)
+        totais = Counter()
+        for (imovel_id, _), (_, subiu) in gravados.items():
+            totais[imovel_id] += subiu
+        return dict(totais)
+    finally:
+        cache.delete(CHAVE_TRAVA)
+
+
+# --- Descarga em thread (uma por worker; a trava deixa uma descarga por vez) ---
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _descarregar_sempre():
+    while True:
+        time.sleep(INTERVALO_SEGUNDOS)
+        try:
+            totais = descarregar()
+            if totais:
+                print(f"Visualizações: {sum(totais.values())} visitante(s) novo(s) em {len(totais)} imóvel(is).")
+        except Exception as e:
+            print(f"Erro ao descarregar as visualizações: {e}")
+        finally:
+            close_old_connections()
+
+
+def iniciar_descarga_periodica():
+    global _thread
+    if _thread is not None:
+        return
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_descarregar_sempre, name='descarga-visualizacoes', daemon=True)
+            _thread.start()
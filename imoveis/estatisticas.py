@@ -0,0 +1,155 @@
+# imoveis/estatisticas.py
+"""
+Série de visitantes por imóvel, pré-agregada:
+
+- ImovelVisualizacaoDiaria: uma linha por (imóvel, dia), gravada pela descarga
+  do contador (imoveis/contador.py) com bulk_create(update_conflicts=True).
+  A linha guarda o sketch HyperLogLog dos visitantes do dia; cada descarga
+  mescla nele o sketch do cache e o total passa a ser a estimativa do sketch
+  (visitantes únicos do dia). Somar o que mudou a cada visita contaria bem
+  menos: um visitante novo nem sempre muda um registrador.
+- ImovelVisualizacaoMensal: dias antigos compactados por mês pelo comando
+  compactar_visualizacoes, para a tabela diária não crescer sem limite.
+
+O painel (meus_imoveis) lê só as linhas diárias do período, nunca eventos.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .hll import HyperLogLog
+
+LOTE = 500
+DIAS_PAINEL = 30
+# Dias mais novos que isso continuam diários (a compactação só fecha meses inteiros)
+DIAS_MANTIDOS = 90
+
+
+def _somar(modelo, campo, totais):
+    """
+    Soma `totais` {(imovel_id, data): n} nas linhas de `modelo` (uma leitura
+    e um upsert por lote). Quem chama garante um só escritor por vez (a
+    transação da compactação).
+    """
+    chaves = sorted(totais)
+    for inicio in range(0, len(chaves), LOTE):
+        lote = chaves[inicio:inicio + LOTE]
+        existentes = {
+            (imovel_id, data): total
+            for imovel_id, data, total in modelo.objects.filter(
+                imovel_id__in={imovel_id for imovel_id, _ in lote},
+                **{f'{campo}__in': {data for _, data in lote}},
+            ).values_list('imovel_id', campo, 'total')
+        }
+        modelo.objects.bulk_create(
+            [
+                modelo(imovel_id=imovel_id, total=existentes.get((imovel_id, data), 0) + totais[imovel_id, data], **{campo: data})
+                for imovel_id, data in lote
+            ],
+            update_conflicts=True, unique_fields=['imovel', campo], update_fields=['total'],
+        )
+
+
+def gravar_diarias(sketches):
+    """
+    {(imovel_id, dia): sketch do dia (bytes)} -> ImovelVisualizacaoDiaria: mescla no
+    sketch da linha e grava a estimativa como total (nunca abaixo do que já estava).
+    Devolve {(imovel_id, dia): (total, quanto subiu)}. Imóveis apagados ficam de fora.
+    Quem chama garante um só escritor por vez (a trava da descarga).
+    """
+    from .models import Imovel, ImovelVisualizacaoDiaria
+
+    existentes = set(Imovel.objects.filter(id__in={imovel_id for imovel_id, _ in sketches}).values_list('id', flat=True))
+    chaves = sorted(chave for chave in sketches if chave[0] in existentes)
+    gravados = {}
+    for inicio in range(0, len(chaves), LOTE):
+        lote = chaves[inicio:inicio + LOTE]
+        salvos = {
+            (imovel_id, dia): (total, registros)
+            for imovel_id, dia, total, registros in ImovelVisualizacaoDiaria.objects.filter(
+                imovel_id__in={imovel_id for imovel_id, _ in lote}, dia__in={dia for _, dia in lote},
+            ).values_list('imovel_id', 'dia', 'total', 'registros')
+        }
+        linhas = []
+        for imovel_id, dia in lote:
+            antes, registros = salvos.get((imovel_id, dia), (0, None))
+            sketch = HyperLogLog(registros).mesclar(HyperLogLog(sketches[imovel_id, dia]))
+            total = max(antes, sketch.estimar())
+            gravados[imovel_id, dia] = (total, total - antes)
+            linhas.append(ImovelVisualizacaoDiaria(imovel_id=imovel_id, dia=dia, total=total, registros=sketch.para_bytes()))
+        ImovelVisualizacaoDiaria.objects.bulk_create(
+            linhas, update_conflicts=True, unique_fields=['imovel', 'dia'], update_fields=['total', 'registros'],
+        )
+    return gravados
+
+
+def compactar(antes_de):
+    """
+    Move para ImovelVisualizacaoMensal os dias anteriores a `antes_de` (um dia 1,
+    para só fechar meses inteiros). Devolve (linhas diárias apagadas, meses somados).
+    """
+    from .models import ImovelVisualizacaoDiaria, ImovelVisualizacaoMensal
+
+    antigos = ImovelVisualizacaoDiaria.objects.filter(dia__lt=antes_de)
+    with transaction.atomic():
+        por_mes = {
+            (linha['imovel_id'], linha['mes']): linha['soma']
+            for linha in antigos.annotate(mes=TruncMonth('dia')).values('imovel_id', 'mes').annotate(soma=Sum('total'))
+        }
+        _somar(ImovelVisualizacaoMensal, 'mes', por_mes)
+        apagados, _ = antigos.delete()
+    return apagados, len(por_mes)
+
+
+def limite_compactacao(hoje=None, dias_mantidos=DIAS_MANTIDOS):
+    """Dia 1 do mês de (hoje - dias_mantidos): o que vem antes já são meses fechados."""
+    corte = (hoje or timezone.localdate()) - timedelta(days=dias_mantidos)
+    return corte.replace(day=1)
+
+
+def pontos_grafico(serie, largura=120, altura=28):
+    """Pontos de um <polyline> SVG para a série (0 embaixo, máximo em cima)."""
+    maximo = max(serie) or 1
+    passo = largura / max(len(serie) - 1, 1)
+    return ' '.join(
+        f"{i * passo:.1f},{altura - (valor / maximo) * (altura - 2) - 1:.1f}" for i, valor in enumerate(serie)
+    )
+
+
+def tendencias(imovel_ids, hoje=None, dias=DIAS_PAINEL):
+    """
+    {imovel_id: {'serie', 'total', 'semana', 'variacao', 'pontos'}} dos últimos
+    `dias` (uma consulta). `variacao` compara os últimos 7 dias com os 7 anteriores
+    (None sem base de comparação).
+    """
+    from .models import ImovelVisualizacaoDiaria
+
+    hoje = hoje or timezone.localdate()
+    inicio = hoje - timedelta(days=dias - 1)
+    series = defaultdict(lambda: [0] * dias)
+    for imovel_id, dia, total in ImovelVisualizacaoDiaria.objects.filter(
+        imovel_id__in=imovel_ids, dia__gte=inicio, dia__lte=hoje,
+    ).values_list('imovel_id', 'dia', 'total'):
+        series[imovel_id][(dia - inicio).days] = total
+
+    resultado = {}
+    for imovel_id in imovel_ids:
+        serie = series[imovel_id]
+        semana, anterior = sum(serie[-7:]), sum(serie[-14:-7])
+        resultado[imovel_id] = {
+            'serie': serie,
+            'total': sum(serie),
+            'semana': semana,
+            'variacao': round((semana - anterior) * 100 / anterior) if anterior else None,
+            'pontos': pontos_grafico(serie),
+        }
+    return resultado
+
+
+def dia_do_texto(texto):
+    """'AAAAMMDD' (chave do contador) -> date."""
+    return date(int(texto[:4]), int(texto[4:6]), int(texto[6:]))
@@ -0,0 +1,140 @@
+# imoveis/expiracao.py
+"""
+Expiração de assinaturas e anúncios, fora do caminho das requisições.
+
+`expirar()` faz, em UPDATEs de no máximo LOTE linhas (transações curtas,
+sem travar a tabela inteira):
+
+1. Assinatura ATIVA com data_expiracao no passado -> EXPIRADA;
+2. Imóvel ATIVO de quem está com a assinatura EXPIRADA -> EXPIRADO;
+3. Imóvel ATIVO com data_expiracao no passado -> EXPIRADO.
+
+Se algum imóvel mudou, a versão do catálogo é incrementada (update() não
+dispara sinais). Entre uma execução e outra a vitrine já esconde os vencidos
+(filtro data_expiracao > agora); a expiração só acerta o status no banco.
+
+Roda pelo comando `expirar_anuncios` (cron) ou pela thread opcional deste
+módulo (EXPIRACAO_EM_THREAD), uma por worker. A trava garante uma execução
+por vez: advisory lock no PostgreSQL ou, nos outros bancos (desenvolvimento),
+cache.add, que só vale entre processos com Redis (settings.CACHE_COMPARTILHADO).
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .catalogo import incrementar_versao_catalogo
+
+LOTE = 1000
+INTERVALO_SEGUNDOS = 300
+
+CHAVE_TRAVA = 'expiracao:trava'
+TRAVA_SEGUNDOS = 600
+# Chave do pg_try_advisory_lock (um número qualquer, fixo para o projeto)
+TRAVA_POSTGRES = 7_202_001
+
+
+@contextmanager
+def _trava():
+    """True se esta execução pegou a trava; False se outra já está rodando."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [TRAVA_POSTGRES])
+            obtida = cursor.fetchone()[0]
+        try:
+            yield obtida
+        finally:
+            if obtida:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", [TRAVA_POSTGRES])
+        return
+
+    obtida = cache.add(CHAVE_TRAVA, 1, TRAVA_SEGUNDOS)
+    try:
+        yield obtida
+    finally:
+        if obtida:
+            cache.delete(CHAVE_TRAVA)
+
+
+def _em_lotes(queryset, **valores):
+    """queryset.update(**valores) de LOTE em LOTE linhas (por id). Devolve o total atualizado."""
+    total = 0
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:LOTE])
+        if not ids:
+            return total
+        # O filtro vai de novo no UPDATE: quem mudou desde o SELECT fica de fora
+        total += queryset.filter(id__in=ids).update(**valores)
+        if len(ids) < LOTE:
+            return total
+
+
+def expirar(agora=None):
+    """
+    Expira assinaturas e anúncios vencidos. Devolve {'assinaturas', 'imoveis_assinatura',
+    'imoveis'} com quantos foram atualizados, ou None se outra execução tinha a trava.
+    """
+    from .models import Assinatura, Imovel
+
+    agora = agora or timezone.now()
+    with _trava() as obtida:
+        if not obtida:
+            return None
+
+        resultado = {
+            'assinaturas': _em_lotes(
+                Assinatura.objects.filter(status=Assinatura.StatusAssinatura.ATIVA, data_expiracao__lt=agora),
+                status=Assinatura.StatusAssinatura.EXPIRADA,
+            ),
+            'imoveis_assinatura': _em_lotes(
+                Imovel.objects.filter(
+                    status_publicacao=Imovel.StatusPublicacao.ATIVO,
+                    proprietario__assinatura__status=Assinatura.StatusAssinatura.EXPIRADA,
+                ),
+                status_publicacao=Imovel.StatusPublicacao.EXPIRADO, atualizado_em=agora,
+            ),
+            'imoveis': _em_lotes(
+                Imovel.objects.filter(status_publicacao=Imovel.StatusPublicacao.ATIVO, data_expiracao__lt=agora),
+                status_publicacao=Imovel.StatusPublicacao.EXPIRADO, atualizado_em=agora,
+            ),
+        }
+        if resultado['imoveis_assinatura'] or resultado['imoveis']:
+            incrementar_versao_catalogo()
+        return resultado
+
+
+# --- Expiração em thread (uma por worker; a trava evita execuções simultâneas) ---
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _expirar_sempre():
+    while True:
+        try:
+            resultado = expirar()
+            if resultado and any(resultado.values()):
+                print(
+                    f"Expiração: {resultado['assinaturas']} assinatura(s), "
+                    f"{resultado['imoveis_assinatura'] + resultado['imoveis']} imóvel(is)."
+                )
+        except Exception as e:
+            print(f"Erro ao expirar assinaturas/anúncios: {e}")
+        finally:
+            close_old_connections()
+        time.sleep(INTERVALO_SEGUNDOS)
+
+
+def garantir_expiracao_periodica():
+    """Liga a thread de expiração deste worker, se EXPIRACAO_EM_THREAD estiver ligado."""
+    global _thread
+    if _thread is not None or not getattr(settings, 'EXPIRACAO_EM_THREAD', False):
+        return
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_expirar_sempre, name='expiracao-anuncios', daemon=True)
+            _thread.start()
@@ -0,0 +1,76 @@
+# imoveis/facetas.py
+"""
+Contagem de resultados por opção do formulário de busca ("facetas").
+
+Cada dimensão é resolvida com UM único GROUP BY, não um COUNT por opção:
+
+    SELECT cidade_id, COUNT(*) FROM imoveis_imovel WHERE <filtros> GROUP BY cidade_id
+
+Cada faceta ignora o próprio filtro (ex: a contagem por cidade não aplica o
+filtro de cidade), para o usuário ver quantos imóveis teria ao trocar de opção.
+O resultado fica em cache pela chave normalizada dos filtros + a versão do
+catálogo (imoveis/catalogo.py), então qualquer mudança num imóvel o invalida.
+"""
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from .catalogo import chave_vitrine, em_cache_com_trava
+from .filtros import aplicar_filtros
+
+FACETAS_CACHE_SEGUNDOS = 300
+
+# Faixas de quartos exibidas no formulário ("4" significa 4 ou mais)
+FAIXAS_QUARTOS = (0, 1, 2, 3, 4)
+
+
+def _contar_por(queryset, campo):
+    linhas = queryset.values(campo).annotate(total=Count('id')).order_by()
+    return {linha[campo]: linha['total'] for linha in linhas if linha[campo] is not None}
+
+
+def _contar_quartos(queryset):
+    maior = FAIXAS_QUARTOS[-1]
+    faixa = Case(
+        When(quartos__gte=maior, then=Value(maior)),
+        default='quartos',
+        output_field=IntegerField(),
+    )
+    linhas = queryset.annotate(faixa_quartos=faixa).values('faixa_quartos').annotate(total=Count('id')).order_by()
+    return {linha['faixa_quartos']: linha['total'] for linha in linhas if linha['faixa_quartos'] is not None}
+
+
+def calcular_facetas(queryset_base, params):
+    """
+    Devolve {'cidade': {id: n}, 'bairro': {id: n}, 'finalidade': {valor: n}, 'quartos': {faixa: n}}.
+
+    `queryset_base` é a vitrine ativa SEM os filtros do GET (eles são aplicados aqui).
+    A faceta de bairro só é calculada com uma cidade escolhida (é quando o select aparece).
+    """
+    return em_cache_com_trava(
+        chave_vitrine('lista_imoveis:facetas', params),
+        lambda: _calcular(queryset_base, params),
+        FACETAS_CACHE_SEGUNDOS,
+    )
+
+
+def _calcular(queryset_base, params):
+    facetas = {
+        'cidade': _contar_por(aplicar_filtros(queryset_base, params, ignorar=('cidade', 'bairro')), 'cidade_id'),
+        'finalidade': _contar_por(aplicar_filtros(queryset_base, params, ignorar=('finalidade',)), 'finalidade'),
+        'quartos': _contar_quartos(aplicar_filtros(queryset_base, params, ignorar=('quartos',))),
+        'bairro': {},
+    }
+    cidade_id = params.get('cidade')
+    if cidade_id and cidade_id.isdigit():
+        facetas['bairro'] = _contar_por(aplicar_filtros(queryset_base, params, ignorar=('bairro',)), 'bairro_id')
+    return facetas
+
+
+def quartos_acumulado(contagem_quartos):
+    """Converte a contagem por faixa em 'N ou mais quartos' (o filtro do formulário é um mínimo)."""
+    acumulado = []
+    soma = 0
+    for faixa in reversed(FAIXAS_QUARTOS):
+        soma += contagem_quartos.get(faixa, 0)
+        if faixa > 0:
+            acumulado.append((faixa, soma))
+    return list(reversed(acumulado))
@@ -0,0 +1,79 @@
+# imoveis/filtros.py
+"""
+Filtros da busca pública (os mesmos campos do formulário de lista_imoveis.html).
+
+Fica num módulo separado porque a vitrine, a paginação e as facetas precisam
+aplicar exatamente as mesmas regras de validação.
+"""
+import hashlib
+
+from .busca_texto import filtrar_texto
+from .geo import PARAMETROS_AREA, filtrar_area, ler_area
+
+# Parâmetros da URL que não fazem parte do filtro (não mudam o resultado)
+PARAMETROS_NAVEGACAO = ('page', 'cursor', 'fields', 'limite')
+
+# Filtros de igualdade: parâmetro do GET -> lookup no Imovel
+FILTROS_EXATOS = {
+    'imobiliaria': 'imobiliaria__id',
+    'cidade': 'cidade__id',
+    'bairro': 'bairro__id',
+}
+
+# Filtros de "mínimo/máximo": parâmetro do GET -> lookup no Imovel
+FILTROS_FAIXA = {
+    'quartos': 'quartos__gte',
+    'suites': 'suites__gte',
+    'banheiros': 'banheiros__gte',
+    'salas': 'salas__gte',
+    'cozinhas': 'cozinhas__gte',
+    'closets': 'closets__gte',
+    'area': 'area__gte',
+    'preco_max': 'preco__lte',
+}
+
+# Tudo o que muda o resultado: o que aplicar_filtros lê e a ordenação (imoveis/ordenacao.py).
+# Só estes entram em chave_filtros; utm_*, fbclid etc. não criam entradas novas no cache.
+PARAMETROS_FILTRO = ('q', 'finalidade', *FILTROS_EXATOS, *FILTROS_FAIXA, *PARAMETROS_AREA, 'ordem')
+
+
+def aplicar_filtros(queryset, params, ignorar=()):
+    """
+    Aplica ao queryset os filtros vindos do GET.
+
+    `ignorar` lista parâmetros que não devem ser aplicados (usado pelas facetas,
+    que contam as opções de um campo sem o filtro desse próprio campo).
+    Valores inválidos (não numéricos) são ignorados, como sempre foi na vitrine.
+    """
+    q = (params.get('q') or '').strip()
+    if q and 'q' not in ignorar:
+        queryset = filtrar_texto(queryset, q)
+
+    finalidade = params.get('finalidade')
+    if finalidade and 'finalidade' not in ignorar:
+        queryset = queryset.filter(finalidade=finalidade)
+
+    for parametro, lookup in list(FILTROS_EXATOS.items()) + list(FILTROS_FAIXA.items()):
+        if parametro in ignorar:
+            continue
+        valor = params.get(parametro)
+        if valor and valor.isdigit():
+            queryset = queryset.filter(**{lookup: valor})
+
+    # Caixa (?caixa=) ou raio (?lat=&lng=&raio=), ver imoveis/geo.py
+    area = ler_area(params)
+    if area is not None:
+        queryset = filtrar_area(queryset, area)
+
+    return queryset
+
+
+def chave_filtros(params):
+    """Gera uma chave estável para os filtros do GET (só PARAMETROS_FILTRO; ordem e vazios ignorados)."""
+    itens = sorted(
+        (chave, valor)
+        for chave, valor in params.items()
+        if chave in PARAMETROS_FILTRO and valor
+    )
+    bruto = '&'.join(f"{chave}={valor}" for chave, valor in itens)
+    return hashlib.md5(bruto.encode('utf-8')).hexdigest()
@@ -26,7 +26,7 @@ class ImovelForm(forms.ModelForm):
         fields = [
             'finalidade', 'imobiliaria', 'cidade', 'bairro', 'titulo', 'descricao', 
             'endereco', 'preco', 'telefone_contato', 'quartos', 'suites', 'banheiros', 'salas', 
-            'cozinhas', 'closets', 'area', 'foto_principal'
+            'cozinhas', 'closets', 'area', 'foto_principal', 'latitude', 'longitude'
         ]
         
         widgets = {
@@ -50,11 +50,27 @@ class ImovelForm(forms.ModelForm):
             'cozinhas': forms.NumberInput(attrs={'class': 'form-control', 'value': 0}),
             'closets': forms.NumberInput(attrs={'class': 'form-control', 'value': 0}),
             'foto_principal': forms.FileInput(attrs={'class': 'form-control'}),
+            'latitude': forms.NumberInput(attrs={'class': 'form-control', 'step': 'any', 'placeholder': 'Ex: -20.4697'}),
+            'longitude': forms.NumberInput(attrs={'class': 'form-control', 'step': 'any', 'placeholder': 'Ex: -54.6201'}),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['imobiliaria'].required = False
+        # Localização aproximada (centroide do bairro) não é mostrada como se fosse o ponto exato
+        if self.instance.pk and self.instance.localizacao_aproximada:
+            self.initial['latitude'] = self.initial['longitude'] = None
+
+    def clean(self):
+        cleaned_data = super().clean()
+        latitude, longitude = cleaned_data.get('latitude'), cleaned_data.get('longitude')
+        if (latitude is None) != (longitude is None):
+            raise forms.ValidationError("Informe a latitude e a longitude (ou deixe as duas em branco).")
+        if latitude is not None and not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise forms.ValidationError("Coordenadas fora do intervalo válido.")
+        # Sem ponto informado, o save() usa o centroide do bairro/cidade
+        self.instance.localizacao_aproximada = latitude is None
+        return cleaned_data
 
 
 # --- FORMULÁRIO ImobiliariaForm (continua igual) ---
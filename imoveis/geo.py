@@ -0,0 +1,209 @@
+# imoveis/geo.py
+"""
+Localização dos imóveis e busca por área (caixa ou raio), sem PostGIS.
+
+Cada imóvel guarda latitude/longitude. Quando o anunciante não informa o
+ponto exato, usamos o centroide do bairro (ou da cidade) cadastrado pelo
+comando `carregar_centroides`, e o imóvel fica marcado como
+`localizacao_aproximada`.
+
+Para a busca, a Terra é dividida numa grade fixa de TAMANHO_CELULA graus
+(~1,1 km) e cada imóvel guarda o número da sua célula em `celula_geo`
+(linha * COLUNAS_GRADE + coluna), que é indexado. Uma caixa vira uma faixa
+contígua de células por linha da grade:
+
+    WHERE (celula_geo BETWEEN a1 AND b1 OR celula_geo BETWEEN a2 AND b2 ...)
+      AND latitude BETWEEN sul AND norte AND longitude BETWEEN oeste AND leste
+
+As faixas são lidas pelo índice; a comparação exata de latitude/longitude
+só descarta as sobras das células da borda. O raio é a caixa que envolve o
+círculo mais a distância equirretangular (só aritmética, roda igual no
+PostgreSQL e no SQLite; o erro é desprezível para raios de até RAIO_MAXIMO_KM).
+
+Parâmetros do GET (lista_imoveis e API):
+
+* `caixa=sul,oeste,norte,leste` (graus decimais);
+* `lat=...&lng=...&raio=N` (raio em km, padrão RAIO_PADRAO_KM).
+"""
+import math
+
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import ExpressionWrapper
+
+TAMANHO_CELULA = 0.01
+COLUNAS_GRADE = 36000  # 360 / TAMANHO_CELULA
+KM_POR_GRAU = 111.32
+
+RAIO_PADRAO_KM = 3
+RAIO_MAXIMO_KM = 50
+RAIOS_KM = (1, 2, 3, 5, 10, 20)  # opções do formulário de lista_imoveis
+# Caixas com mais linhas de grade que isso viram uma faixa só (menos OR, mais sobra)
+LIMITE_FAIXAS = 40
+
+PARAMETROS_AREA = ('caixa', 'lat', 'lng', 'raio')
+
+
+def linha_grade(latitude):
+    return int(math.floor((latitude + 90) / TAMANHO_CELULA))
+
+
+def coluna_grade(longitude):
+    return int(math.floor((longitude + 180) / TAMANHO_CELULA))
+
+
+def celula(latitude, longitude):
+    """Número da célula da grade que contém o ponto (None se faltar coordenada)."""
+    if latitude is None or longitude is None:
+        return None
+    return linha_grade(latitude) * COLUNAS_GRADE + coluna_grade(longitude)
+
+
+def faixas_celulas(linha_inicial, linha_final, coluna_inicial, coluna_final):
+    """
+    Faixas contíguas de celula_geo do retângulo de células (uma por linha).
+    Com mais de LIMITE_FAIXAS linhas vira uma faixa só, do canto sudoeste ao
+    nordeste: quem chama precisa descartar as colunas de fora (por latitude/longitude).
+    """
+    if linha_final - linha_inicial + 1 > LIMITE_FAIXAS:
+        return [(linha_inicial * COLUNAS_GRADE + coluna_inicial, linha_final * COLUNAS_GRADE + coluna_final)]
+    return [
+        (linha * COLUNAS_GRADE + coluna_inicial, linha * COLUNAS_GRADE + coluna_final)
+        for linha in range(linha_inicial, linha_final + 1)
+    ]
+
+
+class Area:
+    """Caixa (sul, oeste, norte, leste) e, na busca por raio, o centro e o raio em km."""
+
+    def __init__(self, sul, oeste, norte, leste, centro=None, raio_km=None):
+        self.sul, self.oeste, self.norte, self.leste = sul, oeste, norte, leste
+        self.centro = centro
+        self.raio_km = raio_km
+
+    @classmethod
+    def do_raio(cls, latitude, longitude, raio_km):
+        delta_lat = raio_km / KM_POR_GRAU
+        delta_lng = raio_km / (KM_POR_GRAU * max(math.cos(math.radians(latitude)), 0.01))
+        return cls(
+            latitude - delta_lat, longitude - delta_lng, latitude + delta_lat, longitude + delta_lng,
+            centro=(latitude, longitude), raio_km=raio_km,
+        )
+
+    def faixas(self):
+        """[(primeira_celula, ultima_celula), ...] que cobrem a caixa, uma por linha da grade."""
+        return faixas_celulas(
+            linha_grade(self.sul), linha_grade(self.norte), coluna_grade(self.oeste), coluna_grade(self.leste),
+        )
+
+    def fatores_km(self):
+        """(km por grau de latitude, km por grau de longitude) na latitude do centro."""
+        return KM_POR_GRAU, KM_POR_GRAU * math.cos(math.radians(self.centro[0]))
+
+    def contem(self, latitude, longitude):
+        """O ponto está na área? (mesma conta de filtrar_area, para um imóvel já carregado)"""
+        if latitude is None or longitude is None:
+            return False
+        if not (self.sul <= latitude <= self.norte and self.oeste <= longitude <= self.leste):
+            return False
+        if self.centro is None:
+            return True
+        km_lat, km_lng = self.fatores_km()
+        dy = (latitude - self.centro[0]) * km_lat
+        dx = (longitude - self.centro[1]) * km_lng
+        return dy * dy + dx * dx <= self.raio_km ** 2
+
+
+def _numero(valor):
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return numero if math.isfinite(numero) else None
+
+
+def ler_area(params):
+    """
+    Área pedida no GET, ou None. Valores inválidos são ignorados (como os
+    outros filtros da vitrine); `caixa` tem prioridade sobre lat/lng/raio.
+    """
+    caixa = params.get('caixa')
+    if caixa:
+        partes = [_numero(parte) for parte in caixa.split(',')]
+        if len(partes) == 4 and None not in partes:
+            sul, oeste, norte, leste = partes
+            if -90 <= sul <= norte <= 90 and -180 <= oeste <= leste <= 180:
+                return Area(sul, oeste, norte, leste)
+
+    latitude, longitude = _numero(params.get('lat')), _numero(params.get('lng'))
+    if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    raio = _numero(params.get('raio')) or RAIO_PADRAO_KM
+    return Area.do_raio(latitude, longitude, min(max(raio, 0.1), RAIO_MAXIMO_KM))
+
+
+def filtrar_area(queryset, area):
+    """Restringe o queryset de Imovel à área (usa o índice de celula_geo)."""
+    celulas = Q()
+    for inicio, fim in area.faixas():
+        celulas |= Q(celula_geo__range=(inicio, fim))
+    queryset = queryset.filter(
+        celulas,
+        latitude__range=(area.sul, area.norte),
+        longitude__range=(area.oeste, area.leste),
+    )
+    if area.centro is None:
+        return queryset
+
+    # Distância equirretangular ao quadrado (km²), comparada com raio²
+    km_lat, km_lng = area.fatores_km()
+    latitude, longitude = area.centro
+    distancia2 = ExpressionWrapper(
+        ((F('latitude') - latitude) * km_lat) * ((F('latitude') - latitude) * km_lat)
+        + ((F('longitude') - longitude) * km_lng) * ((F('longitude') - longitude) * km_lng),
+        output_field=FloatField(),
+    )
+    return queryset.alias(distancia2=distancia2).filter(distancia2__lte=area.raio_km ** 2)
+
+
+# --- Centroides (localização aproximada) ---
+def centroides():
+    """{'bairros': {id: (lat, lng)}, 'cidades': {id: (lat, lng)}} de tudo que tem centroide cadastrado."""
+    from .models import Bairro, Cidade
+
+    def mapa(modelo):
+        return {
+            pk: (latitude, longitude)
+            for pk, latitude, longitude in modelo.objects.exclude(latitude=None).exclude(longitude=None)
+            .values_list('id', 'latitude', 'longitude')
+        }
+
+    return {'bairros': mapa(Bairro), 'cidades': mapa(Cidade)}
+
+
+def _centroide(imovel, mapas):
+    if mapas is not None:
+        return mapas['bairros'].get(imovel.bairro_id) or mapas['cidades'].get(imovel.cidade_id)
+
+    from .models import Bairro, Cidade
+
+    for modelo, pk in ((Bairro, imovel.bairro_id), (Cidade, imovel.cidade_id)):
+        if pk is None:
+            continue
+        ponto = modelo.objects.filter(pk=pk).exclude(latitude=None).values_list('latitude', 'longitude').first()
+        if ponto and ponto[1] is not None:
+            return ponto
+    return None
+
+
+def localizar(imovel, mapas=None):
+    """
+    Preenche latitude/longitude (centroide se não houver ponto exato) e celula_geo.
+    `mapas` é o resultado de centroides(), para preencher muitos imóveis sem uma consulta por imóvel.
+    """
+    exato = imovel.latitude is not None and imovel.longitude is not None and not imovel.localizacao_aproximada
+    if not exato:
+        ponto = _centroide(imovel, mapas)
+        imovel.latitude, imovel.longitude = ponto or (None, None)
+        imovel.localizacao_aproximada = ponto is not None
+    imovel.celula_geo = celula(imovel.latitude, imovel.longitude)
+    return imovel
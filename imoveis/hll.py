@@ -0,0 +1,54 @@
+# imoveis/hll.py
+"""
+HyperLogLog: estimativa de quantos elementos DIFERENTES foram vistos, num
+tamanho fixo (2**PRECISAO registradores de um byte = 1 KB, erro típico de
+1,04 / sqrt(1024) ~ 3%), que pode ser mesclado (máximo registrador a registrador).
+
+Usado pelo contador de visitantes únicos do detalhe (imoveis/contador.py).
+"""
+import hashlib
+import math
+
+PRECISAO = 10
+REGISTRADORES = 1 << PRECISAO
+_BITS_RESTO = 64 - PRECISAO
+_ALFA = 0.7213 / (1 + 1.079 / REGISTRADORES)
+
+
+def hash64(texto, chave=b''):
+    """Hash de 64 bits estável entre processos (o hash() do Python muda a cada execução)."""
+    resumo = hashlib.blake2b(texto.encode('utf-8'), digest_size=8, key=chave[:64]).digest()
+    return int.from_bytes(resumo, 'big')
+
+
+class HyperLogLog:
+
+    def __init__(self, registradores=None):
+        self.registradores = bytearray(registradores or bytes(REGISTRADORES))
+
+    def adicionar(self, valor_hash):
+        """Conta um hash de 64 bits. Devolve True se algum registrador mudou (elemento certamente novo)."""
+        indice = valor_hash >> _BITS_RESTO
+        resto = valor_hash & ((1 << _BITS_RESTO) - 1)
+        posicao = _BITS_RESTO - resto.bit_length() + 1  # zeros à esquerda + 1
+        if posicao > self.registradores[indice]:
+            self.registradores[indice] = posicao
+            return True
+        return False
+
+    def mesclar(self, outro):
+        """União com outro sketch (in place)."""
+        self.registradores = bytearray(map(max, self.registradores, outro.registradores))
+        return self
+
+    def estimar(self):
+        soma = sum(2.0 ** -registro for registro in self.registradores)
+        estimativa = _ALFA * REGISTRADORES * REGISTRADORES / soma
+        vazios = self.registradores.count(0)
+        if estimativa <= 2.5 * REGISTRADORES and vazios:
+            # Poucos elementos: contagem linear (bem mais precisa nessa faixa)
+            estimativa = REGISTRADORES * math.log(REGISTRADORES / vazios)
+        return int(round(estimativa))
+
+    def para_bytes(self):
+        return bytes(self.registradores)
@@ -0,0 +1,146 @@
+# imoveis/lembretes.py
+"""
+Aviso por e-mail de assinaturas e anúncios que vencem nos próximos dias.
+
+- Uma consulta por tipo (índices status + data_expiracao), já sem o que foi
+  avisado: NOT EXISTS em LembreteExpiracao para a mesma data de expiração.
+- Um e-mail por dono (assinatura + todos os anúncios dele que vencem),
+  renderizados antes do envio.
+- Uma conexão SMTP aberta uma vez e reaproveitada por todas as mensagens
+  (o backend só abre/fecha sozinho quando a conexão ainda não está aberta).
+- Cada envio bem-sucedido vira LembreteExpiracao (bulk_create em lotes): rodar
+  de novo só manda o que faltou.
+- Mensagem recusada conta como falha. Se o servidor cair e não der para
+  reconectar, o que faltava conta como falha e a execução para (o registro
+  do que já foi enviado é gravado).
+"""
+from datetime import timedelta
+
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, OuterRef
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+DIAS_PADRAO = 7
+LOTE_REGISTRO = 100
+
+
+def _pendentes(agora, dias):
+    """{usuario_id: {'usuario', 'assinatura', 'imoveis'}} do que vence em `dias` e ainda não foi avisado."""
+    from .models import Assinatura, Imovel, LembreteExpiracao
+
+    limite = agora + timedelta(days=dias)
+    assinaturas = Assinatura.objects.filter(
+        status=Assinatura.StatusAssinatura.ATIVA, data_expiracao__gte=agora, data_expiracao__lt=limite,
+    ).exclude(usuario=None).exclude(usuario__email='').filter(
+        ~Exists(LembreteExpiracao.objects.filter(assinatura=OuterRef('pk'), vencimento=OuterRef('data_expiracao')))
+    ).select_related('usuario', 'plano')
+    imoveis = Imovel.objects.filter(
+        status_publicacao=Imovel.StatusPublicacao.ATIVO, data_expiracao__gte=agora, data_expiracao__lt=limite,
+    ).exclude(proprietario__email='').filter(
+        ~Exists(LembreteExpiracao.objects.filter(imovel=OuterRef('pk'), vencimento=OuterRef('data_expiracao')))
+    ).select_related('proprietario').only(
+        'id', 'titulo', 'data_expiracao',
+        'proprietario__id', 'proprietario__email', 'proprietario__first_name', 'proprietario__username',
+    ).order_by('data_expiracao')
+
+    avisos = {}
+    for assinatura in assinaturas:
+        avisos[assinatura.usuario_id] = {'usuario': assinatura.usuario, 'assinatura': assinatura, 'imoveis': []}
+    for imovel in imoveis:
+        aviso = avisos.setdefault(
+            imovel.proprietario_id, {'usuario': imovel.proprietario, 'assinatura': None, 'imoveis': []}
+        )
+        aviso['imoveis'].append(imovel)
+    return avisos
+
+
+def _mensagem(aviso, site, conexao):
+    usuario = aviso['usuario']
+    contexto = {
+        **aviso,
+        'nome': usuario.first_name or usuario.username,
+        'url_meus_imoveis': f"https://{site.domain}{reverse('meus_imoveis')}",
+        'url_planos': f"https://{site.domain}{reverse('listar_planos')}",
+    }
+    if aviso['assinatura']:
+        assunto = "Sua assinatura DOCELARMS vence em breve"
+    elif len(aviso['imoveis']) == 1:
+        assunto = "Seu anúncio no DOCELARMS vence em breve"
+    else:
+        assunto = f"{len(aviso['imoveis'])} anúncios seus no DOCELARMS vencem em breve"
+    corpo = render_to_string('imoveis/emails/lembrete_expiracao.txt', contexto)
+    return EmailMessage(assunto, corpo, to=[usuario.email], connection=conexao)
+
+
+def _registros(aviso):
+    from .models import LembreteExpiracao
+
+    if aviso['assinatura']:
+        yield LembreteExpiracao(assinatura=aviso['assinatura'], vencimento=aviso['assinatura'].data_expiracao)
+    for imovel in aviso['imoveis']:
+        yield LembreteExpiracao(imovel=imovel, vencimento=imovel.data_expiracao)
+
+
+def _reabrir(conexao):
+    """Fecha e abre de novo a conexão SMTP; False se o servidor não aceitou."""
+    try:
+        conexao.close()
+        conexao.open()
+    except Exception as e:
+        print(f"Erro ao reconectar ao servidor de e-mail: {e}")
+        return False
+    return True
+
+
+def enviar_lembretes(dias=DIAS_PADRAO, agora=None, simular=False):
+    """
+    Envia os avisos pendentes. Devolve (e-mails enviados, itens avisados, falhas).
+    Com `simular`, só conta o que seria enviado.
+    """
+    from .models import LembreteExpiracao
+
+    avisos = list(_pendentes(agora or timezone.now(), dias).values())
+    if simular or not avisos:
+        return len(avisos), sum(bool(a['assinatura']) + len(a['imoveis']) for a in avisos), 0
+
+    site = Site.objects.get_current()
+    conexao = get_connection()
+    enviados, falhas, registros, itens = 0, 0, [], 0
+
+    def gravar():
+        LembreteExpiracao.objects.bulk_create(registros, ignore_conflicts=True)
+        registros.clear()
+
+    conexao.open()
+    try:
+        for posicao, aviso in enumerate(avisos):
+            mensagem = _mensagem(aviso, site, conexao)
+            try:
+                aceitas = conexao.send_messages([mensagem])
+            except Exception as e:
+                print(f"Erro ao enviar lembrete para {aviso['usuario'].email}: {e}")
+                # A conexão pode ter caído: abre outra para os próximos
+                if not _reabrir(conexao):
+                    restantes = len(avisos) - posicao
+                    print(f"{restantes} lembrete(s) ficam para a próxima execução.")
+                    falhas += restantes
+                    break
+                falhas += 1
+                continue
+            if not aceitas:
+                print(f"Lembrete para {aviso['usuario'].email} não foi aceito pelo servidor.")
+                falhas += 1
+                continue
+            enviados += 1
+            novos = list(_registros(aviso))
+            itens += len(novos)
+            registros.extend(novos)
+            if len(registros) >= LOTE_REGISTRO:
+                gravar()
+    finally:
+        gravar()
+        conexao.close()
+    return enviados, itens, falhas
@@ -0,0 +1,98 @@
+# imoveis/management/commands/_sinteticos.py
+"""
+Gerador de imóveis falsos para os comandos de EXPLAIN e benchmark.
+
+Os comandos chamam isto dentro de transaction.atomic() e desfazem tudo no
+final (ver `executar_com_rollback`), então nada fica gravado no banco.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from imoveis.models import Imovel, Bairro
+from imoveis.busca_texto import normalizar_texto
+from imoveis.geo import celula
+
+# Vocabulário das descrições falsas (para a busca por palavra-chave ter o que achar)
+PALAVRAS = (
+    'piscina', 'churrasqueira', 'varanda', 'gourmet', 'condomínio', 'fechado', 'portaria',
+    'jardim', 'quintal', 'garagem', 'sol', 'nascente', 'reformado', 'mobiliado', 'vista',
+    'academia', 'playground', 'escritório', 'lavanderia', 'edícula', 'sobrado', 'térreo',
+)
+
+# Os pontos falsos caem numa área do tamanho de Campo Grande (~25 x 25 km)
+CENTRO_SINTETICO = (-20.4697, -54.6201)
+ESPALHAMENTO_GRAUS = 0.12
+
+
+class _Rollback(Exception):
+    """Usada para desfazer os dados sintéticos no fim do comando."""
+
+
+def executar_com_rollback(funcao):
+    """Executa `funcao()` numa transação que sempre é desfeita no final."""
+    resultado = None
+    try:
+        with transaction.atomic():
+            resultado = funcao()
+            raise _Rollback()
+    except _Rollback:
+        pass
+    return resultado
+
+
+def popular(quantidade, status_aleatorio=True, lote_tamanho=5000):
+    """Insere `quantidade` imóveis sintéticos (bulk_create em lotes) e atualiza as estatísticas do banco."""
+    User = get_user_model()
+    dono = User.objects.create(username=f'sintetico_{random.randint(0, 10**9)}')
+    agora = timezone.now()
+    status = [s for s, _ in Imovel.StatusPublicacao.choices] if status_aleatorio else ['ATIVO']
+    bairros = list(Bairro.objects.values_list('id', 'cidade_id')) or [(None, None)]
+
+    lote = []
+    for i in range(quantidade):
+        bairro_id, cidade_id = random.choice(bairros)
+        titulo = f"Imóvel sintético {i}"
+        descricao = ' '.join(random.sample(PALAVRAS, 6))
+        imovel = Imovel(
+            proprietario=dono,
+            titulo=titulo,
+            descricao=descricao,
+            # bulk_create não passa pelo save(): os campos derivados são montados aqui
+            documento_busca=normalizar_texto(f"{titulo} {descricao}"),
+            finalidade=random.choice(['VENDA', 'ALUGUEL']),
+            cidade_id=cidade_id,
+            bairro_id=bairro_id,
+            preco=random.randint(50_000, 2_000_000),
+            quartos=random.randint(0, 5),
+            suites=random.randint(0, 3),
+            banheiros=random.randint(1, 4),
+            salas=random.randint(1, 3),
+            cozinhas=random.randint(1, 2),
+            closets=random.randint(0, 2),
+            area=random.randint(30, 600),
+            destaque=random.random() < 0.05,
+            status_publicacao=random.choice(status),
+            data_expiracao=agora + timedelta(days=random.randint(-60, 180)),
+        )
+        imovel.preco_m2 = imovel.calcular_preco_m2()
+        imovel.latitude = CENTRO_SINTETICO[0] + random.uniform(-ESPALHAMENTO_GRAUS, ESPALHAMENTO_GRAUS)
+        imovel.longitude = CENTRO_SINTETICO[1] + random.uniform(-ESPALHAMENTO_GRAUS, ESPALHAMENTO_GRAUS)
+        imovel.celula_geo = celula(imovel.latitude, imovel.longitude)
+        lote.append(imovel)
+        if len(lote) == lote_tamanho:
+            Imovel.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        Imovel.objects.bulk_create(lote)
+
+    # Atualiza as estatísticas do planejador para ele enxergar o volume novo
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'ANALYZE {Imovel._meta.db_table}')
+        elif connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+    return dono
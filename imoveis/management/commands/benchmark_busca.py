@@ -0,0 +1,62 @@
+# imoveis/management/commands/benchmark_busca.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from imoveis.models import Imovel
+from imoveis.busca_texto import ids_por_relevancia, termos_busca
+from ._sinteticos import executar_com_rollback, popular
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a busca por palavra-chave com o índice de texto (FTS5/GIN) contra o antigo '
+        "LIKE '%...%', em tamanhos crescentes de tabela."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', default='10000,30000,100000',
+                            help='Quantidades acumuladas de imóveis sintéticos. Ex: 10000,30000,100000')
+        parser.add_argument('--repeticoes', type=int, default=10)
+
+    def handle(self, *args, **options):
+        tamanhos = sorted(int(t) for t in options['tamanhos'].split(','))
+        self.stdout.write(self.style.NOTICE(f"Banco: {connection.vendor}"))
+
+        def medir_tudo():
+            inseridos = 0
+            self.stdout.write(f"{'imóveis':>10}{'busca':>30}{'achados':>10}{'índice (ms)':>14}{'LIKE (ms)':>12}")
+            for tamanho in tamanhos:
+                popular(tamanho - inseridos, status_aleatorio=False)
+                inseridos = tamanho
+                for busca in ('piscina', 'varanda gourmet', 'condominio fechado portaria'):
+                    self.medir(tamanho, busca, options['repeticoes'])
+
+        executar_com_rollback(medir_tudo)
+        self.stdout.write(self.style.SUCCESS("Dados sintéticos removidos (rollback)."))
+
+    def medir(self, tamanho, busca, repeticoes):
+        base = Imovel.objects.filter(status_publicacao='ATIVO', data_expiracao__gt=timezone.now())
+
+        def via_indice():
+            return ids_por_relevancia(base, busca)
+
+        def via_like():
+            # O que o admin/ORM faria sem o índice: LIKE em cada coluna, por termo
+            qs = base
+            for termo in termos_busca(busca):
+                qs = qs.filter(documento_busca__icontains=termo)
+            return list(qs.order_by('-destaque', '-data_cadastro', '-id').values_list('id', flat=True)[:1000])
+
+        achados = len(via_indice())
+        tempo_indice = self.cronometrar(via_indice, repeticoes)
+        tempo_like = self.cronometrar(via_like, repeticoes)
+        self.stdout.write(f"{tamanho:>10}{busca:>30}{achados:>10}{tempo_indice:>14.2f}{tempo_like:>12.2f}")
+
+    def cronometrar(self, funcao, repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        return (time.perf_counter() - inicio) * 1000 / repeticoes
@@ -0,0 +1,113 @@
+# imoveis/management/commands/benchmark_buscas_salvas.py
+import random
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from imoveis.models import Imovel, Bairro, BuscaSalva
+from imoveis.buscas_salvas import CAMPOS_IMOVEL, carregar_indice
+from imoveis.filtros import aplicar_filtros
+from ._sinteticos import CENTRO_SINTETICO, ESPALHAMENTO_GRAUS, PALAVRAS, executar_com_rollback, popular
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o casamento de um lote de imóveis aprovados com as buscas salvas: índice invertido '
+        '(cidade, finalidade, bairro) em memória contra uma consulta por busca salva.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buscas', type=int, default=50000,
+                            help='Quantas buscas salvas falsas inserir (desfeitas no final).')
+        parser.add_argument('--imoveis', type=int, default=200,
+                            help='Tamanho do lote de imóveis aprovados.')
+        parser.add_argument('--amostra', type=int, default=500,
+                            help='Quantas buscas rodar uma a uma (o tempo total é extrapolado).')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE(f"Banco: {connection.vendor}"))
+
+        def medir_tudo():
+            self.stdout.write(f"Inserindo {options['imoveis']} imóveis e {options['buscas']} buscas salvas...")
+            popular(options['imoveis'], status_aleatorio=False)
+            self.popular_buscas(options['buscas'])
+            lote = list(Imovel.objects.vitrine().order_by('-id').values_list('id', flat=True)[:options['imoveis']])
+            self.medir(lote, options['amostra'])
+
+        executar_com_rollback(medir_tudo)
+        self.stdout.write(self.style.SUCCESS("Dados sintéticos removidos (rollback)."))
+
+    def popular_buscas(self, quantidade, lote_tamanho=5000):
+        random.seed('buscas_salvas')
+        usuario = get_user_model().objects.create(username=f'buscador_{random.randint(0, 10**9)}')
+        bairros = list(Bairro.objects.values_list('id', 'cidade_id')) or [(None, None)]
+
+        def criterios():
+            bairro_id, cidade_id = random.choice(bairros)
+            c = {}
+            if cidade_id and random.random() < 0.8:
+                c['cidade'] = str(cidade_id)
+                if bairro_id and random.random() < 0.3:
+                    c['bairro'] = str(bairro_id)
+            if random.random() < 0.7:
+                c['finalidade'] = random.choice(['VENDA', 'ALUGUEL'])
+            if random.random() < 0.5:
+                c['quartos'] = str(random.randint(1, 4))
+            if random.random() < 0.5:
+                c['preco_max'] = str(random.randint(100, 2000) * 1000)
+            if random.random() < 0.2:
+                c['area'] = str(random.randint(50, 300))
+            if random.random() < 0.1:
+                c['q'] = random.choice(PALAVRAS)
+            if random.random() < 0.1:
+                c['lat'] = str(CENTRO_SINTETICO[0] + random.uniform(-ESPALHAMENTO_GRAUS, ESPALHAMENTO_GRAUS))
+                c['lng'] = str(CENTRO_SINTETICO[1] + random.uniform(-ESPALHAMENTO_GRAUS, ESPALHAMENTO_GRAUS))
+                c['raio'] = str(random.choice([2, 5, 10]))
+            return c
+
+        lote = []
+        for i in range(quantidade):
+            lote.append(BuscaSalva(usuario=usuario, nome=f'Busca sintética {i}', criterios=criterios()).preencher_chaves())
+            if len(lote) == lote_tamanho:
+                BuscaSalva.objects.bulk_create(lote)
+                lote = []
+        if lote:
+            BuscaSalva.objects.bulk_create(lote)
+
+    def medir(self, lote, amostra):
+        # Índice invertido: uma consulta para as buscas candidatas, o resto em memória
+        inicio = time.perf_counter()
+        imoveis = list(Imovel.objects.filter(id__in=lote).values(*CAMPOS_IMOVEL))
+        indice = carregar_indice(imoveis)
+        casados = defaultdict(set)
+        for imovel in imoveis:
+            for busca_id in indice.casar(imovel):
+                casados[busca_id].add(imovel['id'])
+        tempo_indice = time.perf_counter() - inicio
+
+        # Uma consulta por busca salva (só uma amostra; o total é extrapolado)
+        buscas = list(BuscaSalva.objects.values_list('id', 'criterios'))
+        random.seed('amostra')
+        sorteadas = random.sample(buscas, min(amostra, len(buscas)))
+        base = Imovel.objects.filter(id__in=lote)
+        divergencias = 0
+        inicio = time.perf_counter()
+        for busca_id, criterios in sorteadas:
+            pelo_banco = set(aplicar_filtros(base, criterios).values_list('id', flat=True))
+            if pelo_banco != casados.get(busca_id, set()):
+                divergencias += 1
+        tempo_amostra = time.perf_counter() - inicio
+        tempo_por_busca = tempo_amostra / max(len(sorteadas), 1)
+
+        pares = sum(len(ids) for ids in casados.values())
+        self.stdout.write(f"Buscas candidatas carregadas: {indice.total} de {len(buscas)}; pares encontrados: {pares}")
+        self.stdout.write(f"{'índice invertido (lote inteiro)':>40}: {tempo_indice * 1000:>10.1f} ms")
+        self.stdout.write(
+            f"{'uma consulta por busca (extrapolado)':>40}: {tempo_por_busca * len(buscas) * 1000:>10.1f} ms"
+            f"  ({tempo_por_busca * 1000:.2f} ms x {len(buscas)})"
+        )
+        if divergencias:
+            self.stdout.write(self.style.ERROR(f"{divergencias} busca(s) da amostra com resultado diferente do banco."))
@@ -0,0 +1,104 @@
+# imoveis/management/commands/benchmark_geo.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from imoveis.models import Imovel
+from imoveis.geo import Area, filtrar_area
+from ._sinteticos import CENTRO_SINTETICO, ESPALHAMENTO_GRAUS, executar_com_rollback, popular
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a busca por caixa/raio pelas faixas de celula_geo (índice da grade) contra a '
+        'comparação direta de latitude/longitude, com imóveis sintéticos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sinteticos', type=int, default=100000,
+                            help='Quantos imóveis ATIVOS falsos inserir (desfeitos no final).')
+        parser.add_argument('--repeticoes', type=int, default=20,
+                            help='Quantos pontos aleatórios por cenário.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE(f"Banco: {connection.vendor}"))
+
+        def medir_tudo():
+            self.stdout.write(f"Inserindo {options['sinteticos']} imóveis sintéticos...")
+            popular(options['sinteticos'], status_aleatorio=False)
+            self.stdout.write(f"{'cenário':>22}{'achados (média)':>18}{'grade (ms)':>14}{'lat/lng (ms)':>15}")
+            for nome, fabricar in self.cenarios():
+                self.medir(nome, fabricar, options['repeticoes'])
+
+        executar_com_rollback(medir_tudo)
+        self.stdout.write(self.style.SUCCESS("Dados sintéticos removidos (rollback)."))
+
+    def cenarios(self):
+        def ponto():
+            return (
+                CENTRO_SINTETICO[0] + random.uniform(-ESPALHAMENTO_GRAUS, ESPALHAMENTO_GRAUS),
+                CENTRO_SINTETICO[1] + random.uniform(-ESPALHAMENTO_GRAUS, ESPALHAMENTO_GRAUS),
+            )
+
+        def caixa(lado_graus):
+            def fabricar():
+                latitude, longitude = ponto()
+                return Area(latitude, longitude, latitude + lado_graus, longitude + lado_graus)
+            return fabricar
+
+        def raio(km):
+            return lambda: Area.do_raio(*ponto(), km)
+
+        return [
+            ('raio 1 km', raio(1)),
+            ('raio 3 km', raio(3)),
+            ('raio 10 km', raio(10)),
+            ('caixa ~2 x 2 km', caixa(0.02)),
+            ('caixa ~10 x 10 km', caixa(0.1)),
+        ]
+
+    def medir(self, nome, fabricar, repeticoes):
+        base = Imovel.objects.filter(status_publicacao='ATIVO', data_expiracao__gt=timezone.now())
+        random.seed(nome)
+        areas = [fabricar() for _ in range(repeticoes)]
+
+        def pela_grade(area):
+            return list(filtrar_area(base, area).values_list('id', flat=True))
+
+        def sem_grade(area):
+            # O que se faria sem a coluna de célula: só as comparações de latitude/longitude
+            area_sem_faixas = _SemFaixas(area)
+            return list(filtrar_area(base, area_sem_faixas).values_list('id', flat=True))
+
+        achados = 0
+        tempos = {'grade': 0.0, 'latlng': 0.0}
+        for area in areas:
+            inicio = time.perf_counter()
+            ids_grade = pela_grade(area)
+            tempos['grade'] += time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            ids_latlng = sem_grade(area)
+            tempos['latlng'] += time.perf_counter() - inicio
+
+            if sorted(ids_grade) != sorted(ids_latlng):
+                self.stdout.write(self.style.ERROR(f"{nome}: resultados diferentes ({len(ids_grade)} x {len(ids_latlng)})"))
+            achados += len(ids_grade)
+
+        self.stdout.write(
+            f"{nome:>22}{achados / repeticoes:>18.0f}"
+            f"{tempos['grade'] * 1000 / repeticoes:>14.2f}{tempos['latlng'] * 1000 / repeticoes:>15.2f}"
+        )
+
+
+class _SemFaixas(Area):
+    """A mesma área, mas sem o filtro por faixas de célula (filtrar_area só compara latitude/longitude)."""
+
+    def __init__(self, area):
+        super().__init__(area.sul, area.oeste, area.norte, area.leste, area.centro, area.raio_km)
+
+    def faixas(self):
+        return []
@@ -0,0 +1,88 @@
+# imoveis/management/commands/benchmark_vitrine.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+from django.utils import timezone
+
+from imoveis.models import Imovel, Cidade
+from imoveis.filtros import aplicar_filtros
+from imoveis.paginacao import ORDEM_VITRINE
+from imoveis.vitrine import IndiceVitrine, np
+from ._sinteticos import executar_com_rollback, popular
+
+
+class Command(BaseCommand):
+    help = 'Compara o tempo de busca da vitrine: ORM (banco) x índice NumPy em memória.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sinteticos', type=int, default=0,
+                            help='Insere N imóveis ATIVOS falsos (desfeitos no final). Ex: 100000')
+        parser.add_argument('--repeticoes', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if np is None:
+            self.stdout.write(self.style.ERROR("NumPy não está instalado; a vitrine em memória não está disponível."))
+            return
+
+        sinteticos = options['sinteticos']
+        if not sinteticos:
+            self.comparar(options['repeticoes'])
+            return
+
+        def com_dados_sinteticos():
+            self.stdout.write(f"Inserindo {sinteticos} imóveis sintéticos...")
+            popular(sinteticos, status_aleatorio=False)
+            self.comparar(options['repeticoes'])
+
+        executar_com_rollback(com_dados_sinteticos)
+        self.stdout.write(self.style.SUCCESS("Dados sintéticos removidos (rollback)."))
+
+    def cenarios(self):
+        cidade = Cidade.objects.filter(nome='Campo Grande').first() or Cidade.objects.first()
+        cidade_id = str(cidade.id) if cidade else '1'
+        return [
+            ('sem filtros', ''),
+            ('finalidade', 'finalidade=VENDA'),
+            ('cidade + quartos', f'cidade={cidade_id}&quartos=3'),
+            ('6 filtros', f'finalidade=ALUGUEL&cidade={cidade_id}&quartos=2&banheiros=2&area=100&preco_max=800000'),
+            ('12 filtros', f'finalidade=VENDA&cidade={cidade_id}&quartos=2&suites=1&banheiros=2&salas=1'
+                           f'&cozinhas=1&closets=1&area=80&preco_max=1500000'),
+        ]
+
+    def comparar(self, repeticoes):
+        agora = timezone.now()
+        base = Imovel.objects.filter(status_publicacao='ATIVO', data_expiracao__gt=agora)
+
+        inicio = time.perf_counter()
+        indice = IndiceVitrine()
+        indice.construir()
+        self.stdout.write(f"Construção do índice: {(time.perf_counter() - inicio) * 1000:.1f} ms "
+                          f"({indice._n} imóveis ativos)")
+
+        self.stdout.write(f"{'cenário':<18}{'resultados':>12}{'ORM (ms)':>12}{'NumPy (ms)':>12}{'ganho':>8}")
+        for nome, querystring in self.cenarios():
+            params = QueryDict(querystring)
+
+            def via_orm():
+                qs = aplicar_filtros(base, params).order_by(*ORDEM_VITRINE)
+                return qs.count(), list(qs[:50])
+
+            def via_vitrine():
+                resultado = indice.buscar(params, agora, base)
+                return resultado.total(), resultado.fatia(0, 50)
+
+            total_orm, pagina_orm = via_orm()
+            total_np, pagina_np = via_vitrine()
+            if total_orm != total_np or [i.id for i in pagina_orm] != [i.id for i in pagina_np]:
+                self.stdout.write(self.style.ERROR(f"DIVERGÊNCIA em '{nome}': ORM={total_orm} NumPy={total_np}"))
+
+            tempo_orm = self.cronometrar(via_orm, repeticoes)
+            tempo_np = self.cronometrar(via_vitrine, repeticoes)
+            self.stdout.write(f"{nome:<18}{total_orm:>12}{tempo_orm:>12.2f}{tempo_np:>12.2f}{tempo_orm / tempo_np:>7.1f}x")
+
+    def cronometrar(self, funcao, repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        return (time.perf_counter() - inicio) * 1000 / repeticoes
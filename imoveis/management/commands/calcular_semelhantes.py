@@ -0,0 +1,34 @@
+# imoveis/management/commands/calcular_semelhantes.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from imoveis import semelhantes
+from imoveis.semelhantes import SEMELHANTES_POR_IMOVEL, calcular_semelhantes
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula os "Imóveis semelhantes" do detalhe (vizinhos mais próximos por cidade e finalidade, '
+        'com NumPy). Pula as cidades sem mudança e, nas outras, só refaz as linhas que os imóveis alterados '
+        '(atualizado_em) ou que saíram alcançam; rode com --tudo de vez em quando para refazer do zero.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=SEMELHANTES_POR_IMOVEL,
+                            help=f'Quantos semelhantes guardar por imóvel (padrão: {SEMELHANTES_POR_IMOVEL}).')
+        parser.add_argument('--tudo', action='store_true',
+                            help='Recalcula todas as cidades do zero, mesmo as que não mudaram.')
+
+    def handle(self, *args, **options):
+        if semelhantes.np is None:
+            raise CommandError("NumPy não está instalado (pip install numpy).")
+        if options['k'] < 1:
+            raise CommandError("--k precisa ser pelo menos 1.")
+
+        inicio = time.perf_counter()
+        recalculadas, puladas, gravadas = calcular_semelhantes(k=options['k'], tudo=options['tudo'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{recalculadas} cidade(s) recalculada(s), {puladas} sem mudança; "
+            f"{gravadas} semelhantes gravados em {time.perf_counter() - inicio:.1f}s."
+        ))
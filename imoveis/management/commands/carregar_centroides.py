@@ -0,0 +1,80 @@
+# imoveis/management/commands/carregar_centroides.py
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from imoveis.models import Imovel, Cidade, Bairro
+from imoveis.catalogo import incrementar_versao_catalogo
+from imoveis.geo import centroides, localizar
+
+ARQUIVO_PADRAO = Path(__file__).resolve().parents[2] / 'dados' / 'centroides.csv'
+LOTE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Carrega os centroides de cidades/bairros de um CSV (estado,cidade,bairro,latitude,longitude) '
+        'e relocaliza os imóveis sem ponto exato.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', nargs='?', default=str(ARQUIVO_PADRAO),
+                            help=f'CSV do gazetteer (padrão: {ARQUIVO_PADRAO})')
+
+    def handle(self, *args, **options):
+        caminho = Path(options['arquivo'])
+        if not caminho.exists():
+            raise CommandError(f"Arquivo não encontrado: {caminho}")
+
+        cidades, bairros, nao_encontrados = self.carregar(caminho)
+        self.stdout.write(self.style.SUCCESS(f"{cidades} cidades e {bairros} bairros com centroide atualizado."))
+        for linha in nao_encontrados:
+            self.stdout.write(self.style.WARNING(f"Não encontrado no banco: {linha}"))
+
+        relocalizados = self.relocalizar()
+        # bulk_update não dispara sinais: invalida o cache da vitrine manualmente
+        incrementar_versao_catalogo()
+        self.stdout.write(self.style.SUCCESS(f"{relocalizados} imóveis relocalizados."))
+
+    def carregar(self, caminho):
+        cidades = bairros = 0
+        nao_encontrados = []
+        with caminho.open(encoding='utf-8') as arquivo:
+            linhas = csv.DictReader(linha for linha in arquivo if linha.strip() and not linha.startswith('#'))
+            for linha in linhas:
+                ponto = {'latitude': float(linha['latitude']), 'longitude': float(linha['longitude'])}
+                cidade = Cidade.objects.filter(nome=linha['cidade'], estado=linha['estado']).first()
+                if cidade is None:
+                    nao_encontrados.append(f"{linha['cidade']}/{linha['estado']}")
+                    continue
+                if not linha['bairro']:
+                    Cidade.objects.filter(pk=cidade.pk).update(**ponto)
+                    cidades += 1
+                elif Bairro.objects.filter(cidade=cidade, nome=linha['bairro']).update(**ponto):
+                    bairros += 1
+                else:
+                    nao_encontrados.append(f"{linha['bairro']} ({linha['cidade']})")
+        return cidades, bairros, nao_encontrados
+
+    def relocalizar(self):
+        """Refaz latitude/longitude/celula_geo dos imóveis aproximados ou ainda sem localização."""
+        mapas = centroides()
+        campos = ['latitude', 'longitude', 'localizacao_aproximada', 'celula_geo']
+        pendentes = Imovel.objects.filter(
+            Q(localizacao_aproximada=True) | Q(latitude=None) | Q(celula_geo=None)
+        ).only('id', 'cidade_id', 'bairro_id', *campos)
+
+        total = 0
+        lote = []
+        for imovel in pendentes.iterator(chunk_size=LOTE):
+            lote.append(localizar(imovel, mapas))
+            if len(lote) == LOTE:
+                Imovel.objects.bulk_update(lote, campos)
+                total += len(lote)
+                lote = []
+        if lote:
+            Imovel.objects.bulk_update(lote, campos)
+            total += len(lote)
+        return total
@@ -0,0 +1,25 @@
+# imoveis/management/commands/compactar_visualizacoes.py
+from django.core.management.base import BaseCommand, CommandError
+
+from imoveis.estatisticas import DIAS_MANTIDOS, compactar, limite_compactacao
+
+
+class Command(BaseCommand):
+    help = (
+        'Compacta as visualizações diárias antigas em totais por mês (ImovelVisualizacaoMensal). '
+        'Só fecha meses inteiros; rode uma vez por mês (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=DIAS_MANTIDOS,
+                            help=f'Quantos dias recentes continuam diários, no mínimo (padrão: {DIAS_MANTIDOS}).')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 31:
+            raise CommandError("--dias precisa ser pelo menos 31 (o painel mostra os últimos 30 dias).")
+
+        antes_de = limite_compactacao(dias_mantidos=options['dias'])
+        apagados, meses = compactar(antes_de)
+        self.stdout.write(self.style.SUCCESS(
+            f"{apagados} dia(s) antes de {antes_de:%d/%m/%Y} compactado(s) em {meses} total(is) mensal(is)."
+        ))
@@ -0,0 +1,18 @@
+# imoveis/management/commands/descarregar_visualizacoes.py
+from django.core.management.base import BaseCommand
+
+from imoveis.contador import INTERVALO_SEGUNDOS, descarregar
+
+
+class Command(BaseCommand):
+    help = (
+        'Mescla os visitantes únicos acumulados no cache (sketches HyperLogLog, imoveis/contador.py) '
+        f'no banco e grava as visualizações com um UPDATE ... CASE por lote. Rode a cada {INTERVALO_SEGUNDOS}s ou mais (cron); lê o '
+        'buffer no Redis (settings.CACHE_COMPARTILHADO); sem Redis as visitas já vão direto ao banco e não há o que descarregar.'
+    )
+
+    def handle(self, *args, **options):
+        totais = descarregar()
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(totais.values())} visitante(s) novo(s) gravado(s) em {len(totais)} imóvel(is)."
+        ))
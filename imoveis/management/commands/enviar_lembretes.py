@@ -0,0 +1,30 @@
+# imoveis/management/commands/enviar_lembretes.py
+from django.core.management.base import BaseCommand, CommandError
+
+from imoveis.lembretes import DIAS_PADRAO, enviar_lembretes
+
+
+class Command(BaseCommand):
+    help = (
+        'Avisa por e-mail os donos de assinaturas e anúncios que vencem nos próximos dias '
+        '(uma conexão SMTP para todas as mensagens). O que já foi avisado não é enviado de novo. '
+        'Rode uma vez por dia (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=DIAS_PADRAO,
+                            help=f'Avisar o que vence nos próximos N dias (padrão: {DIAS_PADRAO}).')
+        parser.add_argument('--simular', action='store_true',
+                            help='Só conta os e-mails que seriam enviados.')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1:
+            raise CommandError("--dias precisa ser pelo menos 1.")
+
+        enviados, itens, falhas = enviar_lembretes(dias=options['dias'], simular=options['simular'])
+        if options['simular']:
+            self.stdout.write(f"{enviados} e-mail(s) seriam enviados ({itens} vencimento(s)).")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{enviados} e-mail(s) enviado(s) ({itens} vencimento(s) avisado(s)); {falhas} falha(s)."
+        ))
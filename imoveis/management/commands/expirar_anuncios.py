@@ -0,0 +1,23 @@
+# imoveis/management/commands/expirar_anuncios.py
+from django.core.management.base import BaseCommand
+
+from imoveis.expiracao import INTERVALO_SEGUNDOS, LOTE, expirar
+
+
+class Command(BaseCommand):
+    help = (
+        'Expira assinaturas vencidas (e os anúncios dos donos delas) e os anúncios vencidos, '
+        f'em UPDATEs de até {LOTE} linhas. Rode a cada {INTERVALO_SEGUNDOS}s (cron) ou ligue '
+        'EXPIRACAO_EM_THREAD.'
+    )
+
+    def handle(self, *args, **options):
+        resultado = expirar()
+        if resultado is None:
+            self.stdout.write(self.style.WARNING("Outra execução está em andamento; nada feito."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['assinaturas']} assinatura(s) expirada(s); "
+            f"{resultado['imoveis_assinatura']} imóvel(is) de assinatura vencida e "
+            f"{resultado['imoveis']} imóvel(is) vencido(s) expirado(s)."
+        ))
@@ -0,0 +1,77 @@
+# imoveis/management/commands/explicar_consultas.py
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from imoveis.models import Imovel, Assinatura, Parceiro
+from imoveis.busca_texto import ordenar_por_relevancia
+from imoveis.ordenacao import ORDENACOES
+from imoveis.geo import Area, filtrar_area
+from ._sinteticos import executar_com_rollback, popular
+
+
+class Command(BaseCommand):
+    help = (
+        'Imprime o EXPLAIN das consultas principais (vitrine, sitemap, expiração, meus imóveis, parceiros) '
+        'para confirmar que os índices estão sendo usados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sinteticos', type=int, default=0,
+            help='Insere N imóveis falsos numa transação (desfeita no final) antes do EXPLAIN. Ex: 100000',
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Executa as consultas de verdade (EXPLAIN ANALYZE no PostgreSQL).',
+        )
+
+    def handle(self, *args, **options):
+        sinteticos = options['sinteticos']
+        self.stdout.write(self.style.NOTICE(f"Banco: {connection.vendor}"))
+
+        if not sinteticos:
+            self.imprimir_planos(options['analyze'])
+            return
+
+        def com_dados_sinteticos():
+            self.stdout.write(f"Inserindo {sinteticos} imóveis sintéticos...")
+            popular(sinteticos)
+            self.imprimir_planos(options['analyze'])
+
+        executar_com_rollback(com_dados_sinteticos)
+        self.stdout.write(self.style.SUCCESS(f"{sinteticos} imóveis sintéticos removidos (rollback)."))
+
+    # --- Planos ---
+    def consultas(self):
+        agora = timezone.now()
+        ativos = Imovel.objects.filter(status_publicacao='ATIVO', data_expiracao__gt=agora)
+        ordens = [
+            (f'lista_imoveis (?ordem={nome})', ativos.order_by(*ordenacao.order_by())[:50])
+            for nome, ordenacao in ORDENACOES.items() if nome != 'recentes'
+        ]
+        return [
+            ('lista_imoveis (vitrine)', ativos.order_by('-destaque', '-data_cadastro')[:50]),
+            *ordens,
+            ('lista_imoveis (busca ?q=)', ordenar_por_relevancia(ativos, 'piscina varanda').values('id')[:1000]),
+            ('lista_imoveis (raio ?lat=&lng=&raio=3)', filtrar_area(ativos, Area.do_raio(-20.4697, -54.6201, 3)).values('id')),
+            ('ImovelSitemap.items', ativos.order_by('-data_cadastro')),
+            ('Expiração: imóveis vencidos', Imovel.objects.filter(status_publicacao='ATIVO', data_expiracao__lt=agora)),
+            ('Expiração: assinaturas vencidas', Assinatura.objects.filter(status='ATIVA', data_expiracao__lt=agora)),
+            ('Expiração: imóveis de assinatura vencida', Imovel.objects.filter(
+                status_publicacao='ATIVO', proprietario__assinatura__status='EXPIRADA').order_by('id').values('id')[:1000]),
+            ('meus_imoveis', Imovel.objects.filter(proprietario_id=1).order_by('-data_cadastro')),
+            ('listar_parceiros', Parceiro.objects.filter(status=Parceiro.Status.APROVADO).order_by('nome')),
+            ('listar_parceiros (nicho)', Parceiro.objects.filter(status=Parceiro.Status.APROVADO, nicho_id=1).order_by('nome')),
+        ]
+
+    def imprimir_planos(self, analyze):
+        extra = {}
+        if analyze and connection.vendor == 'postgresql':
+            extra = {'analyze': True, 'buffers': True}
+
+        for titulo, queryset in self.consultas():
+            self.stdout.write(self.style.SUCCESS(f"\n=== {titulo} ==="))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(self.style.NOTICE("--- plano ---"))
+            self.stdout.write(queryset.explain(**extra))
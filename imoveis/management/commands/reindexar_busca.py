@@ -0,0 +1,44 @@
+# imoveis/management/commands/reindexar_busca.py
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from imoveis.models import Imovel
+from imoveis.busca_texto import montar_documento_busca, garantir_indice_texto, TABELA_FTS
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula o documento de busca de todos os imóveis e reconstrói o índice de texto. '
+        'Use depois de alterações em massa (QuerySet.update, importações, renomear cidade/bairro).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500)
+
+    def handle(self, *args, **options):
+        lote_tamanho = options['lote']
+        imoveis = Imovel.objects.select_related('cidade', 'bairro').only(
+            'id', 'titulo', 'descricao', 'endereco', 'documento_busca', 'cidade__nome', 'bairro__nome',
+        ).order_by('id')
+
+        alterados = []
+        total = 0
+        for imovel in imoveis.iterator(chunk_size=lote_tamanho):
+            documento = montar_documento_busca(imovel)
+            if documento != imovel.documento_busca:
+                imovel.documento_busca = documento
+                alterados.append(imovel)
+            if len(alterados) >= lote_tamanho:
+                Imovel.objects.bulk_update(alterados, ['documento_busca'])
+                total += len(alterados)
+                alterados = []
+        if alterados:
+            Imovel.objects.bulk_update(alterados, ['documento_busca'])
+            total += len(alterados)
+
+        garantir_indice_texto()
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')")
+
+        self.stdout.write(self.style.SUCCESS(f"Índice de busca atualizado ({total} documentos alterados)."))
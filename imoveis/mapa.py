@@ -0,0 +1,130 @@
+# imoveis/mapa.py
+"""
+Agrupamento (clusters) dos imóveis para o mapa: GET /api/mapa/?caixa=...&zoom=N
+
+Em vez de mandar um marcador por imóvel, o servidor agrupa os imóveis numa
+grade cujo tamanho depende do zoom (múltiplos das células de celula_geo,
+imoveis/geo.py) e devolve, por grupo: quantidade, centro médio e faixa de
+preço. O agrupamento é UM GROUP BY sobre celula_geo:
+
+    SELECT celula_geo / (36000 * f)            AS linha,
+           (celula_geo - celula_geo / 36000 * 36000) / f AS coluna,
+           COUNT(*), AVG(latitude), AVG(longitude), MIN(preco), MAX(preco)
+    ... GROUP BY linha, coluna
+
+O cache é por BLOCO (BLOCO_GRUPOS x BLOCO_GRUPOS grupos), zoom, filtros e
+versão do catálogo: ao arrastar o mapa, só os blocos que entraram na tela
+vão ao banco, e todos os que faltam saem na mesma consulta.
+"""
+import math
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, IntegerField, Max, Min, Q, Value
+from django.db.models.expressions import ExpressionWrapper
+
+from .catalogo import RESULTADO_CACHE_SEGUNDOS, chave_vitrine, versao_catalogo
+from .filtros import aplicar_filtros
+from .geo import COLUNAS_GRADE, PARAMETROS_AREA, coluna_grade, faixas_celulas, linha_grade
+
+ZOOM_MINIMO, ZOOM_MAXIMO = 3, 18
+# Um grupo mede ~1/4 de tile (64 px): 360° / 2^zoom / 4, em células de 0,01°
+CELULAS_POR_GRUPO_NO_ZOOM_0 = 9000
+BLOCO_GRUPOS = 8
+LIMITE_BLOCOS = 64
+
+
+def celulas_por_grupo(zoom):
+    """Lado do grupo em células da grade (potência de 2, no mínimo 1)."""
+    bruto = CELULAS_POR_GRUPO_NO_ZOOM_0 / 2 ** zoom
+    if bruto <= 1:
+        return 1
+    return 2 ** round(math.log2(bruto))
+
+
+def _agrupar(queryset, fator, blocos):
+    """
+    Um GROUP BY para todos os `blocos` (linha, coluna de bloco) de uma vez.
+    Devolve {bloco: [grupo, ...]} com uma lista (talvez vazia) para cada bloco pedido.
+    """
+    lado = fator * BLOCO_GRUPOS
+    linhas = [bloco[0] for bloco in blocos]
+    colunas = [bloco[1] for bloco in blocos]
+    linha_inicial, linha_final = min(linhas) * lado, (max(linhas) + 1) * lado - 1
+    coluna_inicial, coluna_final = min(colunas) * lado, (max(colunas) + 1) * lado - 1
+
+    # Linha/coluna da grade em aritmética inteira (MOD do SQLite devolve float)
+    linha = ExpressionWrapper(F('celula_geo') / Value(COLUNAS_GRADE), output_field=IntegerField())
+    coluna = ExpressionWrapper(
+        F('celula_geo') - F('celula_geo') / Value(COLUNAS_GRADE) * Value(COLUNAS_GRADE),
+        output_field=IntegerField(),
+    )
+    faixas = Q()
+    for inicio, fim in faixas_celulas(linha_inicial, linha_final, coluna_inicial, coluna_final):
+        faixas |= Q(celula_geo__range=(inicio, fim))
+
+    linhas_sql = (
+        queryset.filter(faixas)
+        .alias(coluna_celula=coluna)
+        .filter(coluna_celula__range=(coluna_inicial, coluna_final))
+        .annotate(
+            grupo_linha=ExpressionWrapper(linha / Value(fator), output_field=IntegerField()),
+            grupo_coluna=ExpressionWrapper(coluna / Value(fator), output_field=IntegerField()),
+        )
+        .order_by()
+        .values('grupo_linha', 'grupo_coluna')
+        .annotate(
+            total=Count('id'), latitude=Avg('latitude'), longitude=Avg('longitude'),
+            preco_min=Min('preco'), preco_max=Max('preco'), primeiro_id=Min('id'),
+        )
+    )
+
+    resultado = {bloco: [] for bloco in blocos}
+    for linha_sql in linhas_sql:
+        bloco = (linha_sql['grupo_linha'] // BLOCO_GRUPOS, linha_sql['grupo_coluna'] // BLOCO_GRUPOS)
+        if bloco not in resultado:
+            continue  # bloco dentro do retângulo consultado, mas já estava em cache
+        grupo = {
+            'n': linha_sql['total'],
+            'lat': round(linha_sql['latitude'], 5),
+            'lng': round(linha_sql['longitude'], 5),
+            'preco_min': linha_sql['preco_min'],
+            'preco_max': linha_sql['preco_max'],
+        }
+        if linha_sql['total'] == 1:
+            grupo['id'] = linha_sql['primeiro_id']  # um imóvel só: o mapa pode linkar direto
+        resultado[bloco].append(grupo)
+    return resultado
+
+
+def grupos_do_mapa(vitrine_ativa, params, area, zoom):
+    """
+    Grupos dos blocos que cobrem a `area` (imoveis/geo.Area) no `zoom`, com os
+    demais filtros do GET aplicados. Levanta ValueError se a área pedir blocos demais.
+    """
+    fator = celulas_por_grupo(zoom)
+    lado = fator * BLOCO_GRUPOS
+    linhas = range(linha_grade(area.sul) // lado, linha_grade(area.norte) // lado + 1)
+    colunas = range(coluna_grade(area.oeste) // lado, coluna_grade(area.leste) // lado + 1)
+    if len(linhas) * len(colunas) > LIMITE_BLOCOS:
+        raise ValueError("Área grande demais para o zoom pedido.")
+
+    # A caixa do mapa define os blocos; os outros filtros (cidade, preço...) entram na chave
+    filtros = params.copy()
+    for parametro in PARAMETROS_AREA + ('zoom',):
+        filtros.pop(parametro, None)
+
+    # Uma leitura da versão para todos os blocos: nada de chaves de versões diferentes no mesmo pedido
+    versao = versao_catalogo()
+    chaves = {
+        (linha, coluna): chave_vitrine(f'mapa:z{zoom}:b{linha}_{coluna}', filtros, versao)
+        for linha in linhas for coluna in colunas
+    }
+    em_cache = cache.get_many(chaves.values())
+    faltando = [bloco for bloco, chave in chaves.items() if chave not in em_cache]
+    if faltando:
+        calculados = _agrupar(aplicar_filtros(vitrine_ativa, filtros), fator, faltando)
+        novos = {chaves[bloco]: grupos for bloco, grupos in calculados.items()}
+        cache.set_many(novos, RESULTADO_CACHE_SEGUNDOS)
+        em_cache.update(novos)
+
+    return [grupo for chave in chaves.values() for grupo in em_cache[chave]]
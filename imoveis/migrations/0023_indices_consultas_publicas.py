@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0022_alter_nichoparceiro_options_remove_parceiro_logo_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assinatura',
+            index=models.Index(fields=['status', 'data_expiracao'], name='assinatura_status_exp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(condition=models.Q(('status_publicacao', 'ATIVO')), fields=['-destaque', '-data_cadastro', 'data_expiracao'], name='imovel_vitrine_ativo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(condition=models.Q(('status_publicacao', 'ATIVO')), fields=['-data_cadastro', 'data_expiracao'], name='imovel_sitemap_ativo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(fields=['status_publicacao', 'data_expiracao'], name='imovel_status_exp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(fields=['proprietario', '-data_cadastro'], name='imovel_dono_cadastro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(fields=['proprietario', 'status_publicacao'], name='imovel_dono_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parceiro',
+            index=models.Index(fields=['status', 'nicho', 'nome'], name='parceiro_status_nicho_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parceiro',
+            index=models.Index(fields=['status', 'nome'], name='parceiro_status_nome_idx'),
+        ),
+    ]
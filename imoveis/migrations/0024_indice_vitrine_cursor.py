@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0023_indices_consultas_publicas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='imovel',
+            name='imovel_vitrine_ativo_idx',
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(condition=models.Q(('status_publicacao', 'ATIVO')), fields=['-destaque', '-data_cadastro', '-id', 'data_expiracao'], name='imovel_vitrine_ativo_idx'),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# imoveis/migrations/0025_busca_textual.py
+
+import unicodedata
+
+from django.db import migrations, models
+
+# Cópias congeladas de imoveis/busca_texto.py (como eram nesta migração): o código do app
+# pode mudar depois sem alterar o que esta migração faz num banco novo.
+TABELA_IMOVEL = 'imoveis_imovel'
+TABELA_FTS = 'imoveis_imovel_fts'
+
+SQL_SQLITE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5(
+        documento_busca, content='{TABELA_IMOVEL}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON {TABELA_IMOVEL} BEGIN
+        INSERT INTO {TABELA_FTS}(rowid, documento_busca) VALUES (new.id, new.documento_busca);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON {TABELA_IMOVEL} BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, documento_busca) VALUES ('delete', old.id, old.documento_busca);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE OF documento_busca ON {TABELA_IMOVEL} BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, documento_busca) VALUES ('delete', old.id, old.documento_busca);
+        INSERT INTO {TABELA_FTS}(rowid, documento_busca) VALUES (new.id, new.documento_busca);
+    END""",
+    f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')",
+]
+
+SQL_POSTGRES = [
+    f"""ALTER TABLE {TABELA_IMOVEL} ADD COLUMN IF NOT EXISTS busca_vetor tsvector
+        GENERATED ALWAYS AS (to_tsvector('portuguese'::regconfig, coalesce(documento_busca, ''))) STORED""",
+    f"CREATE INDEX IF NOT EXISTS imovel_busca_gin_idx ON {TABELA_IMOVEL} USING GIN (busca_vetor)",
+]
+
+
+def normalizar_texto(texto):
+    if not texto:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def preencher_documentos(apps, schema_editor):
+    """Monta o documento de busca dos imóveis que já existem."""
+    Imovel = apps.get_model('imoveis', 'Imovel')
+    lote = []
+    for imovel in Imovel.objects.select_related('bairro', 'cidade').iterator(chunk_size=500):
+        partes = [
+            imovel.titulo,
+            imovel.descricao,
+            imovel.endereco,
+            imovel.bairro.nome if imovel.bairro_id else None,
+            imovel.cidade.nome if imovel.cidade_id else None,
+        ]
+        imovel.documento_busca = normalizar_texto(' '.join(p for p in partes if p))
+        lote.append(imovel)
+        if len(lote) == 500:
+            Imovel.objects.bulk_update(lote, ['documento_busca'])
+            lote = []
+    if lote:
+        Imovel.objects.bulk_update(lote, ['documento_busca'])
+
+
+def criar_indice(apps, schema_editor):
+    conexao = schema_editor.connection
+    comandos = {'postgresql': SQL_POSTGRES, 'sqlite': SQL_SQLITE}.get(conexao.vendor, [])
+    with conexao.cursor() as cursor:
+        for sql in comandos:
+            cursor.execute(sql)
+
+
+def remover_indice(apps, schema_editor):
+    conexao = schema_editor.connection
+    with conexao.cursor() as cursor:
+        if conexao.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS imovel_busca_gin_idx")
+            cursor.execute(f"ALTER TABLE {TABELA_IMOVEL} DROP COLUMN IF EXISTS busca_vetor")
+        elif conexao.vendor == 'sqlite':
+            for sufixo in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {TABELA_FTS}_{sufixo}")
+            cursor.execute(f"DROP TABLE IF EXISTS {TABELA_FTS}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0024_indice_vitrine_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imovel',
+            name='documento_busca',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Documento de Busca'),
+        ),
+        migrations.RunPython(preencher_documentos, migrations.RunPython.noop),
+        # GIN (PostgreSQL) ou FTS5 (SQLite) — ver imoveis/busca_texto.py
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
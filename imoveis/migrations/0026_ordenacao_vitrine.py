@@ -0,0 +1,55 @@
+# imoveis/migrations/0026_ordenacao_vitrine.py
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+import imoveis.ordenacao
+
+
+def preencher_preco_m2(apps, schema_editor):
+    """Calcula o preço por m² dos imóveis que já existem (mesma regra de Imovel.calcular_preco_m2)."""
+    Imovel = apps.get_model('imoveis', 'Imovel')
+    lote = []
+    for imovel in Imovel.objects.exclude(preco=None).exclude(area=None).exclude(area=0).iterator(chunk_size=500):
+        imovel.preco_m2 = (Decimal(imovel.preco) / imovel.area).quantize(Decimal('0.01'))
+        lote.append(imovel)
+        if len(lote) == 500:
+            Imovel.objects.bulk_update(lote, ['preco_m2'])
+            lote = []
+    if lote:
+        Imovel.objects.bulk_update(lote, ['preco_m2'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0025_busca_textual'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imovel',
+            name='preco_m2',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True, verbose_name='Preço por m²'),
+        ),
+        migrations.RunPython(preencher_preco_m2, migrations.RunPython.noop),
+        # Um índice parcial por ordenação da vitrine (ver imoveis/ordenacao.py)
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(models.OrderBy(imoveis.ordenacao.ExpressaoChave(models.F('destaque'), output_field=models.BooleanField(), template='(NOT %(expressions)s)')), models.OrderBy(imoveis.ordenacao.ExpressaoChave(models.F('preco'), output_field=models.FloatField(), template='COALESCE(%(expressions)s, 1000000000000)')), models.OrderBy(models.F('id')), models.F('data_expiracao'), condition=models.Q(('status_publicacao', 'ATIVO')), name='imovel_ord_menor_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(models.OrderBy(models.F('destaque'), descending=True), models.OrderBy(imoveis.ordenacao.ExpressaoChave(models.F('preco'), output_field=models.FloatField(), template='COALESCE(%(expressions)s, -1)'), descending=True), models.OrderBy(models.F('id'), descending=True), models.F('data_expiracao'), condition=models.Q(('status_publicacao', 'ATIVO')), name='imovel_ord_maior_preco_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(models.OrderBy(models.F('destaque'), descending=True), models.OrderBy(imoveis.ordenacao.ExpressaoChave(models.F('area'), output_field=models.FloatField(), template='COALESCE(%(expressions)s, -1)'), descending=True), models.OrderBy(models.F('id'), descending=True), models.F('data_expiracao'), condition=models.Q(('status_publicacao', 'ATIVO')), name='imovel_ord_maior_area_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(models.OrderBy(imoveis.ordenacao.ExpressaoChave(models.F('destaque'), output_field=models.BooleanField(), template='(NOT %(expressions)s)')), models.OrderBy(imoveis.ordenacao.ExpressaoChave(models.F('preco_m2'), output_field=models.FloatField(), template='COALESCE(%(expressions)s, 1000000000000)')), models.OrderBy(models.F('id')), models.F('data_expiracao'), condition=models.Q(('status_publicacao', 'ATIVO')), name='imovel_ord_menor_preco_m2_idx'),
+        ),
+    ]
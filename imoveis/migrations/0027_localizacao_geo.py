@@ -0,0 +1,59 @@
+# imoveis/migrations/0027_localizacao_geo.py
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0026_ordenacao_vitrine'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bairro',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bairro',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cidade',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cidade',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imovel',
+            name='celula_geo',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Célula da Grade'),
+        ),
+        migrations.AddField(
+            model_name='imovel',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Latitude'),
+        ),
+        migrations.AddField(
+            model_name='imovel',
+            name='localizacao_aproximada',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Localização Aproximada?'),
+        ),
+        migrations.AddField(
+            model_name='imovel',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Longitude'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(fields=['celula_geo', 'latitude', 'longitude', 'status_publicacao', 'data_expiracao'], name='imovel_celula_geo_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0027_localizacao_geo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuscaSalva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=150, verbose_name='Nome da Busca')),
+                ('criterios', models.JSONField(default=dict, verbose_name='Critérios')),
+                ('finalidade', models.CharField(blank=True, choices=[('VENDA', 'Venda'), ('ALUGUEL', 'Aluguel')], default='', editable=False, max_length=10)),
+                ('ativa', models.BooleanField(default=True, verbose_name='Ativa?')),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('bairro', models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='imoveis.bairro')),
+                ('cidade', models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='imoveis.cidade')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buscas_salvas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Busca Salva',
+                'verbose_name_plural': 'Buscas Salvas',
+                'ordering': ['-criada_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificacaoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('lida', models.BooleanField(default=False)),
+                ('busca', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes', to='imoveis.buscasalva')),
+                ('imovel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes_busca', to='imoveis.imovel')),
+            ],
+            options={
+                'verbose_name': 'Notificação de Busca',
+                'verbose_name_plural': 'Notificações de Busca',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='buscasalva',
+            index=models.Index(fields=['ativa', 'cidade'], name='busca_salva_ativa_cidade_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='buscasalva',
+            index=models.Index(fields=['usuario', '-criada_em'], name='busca_salva_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacaobusca',
+            index=models.Index(fields=['busca', 'lida'], name='notificacao_busca_lida_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificacaobusca',
+            constraint=models.UniqueConstraint(fields=('busca', 'imovel'), name='notificacao_busca_imovel_unica'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0028_buscas_salvas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SemelhantesCidade',
+            fields=[
+                ('cidade', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='imoveis.cidade')),
+                ('assinatura', models.CharField(max_length=32)),
+                ('calculado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Cálculo de Semelhantes por Cidade',
+                'verbose_name_plural': 'Cálculos de Semelhantes por Cidade',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImovelSemelhante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveSmallIntegerField()),
+                ('imovel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semelhantes', to='imoveis.imovel')),
+                ('semelhante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semelhante_de', to='imoveis.imovel')),
+            ],
+            options={
+                'verbose_name': 'Imóvel Semelhante',
+                'verbose_name_plural': 'Imóveis Semelhantes',
+                'constraints': [models.UniqueConstraint(fields=('imovel', 'posicao'), name='semelhante_imovel_posicao_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0029_imoveis_semelhantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitantesImovel',
+            fields=[
+                ('imovel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='visitantes', serialize=False, to='imoveis.imovel')),
+                ('registros', models.BinaryField()),
+                ('base', models.PositiveIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Visitantes Únicos do Imóvel',
+                'verbose_name_plural': 'Visitantes Únicos dos Imóveis',
+            },
+        ),
+    ]
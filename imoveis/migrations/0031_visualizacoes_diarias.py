@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0030_visitantes_imovel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImovelVisualizacaoDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('imovel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visualizacoes_diarias', to='imoveis.imovel')),
+            ],
+            options={
+                'verbose_name': 'Visualização Diária',
+                'verbose_name_plural': 'Visualizações Diárias',
+                'constraints': [models.UniqueConstraint(fields=('imovel', 'dia'), name='visualizacao_diaria_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImovelVisualizacaoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('imovel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visualizacoes_mensais', to='imoveis.imovel')),
+            ],
+            options={
+                'verbose_name': 'Visualização Mensal',
+                'verbose_name_plural': 'Visualizações Mensais',
+                'constraints': [models.UniqueConstraint(fields=('imovel', 'mes'), name='visualizacao_mensal_unica')],
+            },
+        ),
+    ]
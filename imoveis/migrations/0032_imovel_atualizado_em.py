@@ -0,0 +1,28 @@
+# imoveis/migrations/0032_imovel_atualizado_em.py
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def preencher_atualizado_em(apps, schema_editor):
+    """Sem histórico de alterações: os imóveis que já existem ficam com a data de cadastro."""
+    Imovel = apps.get_model('imoveis', 'Imovel')
+    Imovel.objects.update(atualizado_em=F('data_cadastro'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0031_visualizacoes_diarias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imovel',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Atualizado em'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(preencher_atualizado_em, migrations.RunPython.noop),
+    ]
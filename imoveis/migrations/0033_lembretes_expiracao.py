@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0032_imovel_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LembreteExpiracao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vencimento', models.DateTimeField()),
+                ('enviado_em', models.DateTimeField(auto_now_add=True)),
+                ('assinatura', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lembretes', to='imoveis.assinatura')),
+                ('imovel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lembretes', to='imoveis.imovel')),
+            ],
+            options={
+                'verbose_name': 'Lembrete de Expiração',
+                'verbose_name_plural': 'Lembretes de Expiração',
+                'constraints': [models.UniqueConstraint(fields=('assinatura', 'vencimento'), name='lembrete_assinatura_unico'), models.UniqueConstraint(fields=('imovel', 'vencimento'), name='lembrete_imovel_unico')],
+            },
+        ),
+    ]
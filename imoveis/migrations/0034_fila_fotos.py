@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0033_lembretes_expiracao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foto',
+            name='pronta',
+            field=models.BooleanField(default=True, verbose_name='Pronta?'),
+        ),
+        migrations.AddField(
+            model_name='imovel',
+            name='foto_principal_pendente',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Foto Principal em Processamento?'),
+        ),
+        migrations.CreateModel(
+            name='ProcessamentoFoto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destino', models.CharField(choices=[('PRINCIPAL', 'Foto Principal'), ('GALERIA', 'Galeria')], max_length=10)),
+                ('nome', models.CharField(max_length=255)),
+                ('arquivo_temporario', models.CharField(max_length=255)),
+                ('nome_original', models.CharField(blank=True, default='', max_length=255)),
+                ('content_type', models.CharField(blank=True, default='', max_length=100)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('FALHOU', 'Falhou')], default='PENDENTE', max_length=12)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reservado_por', models.CharField(blank=True, default='', max_length=32)),
+                ('reservado_ate', models.DateTimeField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('foto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='processamentos', to='imoveis.foto')),
+                ('imovel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='processamentos_foto', to='imoveis.imovel')),
+            ],
+            options={
+                'verbose_name': 'Processamento de Foto',
+                'verbose_name_plural': 'Processamentos de Fotos',
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='processamento_foto_fila')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0034_fila_fotos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foto',
+            name='derivados',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Versões Reduzidas'),
+        ),
+        migrations.AddField(
+            model_name='imovel',
+            name='foto_principal_derivados',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Versões Reduzidas da Foto Principal'),
+        ),
+    ]
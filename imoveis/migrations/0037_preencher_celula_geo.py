@@ -0,0 +1,67 @@
+# imoveis/migrations/0037_preencher_celula_geo.py
+
+import math
+
+from django.db import migrations
+from django.db.models import Q
+
+# Cópia congelada da grade de imoveis/geo.py (TAMANHO_CELULA = 0.01, COLUNAS_GRADE = 36000)
+TAMANHO_CELULA = 0.01
+COLUNAS_GRADE = 36000
+LOTE = 1000
+
+
+def celula(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    linha = int(math.floor((latitude + 90) / TAMANHO_CELULA))
+    coluna = int(math.floor((longitude + 180) / TAMANHO_CELULA))
+    return linha * COLUNAS_GRADE + coluna
+
+
+def preencher_celulas(apps, schema_editor):
+    """
+    A 0027 criou celula_geo vazia: os imóveis que já existiam ficavam fora da busca
+    por área e do mapa. Preenche a célula (e o centroide, para quem não tem ponto
+    exato) com o que já estiver no banco; o comando carregar_centroides completa
+    o resto quando os centroides forem carregados.
+    """
+    Imovel = apps.get_model('imoveis', 'Imovel')
+    Bairro = apps.get_model('imoveis', 'Bairro')
+    Cidade = apps.get_model('imoveis', 'Cidade')
+
+    def mapa(modelo):
+        return {
+            pk: (latitude, longitude)
+            for pk, latitude, longitude in modelo.objects.exclude(latitude=None).exclude(longitude=None)
+            .values_list('id', 'latitude', 'longitude')
+        }
+
+    bairros, cidades = mapa(Bairro), mapa(Cidade)
+    campos = ['latitude', 'longitude', 'localizacao_aproximada', 'celula_geo']
+    pendentes = Imovel.objects.filter(Q(celula_geo=None) | Q(latitude=None)).only('id', 'cidade_id', 'bairro_id', *campos)
+    lote = []
+    for imovel in pendentes.iterator(chunk_size=LOTE):
+        exato = imovel.latitude is not None and imovel.longitude is not None and not imovel.localizacao_aproximada
+        if not exato:
+            ponto = bairros.get(imovel.bairro_id) or cidades.get(imovel.cidade_id)
+            imovel.latitude, imovel.longitude = ponto or (None, None)
+            imovel.localizacao_aproximada = ponto is not None
+        imovel.celula_geo = celula(imovel.latitude, imovel.longitude)
+        lote.append(imovel)
+        if len(lote) == LOTE:
+            Imovel.objects.bulk_update(lote, campos)
+            lote = []
+    if lote:
+        Imovel.objects.bulk_update(lote, campos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0036_tabela_cache'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_celulas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0037_preencher_celula_geo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imovelvisualizacaodiaria',
+            name='registros',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+    ]
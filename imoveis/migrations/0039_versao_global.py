@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:58
+
+import time
+
+from django.db import migrations, models
+
+# As chaves de imoveis/catalogo.py (congeladas aqui)
+CHAVES = ('catalogo:versao', 'referencia:versao')
+
+
+def criar_versoes(apps, schema_editor):
+    # Começa pelo relógio, como a versão no cache: nada derivado de antes volta a valer
+    VersaoGlobal = apps.get_model('imoveis', 'VersaoGlobal')
+    for chave in CHAVES:
+        VersaoGlobal.objects.get_or_create(chave=chave, defaults={'valor': int(time.time())})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imoveis', '0038_sketch_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoGlobal',
+            fields=[
+                ('chave', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Versão Global',
+                'verbose_name_plural': 'Versões Globais',
+            },
+        ),
+        migrations.RunPython(criar_versoes, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,14 @@
 # imoveis/models.py
 
 from django.db import models
+from django.db.models import Q
 from django.conf import settings 
 from django.utils import timezone
+from decimal import Decimal
+
+from .busca_texto import montar_documento_busca
+from .geo import localizar
+from .ordenacao import indices_ordenacao
 
 # -----------------------------------------------------------------
 # MODELOS 'Cidade', 'Bairro' (Sem mudanças)
@@ -10,12 +16,17 @@ from django.utils import timezone
 class Cidade(models.Model):
     nome = models.CharField(max_length=100)
     estado = models.CharField(max_length=2, help_text="Sigla do estado, ex: MS")
+    # Centroide (comando 'carregar_centroides'): localização aproximada dos imóveis sem ponto exato
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     def __str__(self): return f"{self.nome}, {self.estado}"
     class Meta: ordering = ['nome']; verbose_name_plural = "Cidades"
 
 class Bairro(models.Model):
     cidade = models.ForeignKey(Cidade, on_delete=models.CASCADE, related_name="bairros")
     nome = models.CharField(max_length=150)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     def __str__(self): return f"{self.nome} ({self.cidade.nome})"
     class Meta: ordering = ['nome']; unique_together = ('cidade', 'nome')
 
@@ -118,10 +129,31 @@ class Assinatura(models.Model):
     class Meta:
         verbose_name = "Assinatura de Usuário"
         verbose_name_plural = "Assinaturas de Usuários"
+        indexes = [
+            # Expiração (imoveis/expiracao.py): status='ATIVA' AND data_expiracao < agora
+            models.Index(fields=['status', 'data_expiracao'], name='assinatura_status_exp_idx'),
+        ]
 
 # -----------------------------------------------------------------
 # MODELO 'Imovel' (MODIFICADO)
 # -----------------------------------------------------------------
+class ImovelQuerySet(models.QuerySet):
+
+    # Colunas usadas pelos cards das listagens (vitrine, meus imóveis, sitemap).
+    # 'descricao' e 'documento_busca' (os TextFields grandes) ficam de fora.
+    CAMPOS_CARD = (
+        'id', 'titulo', 'finalidade', 'destaque', 'preco',
+        'foto_principal', 'foto_principal_pendente', 'foto_principal_derivados',
+        'quartos', 'suites', 'banheiros', 'salas', 'cozinhas', 'closets', 'area', 'preco_m2',
+        'status_publicacao', 'data_cadastro', 'data_expiracao', 'atualizado_em', 'proprietario_id',
+        'cidade__nome', 'cidade__estado', 'bairro__nome', 'imobiliaria__nome',
+    )
+
+    def vitrine(self):
+        """Projeção para os cards: só as colunas exibidas + cidade/bairro/imobiliária no mesmo SELECT (sem N+1)."""
+        return self.select_related('cidade', 'bairro', 'imobiliaria').only(*self.CAMPOS_CARD)
+
+
 class Imovel(models.Model):
     
     class Finalidade(models.TextChoices):
@@ -161,7 +193,15 @@ class Imovel(models.Model):
     closets = models.PositiveIntegerField(default=0, verbose_name="Nº de Closets", null=True, blank=True)
     area = models.PositiveIntegerField(help_text="Em metros quadrados (m²)", verbose_name="Área Construída(m²)", null=True, blank=True, default=0)
     foto_principal = models.ImageField(upload_to='fotos_imoveis/', null=True, blank=True, verbose_name="Foto Principal")
+    # Foto nova na fila (ProcessamentoFoto): os cards mostram "processando" até o worker enviá-la
+    foto_principal_pendente = models.BooleanField(default=False, editable=False, verbose_name="Foto Principal em Processamento?")
+    # Versões reduzidas geradas pela fila: {'nome': <foto_principal de quando foram geradas>, 'larguras': [320, ...]}
+    # (contas/uploads.py). Foto trocada por outro caminho (admin)? O nome não bate e o template usa o original.
+    foto_principal_derivados = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Versões Reduzidas da Foto Principal")
     data_cadastro = models.DateTimeField(auto_now_add=True)
+    # Última gravação de algo exibido no anúncio (ETag/Last-Modified do detalhe e lastmod do sitemap).
+    # QuerySet.update() não mexe em auto_now: quem atualiza em massa passa atualizado_em=agora.
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
 
     status_publicacao = models.CharField(
         max_length=20,
@@ -176,10 +216,130 @@ class Imovel(models.Model):
     visualizacoes = models.PositiveIntegerField(default=0, verbose_name="Visualizações")
     # ---------------------------
 
+    # --- [BUSCA TEXTUAL] ---
+    # Título + descrição + endereço + bairro + cidade, sem acentos (ver imoveis/busca_texto.py).
+    # Mantido pelo save(); o índice de texto (GIN / FTS5) é montado em cima desta coluna.
+    documento_busca = models.TextField(blank=True, default='', editable=False, verbose_name="Documento de Busca")
+    # ---------------------------
+
+    # --- [ORDENAÇÃO POR PREÇO/M²] ---
+    # preco / area, mantido pelo save() para a ordenação '?ordem=menor_preco_m2' usar índice
+    preco_m2 = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, editable=False, verbose_name="Preço por m²"
+    )
+    # ---------------------------
+
+    # --- [LOCALIZAÇÃO] ---
+    # Ponto informado pelo anunciante ou, na falta dele, o centroide do bairro/cidade
+    # (localizacao_aproximada=True). celula_geo é a célula da grade usada na busca por área (imoveis/geo.py).
+    latitude = models.FloatField(null=True, blank=True, verbose_name="Latitude")
+    longitude = models.FloatField(null=True, blank=True, verbose_name="Longitude")
+    localizacao_aproximada = models.BooleanField(default=False, editable=False, verbose_name="Localização Aproximada?")
+    celula_geo = models.IntegerField(null=True, blank=True, editable=False, verbose_name="Célula da Grade")
+    # ---------------------------
+
+    objects = ImovelQuerySet.as_manager()
+
     def __str__(self):
         if self.titulo:
             return self.titulo
         return f"Imóvel ID {self.id}"
+
+    # Campos que entram no documento de busca / no preço por m² / na localização
+    CAMPOS_DOCUMENTO_BUSCA = {'titulo', 'descricao', 'endereco', 'bairro', 'cidade'}
+    CAMPOS_PRECO_M2 = {'preco', 'area'}
+    CAMPOS_LOCALIZACAO = {'latitude', 'longitude', 'bairro', 'cidade'}
+    # Gravações que não contam como alteração do anúncio (não mexem em atualizado_em)
+    CAMPOS_SEM_ATUALIZACAO = {'visualizacoes'}
+
+    def calcular_preco_m2(self):
+        if self.preco is None or not self.area:
+            return None
+        return (Decimal(self.preco) / self.area).quantize(Decimal('0.01'))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._guardar_origem()
+        return instancia
+
+    def _guardar_origem(self):
+        # Valores lidos do banco dos campos de origem (os adiados por only()/defer() ficam de fora)
+        campos = self.CAMPOS_DOCUMENTO_BUSCA | self.CAMPOS_PRECO_M2 | self.CAMPOS_LOCALIZACAO
+        self._origem = {
+            campo: self.__dict__[self._meta.get_field(campo).attname]
+            for campo in campos if self._meta.get_field(campo).attname in self.__dict__
+        }
+
+    def _alterados(self, campos, update_fields):
+        """Quais de `campos` mudaram desde a leitura do banco (num imóvel novo, todos)."""
+        if update_fields is not None:
+            campos = campos & set(update_fields)
+        origem = getattr(self, '_origem', None)
+        if self._state.adding or origem is None:
+            return campos
+        alterados = set()
+        for campo in campos:
+            attname = self._meta.get_field(campo).attname
+            if attname not in self.__dict__:
+                continue  # adiado e nunca atribuído: não mudou
+            if campo not in origem or self.__dict__[attname] != origem[campo]:
+                alterados.add(campo)
+        return alterados
+
+    def save(self, *args, **kwargs):
+        # Só recalcula os campos derivados quando algum campo de origem mudou: o documento
+        # e o centroide leem bairro/cidade do banco, e a maioria das gravações (status,
+        # destaque, fotos, visualizações) não mexe neles
+        update_fields = kwargs.get('update_fields')
+        derivados = set()
+        if self._alterados(self.CAMPOS_DOCUMENTO_BUSCA, update_fields):
+            self.documento_busca = montar_documento_busca(self)
+            derivados.add('documento_busca')
+        if self._alterados(self.CAMPOS_PRECO_M2, update_fields):
+            self.preco_m2 = self.calcular_preco_m2()
+            derivados.add('preco_m2')
+        if self._alterados(self.CAMPOS_LOCALIZACAO, update_fields):
+            localizar(self)
+            derivados |= {'latitude', 'longitude', 'localizacao_aproximada', 'celula_geo'}
+        if update_fields is not None and not set(update_fields) <= self.CAMPOS_SEM_ATUALIZACAO:
+            derivados.add('atualizado_em')
+        if update_fields is not None and derivados:
+            kwargs['update_fields'] = set(update_fields) | derivados
+        super().save(*args, **kwargs)
+        self._guardar_origem()
+
+    class Meta:
+        indexes = [
+            # Vitrine pública (lista_imoveis): ATIVO + não expirado, ordenado por destaque/data.
+            # Índice parcial: só contém os anúncios ativos, já na ordem da página.
+            # O 'id' no fim é o desempate usado pela paginação por cursor (imoveis/paginacao.py).
+            models.Index(
+                fields=['-destaque', '-data_cadastro', '-id', 'data_expiracao'],
+                name='imovel_vitrine_ativo_idx',
+                condition=Q(status_publicacao='ATIVO'),
+            ),
+            # Sitemap: ATIVO + não expirado, ordenado só por data
+            models.Index(
+                fields=['-data_cadastro', 'data_expiracao'],
+                name='imovel_sitemap_ativo_idx',
+                condition=Q(status_publicacao='ATIVO'),
+            ),
+            # Expiração (imoveis/expiracao.py): status_publicacao='ATIVO' AND data_expiracao < agora
+            models.Index(fields=['status_publicacao', 'data_expiracao'], name='imovel_status_exp_idx'),
+            # Painel 'Meus Imóveis' e contagem de limite do plano em anunciar_imovel
+            models.Index(fields=['proprietario', '-data_cadastro'], name='imovel_dono_cadastro_idx'),
+            models.Index(fields=['proprietario', 'status_publicacao'], name='imovel_dono_status_idx'),
+            # Ordenações alternativas da vitrine (preço, área, preço/m²; ver imoveis/ordenacao.py)
+            *indices_ordenacao(),
+            # Busca por caixa/raio: faixas de celula_geo (imoveis/geo.py). As demais colunas tornam o
+            # índice "cobridor": as sobras das células da borda e os inativos/expirados são descartados
+            # sem ler a tabela. Sem condição parcial, que o SQLite ignora quando o status vem como parâmetro.
+            models.Index(
+                fields=['celula_geo', 'latitude', 'longitude', 'status_publicacao', 'data_expiracao'],
+                name='imovel_celula_geo_idx',
+            ),
+        ]
     
 # -----------------------------------------------------------------
 # MODELO 'Foto' (Sem mudanças)
@@ -187,8 +347,58 @@ class Imovel(models.Model):
 class Foto(models.Model):
     imovel = models.ForeignKey(Imovel, related_name='fotos', on_delete=models.CASCADE)
     imagem = models.ImageField(upload_to='fotos_galeria/')
+    # False enquanto a foto espera na fila (ProcessamentoFoto); o nome em `imagem` já é o final
+    pronta = models.BooleanField(default=True, verbose_name="Pronta?")
+    # Mesmo formato de Imovel.foto_principal_derivados
+    derivados = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Versões Reduzidas")
     def __str__(self): return f"Foto de {self.imovel.titulo or self.imovel.id}"
 
+
+class ProcessamentoFoto(models.Model):
+    """
+    Foto enviada no anúncio esperando marca d'água + upload para o B2 (contas/fila_fotos.py).
+    O original fica em FOTOS_STAGING_ROOT até o comando processar_fotos enviá-lo;
+    falhas voltam para a fila com espera exponencial até MAX_TENTATIVAS.
+    """
+    class Destino(models.TextChoices):
+        PRINCIPAL = 'PRINCIPAL', 'Foto Principal'
+        GALERIA = 'GALERIA', 'Galeria'
+
+    class Status(models.TextChoices):
+        PENDENTE = 'PENDENTE', 'Pendente'
+        PROCESSANDO = 'PROCESSANDO', 'Processando'
+        CONCLUIDO = 'CONCLUIDO', 'Concluído'
+        FALHOU = 'FALHOU', 'Falhou'
+
+    imovel = models.ForeignKey(Imovel, on_delete=models.CASCADE, related_name='processamentos_foto')
+    foto = models.ForeignKey(Foto, on_delete=models.CASCADE, null=True, blank=True, related_name='processamentos')
+    destino = models.CharField(max_length=10, choices=Destino.choices)
+    # Caminho final no storage (ex: fotos_galeria/<uuid>.jpg) e o original no staging
+    nome = models.CharField(max_length=255)
+    arquivo_temporario = models.CharField(max_length=255)
+    nome_original = models.CharField(max_length=255, blank=True, default='')
+    content_type = models.CharField(max_length=100, blank=True, default='')
+
+    status = models.CharField(max_length=12, choices=Status.choices, default=Status.PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    # Worker que pegou o item e até quando (passou do prazo sem terminar? volta para a fila)
+    reservado_por = models.CharField(max_length=32, blank=True, default='')
+    reservado_ate = models.DateTimeField(null=True, blank=True)
+    erro = models.TextField(blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Processamento de Foto"
+        verbose_name_plural = "Processamentos de Fotos"
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa'], name='processamento_foto_fila'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_destino_display()} do imóvel {self.imovel_id} ({self.get_status_display()})"
+
     # ✅ 1. O MODELO PARA OS NICHOS (AS CATEGORIAS)
 class NichoParceiro(models.Model):
     nome = models.CharField(max_length=100, unique=True, verbose_name="Nome do Nicho")
@@ -253,6 +463,181 @@ class Parceiro(models.Model):
     class Meta:
         verbose_name = "Parceiro"
         verbose_name_plural = "Parceiros"
+        indexes = [
+            # listar_parceiros: status='APROVADO' [+ nicho], ordenado por nome
+            models.Index(fields=['status', 'nicho', 'nome'], name='parceiro_status_nicho_idx'),
+            models.Index(fields=['status', 'nome'], name='parceiro_status_nome_idx'),
+        ]
+
+    def __str__(self):
+        return self.nome
+
+# -----------------------------------------------------------------
+# BUSCAS SALVAS E NOTIFICAÇÕES (ver imoveis/buscas_salvas.py)
+# -----------------------------------------------------------------
+class BuscaSalva(models.Model):
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='buscas_salvas')
+    nome = models.CharField(max_length=150, verbose_name="Nome da Busca")
+    # Filtros do GET de lista_imoveis já validados ({'cidade': '3', 'quartos': '2', ...})
+    criterios = models.JSONField(default=dict, verbose_name="Critérios")
+    # Chaves do índice invertido, copiadas de `criterios` no save (vazio = "qualquer")
+    cidade = models.ForeignKey(Cidade, on_delete=models.CASCADE, null=True, blank=True, editable=False)
+    bairro = models.ForeignKey(Bairro, on_delete=models.CASCADE, null=True, blank=True, editable=False)
+    finalidade = models.CharField(max_length=10, choices=Imovel.Finalidade.choices, blank=True, default='', editable=False)
+    ativa = models.BooleanField(default=True, verbose_name="Ativa?")
+    criada_em = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.nome
+
+    def preencher_chaves(self):
+        """Copia cidade/bairro/finalidade de `criterios` (chamar antes de bulk_create, que pula o save)."""
+        cidade, bairro = self.criterios.get('cidade'), self.criterios.get('bairro')
+        self.cidade_id = int(cidade) if cidade else None
+        self.bairro_id = int(bairro) if bairro else None
+        self.finalidade = self.criterios.get('finalidade', '')
+        return self
+
+    def save(self, *args, **kwargs):
+        self.preencher_chaves()
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Busca Salva"
+        verbose_name_plural = "Buscas Salvas"
+        ordering = ['-criada_em']
+        indexes = [
+            # Candidatas de um lote de imóveis novos: ativa AND (cidade IN (...) OR cidade IS NULL)
+            models.Index(fields=['ativa', 'cidade'], name='busca_salva_ativa_cidade_idx'),
+            models.Index(fields=['usuario', '-criada_em'], name='busca_salva_usuario_idx'),
+        ]
+
+
+class NotificacaoBusca(models.Model):
+    busca = models.ForeignKey(BuscaSalva, on_delete=models.CASCADE, related_name='notificacoes')
+    imovel = models.ForeignKey(Imovel, on_delete=models.CASCADE, related_name='notificacoes_busca')
+    criada_em = models.DateTimeField(auto_now_add=True)
+    lida = models.BooleanField(default=False)
 
     def __str__(self):
-        return self.nome
\ No newline at end of file
+        return f"{self.busca} -> {self.imovel}"
+
+    class Meta:
+        verbose_name = "Notificação de Busca"
+        verbose_name_plural = "Notificações de Busca"
+        constraints = [
+            # O mesmo imóvel nunca é avisado duas vezes para a mesma busca (bulk_create ignora o repetido)
+            models.UniqueConstraint(fields=['busca', 'imovel'], name='notificacao_busca_imovel_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['busca', 'lida'], name='notificacao_busca_lida_idx'),
+        ]
+
+
+# -----------------------------------------------------------------
+# IMÓVEIS SEMELHANTES (pré-calculados por `calcular_semelhantes`, ver imoveis/semelhantes.py)
+# -----------------------------------------------------------------
+class ImovelSemelhante(models.Model):
+    imovel = models.ForeignKey(Imovel, on_delete=models.CASCADE, related_name='semelhantes')
+    semelhante = models.ForeignKey(Imovel, on_delete=models.CASCADE, related_name='semelhante_de')
+    posicao = models.PositiveSmallIntegerField()  # 0 = o mais parecido
+
+    class Meta:
+        verbose_name = "Imóvel Semelhante"
+        verbose_name_plural = "Imóveis Semelhantes"
+        constraints = [
+            # Também é o índice da leitura do detalhe: WHERE imovel_id = ? ORDER BY posicao
+            models.UniqueConstraint(fields=['imovel', 'posicao'], name='semelhante_imovel_posicao_unica'),
+        ]
+
+
+class SemelhantesCidade(models.Model):
+    """Assinatura dos dados de cada cidade na última execução (o que não mudou não é recalculado)."""
+    cidade = models.OneToOneField(Cidade, on_delete=models.CASCADE, primary_key=True)
+    assinatura = models.CharField(max_length=32)
+    calculado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Cálculo de Semelhantes por Cidade"
+        verbose_name_plural = "Cálculos de Semelhantes por Cidade"
+
+
+class VisitantesImovel(models.Model):
+    """
+    Sketch HyperLogLog (imoveis/hll.py, 1 KB) dos visitantes únicos do imóvel.
+    Imovel.visualizacoes = base + estimativa do sketch (gravado por imoveis/contador.py).
+    """
+    imovel = models.OneToOneField(Imovel, on_delete=models.CASCADE, primary_key=True, related_name='visitantes')
+    registros = models.BinaryField()
+    # Visualizações contadas antes do sketch existir (contador antigo por sessão)
+    base = models.PositiveIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Visitantes Únicos do Imóvel"
+        verbose_name_plural = "Visitantes Únicos dos Imóveis"
+
+
+class ImovelVisualizacaoDiaria(models.Model):
+    """
+    Visitantes únicos do imóvel no dia: `total` é a estimativa do sketch do dia
+    (`registros`), mesclado a cada descarga do contador (imoveis/estatisticas.py).
+    """
+    imovel = models.ForeignKey(Imovel, on_delete=models.CASCADE, related_name='visualizacoes_diarias')
+    dia = models.DateField()
+    total = models.PositiveIntegerField(default=0)
+    # Sketch HyperLogLog (imoveis/hll.py) dos visitantes do dia; vazio nas linhas de antes dele
+    registros = models.BinaryField(blank=True, default=b'')
+
+    class Meta:
+        verbose_name = "Visualização Diária"
+        verbose_name_plural = "Visualizações Diárias"
+        constraints = [
+            models.UniqueConstraint(fields=['imovel', 'dia'], name='visualizacao_diaria_unica'),
+        ]
+
+
+class ImovelVisualizacaoMensal(models.Model):
+    """Dias antigos compactados por mês (comando compactar_visualizacoes); `mes` é o dia 1."""
+    imovel = models.ForeignKey(Imovel, on_delete=models.CASCADE, related_name='visualizacoes_mensais')
+    mes = models.DateField()
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Visualização Mensal"
+        verbose_name_plural = "Visualizações Mensais"
+        constraints = [
+            models.UniqueConstraint(fields=['imovel', 'mes'], name='visualizacao_mensal_unica'),
+        ]
+
+
+class LembreteExpiracao(models.Model):
+    """
+    Aviso de vencimento já enviado (imoveis/lembretes.py): um por assinatura ou imóvel
+    e data de expiração. Renovou (data nova)? Entra de novo no próximo aviso.
+    """
+    assinatura = models.ForeignKey(Assinatura, on_delete=models.CASCADE, null=True, blank=True, related_name='lembretes')
+    imovel = models.ForeignKey(Imovel, on_delete=models.CASCADE, null=True, blank=True, related_name='lembretes')
+    vencimento = models.DateTimeField()
+    enviado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Lembrete de Expiração"
+        verbose_name_plural = "Lembretes de Expiração"
+        constraints = [
+            models.UniqueConstraint(fields=['assinatura', 'vencimento'], name='lembrete_assinatura_unico'),
+            models.UniqueConstraint(fields=['imovel', 'vencimento'], name='lembrete_imovel_unico'),
+        ]
+
+
+class VersaoGlobal(models.Model):
+    """
+    Versões do catálogo/referência (imoveis/catalogo.py) quando não há Redis: o
+    incremento é um UPDATE valor = valor + 1, atômico no banco.
+    """
+    chave = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = "Versão Global"
+        verbose_name_plural = "Versões Globais"
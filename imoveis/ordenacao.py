@@ -0,0 +1,147 @@
+# imoveis/ordenacao.py
+"""
+Ordenações da vitrine (parâmetro `?ordem=` de lista_imoveis e da API).
+
+Toda ordenação é (destaque, <campo>, id): os anúncios em destaque continuam
+sempre no topo e o `id` desempata para a paginação por cursor.
+
+Para o cursor ser uma comparação lexicográfica simples e usar o índice
+(`(a, b, c) < (x, y, z)`, ver paginacao.comparar_chave), as três colunas
+precisam estar na MESMA direção. Nas ordens crescentes (menor preço) o
+destaque entra como `NOT destaque` crescente, que dá a mesma ordem que
+`destaque` decrescente.
+
+Colunas que aceitam NULL (preço, área, preço/m²) entram com COALESCE para
+um valor-sentinela que joga os anúncios sem valor para o FIM da lista, com
+o mesmo resultado no PostgreSQL e no SQLite. As expressões são as mesmas
+usadas nos índices de Imovel.Meta (ver `indices_ordenacao`), para o banco
+reconhecer o índice.
+
+Não importa modelos: é usado pelo próprio models.py.
+"""
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import models
+from django.db.models import F, Func, Q, Value
+
+# Sentinelas do COALESCE (fora da faixa dos DecimalField(12, 2) e das áreas)
+NULO_NO_FIM_CRESCENTE = 10 ** 12
+NULO_NO_FIM_DECRESCENTE = -1
+
+
+class ExpressaoChave(Func):
+    """
+    Func sem o CAST(... AS NUMERIC) que o Django acrescenta a expressões
+    decimais no SQLite: a expressão do ORDER BY/WHERE precisa ser idêntica
+    à do índice para ele ser usado (no índice, ver `expressao_campo`).
+    """
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, **extra_context)
+
+
+class Ordenacao:
+
+    def __init__(self, nome, rotulo, campo, decrescente, tipo, anula_com=None):
+        self.nome = nome
+        self.rotulo = rotulo
+        self.campo = campo
+        self.decrescente = decrescente
+        self.tipo = tipo  # 'data', 'decimal' ou 'inteiro' (para ler o valor de volta do cursor)
+        self.anula_com = anula_com
+
+    # --- Expressões SQL ---
+    def expressao_destaque(self):
+        if self.decrescente:
+            return F('destaque')
+        # Entre parênteses: sem eles `NOT destaque > x` vira `NOT (destaque > x)`
+        return ExpressaoChave(F('destaque'), template='(NOT %(expressions)s)', output_field=models.BooleanField())
+
+    def expressao_campo(self, no_indice=False):
+        if self.anula_com is None:
+            return F(self.campo)
+        # No índice o tipo de saída não importa (não há parâmetros a converter) e um
+        # FloatField evita o CAST que o Django poria em volta da expressão no SQLite
+        extra = {'output_field': models.FloatField()} if no_indice else {}
+        return ExpressaoChave(F(self.campo), template=f'COALESCE(%(expressions)s, {self.anula_com})', **extra)
+
+    def colunas(self, no_indice=False):
+        """As três expressões da chave, todas na mesma direção."""
+        return (self.expressao_destaque(), self.expressao_campo(no_indice), F('id'))
+
+    def order_by(self, no_indice=False):
+        if self.decrescente:
+            return [expressao.desc() for expressao in self.colunas(no_indice)]
+        return [expressao.asc() for expressao in self.colunas(no_indice)]
+
+    # --- Valores da chave (cursor) ---
+    def valor(self, imovel):
+        """Valor do campo de ordenação de uma instância ou linha de .values() (com o COALESCE aplicado)."""
+        valor = imovel[self.campo] if isinstance(imovel, dict) else getattr(imovel, self.campo)
+        if valor is None and self.anula_com is not None:
+            valor = self.anula_com
+        return valor
+
+    def serializar(self, valor):
+        if self.tipo == 'data':
+            return valor.isoformat()
+        if self.tipo == 'decimal':
+            return str(valor)
+        return int(valor)
+
+    def desserializar(self, valor):
+        """Levanta ValueError/TypeError se o valor não for do tipo esperado (cursor de outra ordem)."""
+        if self.tipo == 'data':
+            return datetime.fromisoformat(valor)
+        if self.tipo == 'decimal':
+            try:
+                return Decimal(valor)
+            except InvalidOperation as erro:
+                raise ValueError(valor) from erro
+        return int(valor)
+
+    def comparavel(self, chave):
+        """(destaque, valor, id) -> os valores na mesma forma das colunas (NOT destaque nas crescentes)."""
+        destaque, valor, pk = chave
+        if self.tipo == 'decimal':
+            # Sem o CAST na coluna (ver ExpressaoChave), o SQLite compararia número com o
+            # texto do Decimal; o Value decimal leva o CAST para o lado do parâmetro
+            valor = Value(valor, output_field=models.DecimalField())
+        return (destaque if self.decrescente else not destaque, valor, pk)
+
+
+ORDENACOES = {
+    ordenacao.nome: ordenacao
+    for ordenacao in (
+        Ordenacao('recentes', 'Mais recentes', 'data_cadastro', True, 'data'),
+        Ordenacao('menor_preco', 'Menor preço', 'preco', False, 'decimal', NULO_NO_FIM_CRESCENTE),
+        Ordenacao('maior_preco', 'Maior preço', 'preco', True, 'decimal', NULO_NO_FIM_DECRESCENTE),
+        Ordenacao('maior_area', 'Maior área', 'area', True, 'inteiro', NULO_NO_FIM_DECRESCENTE),
+        Ordenacao('menor_preco_m2', 'Menor preço por m²', 'preco_m2', False, 'decimal', NULO_NO_FIM_CRESCENTE),
+    )
+}
+ORDENACAO_PADRAO = ORDENACOES['recentes']
+
+
+def ordenacao_do_get(params):
+    """Ordenação pedida em `?ordem=` (valores desconhecidos caem na padrão)."""
+    return ORDENACOES.get(params.get('ordem') or '', ORDENACAO_PADRAO)
+
+
+def indices_ordenacao():
+    """
+    Um índice parcial (só ATIVOS) por ordenação alternativa, na ordem exata do
+    ORDER BY + data_expiracao no fim (o filtro de não expirado sai do próprio índice).
+    A padrão ('recentes') usa o imovel_vitrine_ativo_idx.
+    """
+    indices = []
+    for ordenacao in ORDENACOES.values():
+        if ordenacao is ORDENACAO_PADRAO:
+            continue
+        indices.append(models.Index(
+            *ordenacao.order_by(no_indice=True), F('data_expiracao'),
+            name=f'imovel_ord_{ordenacao.nome}_idx'[:30],
+            condition=Q(status_publicacao='ATIVO'),
+        ))
+    return indices
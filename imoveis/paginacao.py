@@ -0,0 +1,301 @@
+# imoveis/paginacao.py
+"""
+Paginação por cursor ("seek"/keyset) para a vitrine pública.
+
+Em vez de OFFSET + COUNT(*) (que ficam mais lentos a cada página), a próxima
+página é buscada a partir da chave do último item exibido:
+
+    WHERE destaque <= d
+      AND (destaque < d
+           OR (destaque = d AND data_cadastro < c)
+           OR (destaque = d AND data_cadastro = c AND id < i))
+    ORDER BY destaque DESC, data_cadastro DESC, id DESC
+    LIMIT 51
+
+(a comparação de tuplas `(destaque, data_cadastro, id) < (d, c, i)` escrita
+com Q; o `destaque <= d` de fora deixa o banco usar o índice como faixa).
+Assim a página 200 custa o mesmo que a página 1. A última página ("Última",
+`?page=<última>`) é lida de trás para frente, também sem OFFSET. O total de resultados do
+cabeçalho ("Exibindo X - Y de Z") vem de um COUNT guardado em cache por filtro.
+
+Com `?ordem=` a chave troca data_cadastro por preço/área/preço por m²
+(imoveis/ordenacao.py); a mecânica do cursor é a mesma.
+"""
+import math
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.lookups import Exact, GreaterThan, GreaterThanOrEqual, LessThan, LessThanOrEqual
+
+from .catalogo import chave_vitrine
+from .ordenacao import ORDENACAO_PADRAO
+
+ORDEM_VITRINE = ('-destaque', '-data_cadastro', '-id')
+
+TOTAL_CACHE_SEGUNDOS = 300
+_SALT_CURSOR = 'imoveis.paginacao.cursor'
+
+
+def comparar_chave(colunas, valores, comparacao):
+    """
+    Q de `(colunas) < (valores)` (ou `>`, conforme `comparacao`) na ordem lexicográfica:
+    a primeira coluna menor, ou ela igual e a segunda menor, e assim por diante.
+    """
+    inclusiva = {LessThan: LessThanOrEqual, GreaterThan: GreaterThanOrEqual}[comparacao]
+    alternativas = Q()
+    iguais = []
+    for coluna, valor in zip(colunas, valores):
+        alternativas |= Q(*iguais, comparacao(coluna, valor))
+        iguais.append(Exact(coluna, valor))
+    return Q(inclusiva(colunas[0], valores[0])) & alternativas
+
+
+def total_em_cache(queryset, params):
+    """COUNT(*) do filtro, calculado uma vez a cada TOTAL_CACHE_SEGUNDOS (ou mudança no catálogo)."""
+    chave = chave_vitrine('lista_imoveis:total', params)
+    total = cache.get(chave)
+    if total is None:
+        total = queryset.count()
+        cache.set(chave, total, TOTAL_CACHE_SEGUNDOS)
+    return total
+
+
+def _chave_do_imovel(imovel, ordenacao):
+    # Aceita instâncias e linhas de .values() (API JSON)
+    if isinstance(imovel, dict):
+        destaque, pk = imovel['destaque'], imovel['id']
+    else:
+        destaque, pk = imovel.destaque, imovel.id
+    return [destaque, ordenacao.serializar(ordenacao.valor(imovel)), pk]
+
+
+def carregar_por_ids(queryset, ids):
+    """Carrega `ids` do queryset (instâncias ou .values()) mantendo a ordem; ids que sumiram são pulados."""
+    ids = [int(pk) for pk in ids]
+    if queryset._fields is not None:
+        # in_bulk() não aceita .values(): monta o mapa id -> linha na mão
+        objetos = {linha['id']: linha for linha in queryset.filter(id__in=ids)}
+    else:
+        objetos = queryset.in_bulk(ids)
+    return [objetos[pk] for pk in ids if pk in objetos]
+
+
+def codificar_cursor(imovel, direcao, offset, ordenacao=ORDENACAO_PADRAO):
+    """Token opaco (e assinado) que aponta para a página antes/depois de `imovel`."""
+    return signing.dumps(
+        {'k': _chave_do_imovel(imovel, ordenacao), 'd': direcao, 'o': offset},
+        salt=_SALT_CURSOR,
+        compress=True,
+    )
+
+
+def decodificar_cursor(token, ordenacao=ORDENACAO_PADRAO):
+    """Devolve (chave, direcao, offset) ou None se o token for inválido/adulterado (ou de outra ordenação)."""
+    try:
+        dados = signing.loads(token, salt=_SALT_CURSOR)
+        destaque, valor, pk = dados['k']
+        chave = (bool(destaque), ordenacao.desserializar(valor), int(pk))
+        direcao = 'p' if dados['d'] == 'p' else 'n'
+        return chave, direcao, max(int(dados['o']), 0)
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+class PaginaCursor:
+    """Página de resultados com a mesma 'cara' que o template espera de um Page do Django."""
+
+    def __init__(self, object_list, total, offset, por_pagina, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.total = total
+        self.offset = offset
+        self.por_pagina = por_pagina
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.offset > 0
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def start_index(self):
+        return self.offset + 1 if self.object_list else 0
+
+    @property
+    def end_index(self):
+        return self.offset + len(self.object_list)
+
+    @property
+    def number(self):
+        return self.offset // self.por_pagina + 1
+
+    @property
+    def num_pages(self):
+        return max(math.ceil(self.total / self.por_pagina), self.number)
+
+    @property
+    def is_last(self):
+        return self.number >= self.num_pages
+
+
+class FonteQueryset:
+    """Busca as páginas direto no banco (caminho padrão)."""
+
+    def __init__(self, queryset, params, ordenacao=ORDENACAO_PADRAO):
+        self.queryset = queryset.order_by(*ordenacao.order_by())
+        self.params = params
+        self.ordenacao = ordenacao
+        self.colunas = ordenacao.colunas()
+        # Nas ordens decrescentes "depois" é menor; nas crescentes, maior
+        if ordenacao.decrescente:
+            self._depois, self._antes = LessThan, GreaterThan
+        else:
+            self._depois, self._antes = GreaterThan, LessThan
+
+    def total(self):
+        return total_em_cache(self.queryset, self.params)
+
+    def fatia(self, offset, quantidade):
+        return list(self.queryset[offset:offset + quantidade])
+
+    def depois(self, chave, quantidade):
+        condicao = comparar_chave(self.colunas, self.ordenacao.comparavel(chave), self._depois)
+        return list(self.queryset.filter(condicao)[:quantidade])
+
+    def antes(self, chave, quantidade):
+        # Percorre na ordem inversa e desvira o resultado
+        condicao = comparar_chave(self.colunas, self.ordenacao.comparavel(chave), self._antes)
+        invertido = self.queryset.filter(condicao).reverse()
+        return list(invertido[:quantidade])[::-1]
+
+    def ultimos(self, quantidade):
+        return list(self.queryset.reverse()[:quantidade])[::-1]
+
+
+class FonteIds:
+    """
+    Busca as páginas numa lista de ids já ordenada (busca textual ranqueada ou
+    resultado em cache de imoveis/catalogo.py).
+    O cursor guarda o id do último item; a posição dele na lista dá a próxima página.
+
+    Se a lista for só o começo do resultado (`total` maior que ela), as páginas
+    que passam do fim são pedidas à fonte devolvida por `reserva()`.
+    """
+
+    def __init__(self, ids, queryset, total=None, reserva=None):
+        self.ids = list(ids)
+        self.queryset = queryset
+        self._total = len(self.ids) if total is None else total
+        self._reserva = reserva
+        self._fonte_reserva = None
+        self._posicao = {pk: i for i, pk in enumerate(self.ids)}
+
+    def total(self):
+        return self._total
+
+    def _completa(self):
+        return self._reserva is None or len(self.ids) >= self._total
+
+    def _fonte(self):
+        if self._fonte_reserva is None:
+            self._fonte_reserva = self._reserva()
+        return self._fonte_reserva
+
+    def _carregar(self, ids):
+        return carregar_por_ids(self.queryset, ids)
+
+    def fatia(self, offset, quantidade):
+        if offset + quantidade > len(self.ids) and not self._completa():
+            return self._fonte().fatia(offset, quantidade)
+        return self._carregar(self.ids[offset:offset + quantidade])
+
+    def ultimos(self, quantidade):
+        if not self._completa():
+            return self._fonte().ultimos(quantidade)
+        return self._carregar(self.ids[max(len(self.ids) - quantidade, 0):])
+
+    def depois(self, chave, quantidade):
+        posicao = self._posicao.get(chave[2])
+        if posicao is not None and (posicao + 1 + quantidade <= len(self.ids) or self._completa()):
+            return self._carregar(self.ids[posicao + 1:posicao + 1 + quantidade])
+        if self._reserva is not None:
+            return self._fonte().depois(chave, quantidade)
+        return None
+
+    def antes(self, chave, quantidade):
+        posicao = self._posicao.get(chave[2])
+        if posicao is not None:
+            return self._carregar(self.ids[max(posicao - quantidade, 0):posicao])
+        if self._reserva is not None:
+            return self._fonte().antes(chave, quantidade)
+        return None
+
+
+def paginar_por_cursor(queryset, params, por_pagina=50, fonte=None, ordenacao=ORDENACAO_PADRAO):
+    """
+    Pagina `queryset` (já filtrado) na ordem da vitrine.
+
+    Aceita `?cursor=<token>` (navegação normal) e, por compatibilidade com links
+    antigos já indexados, `?page=N` (usa OFFSET só na página de entrada; a partir
+    dela a navegação segue por cursor).
+
+    `fonte` permite trocar o banco por outra origem com a mesma interface
+    (total/fatia/ultimos/depois/antes), como o índice em memória de imoveis/vitrine.py
+    ou uma lista de ids ranqueada (FonteIds).
+    """
+    if fonte is None:
+        fonte = FonteQueryset(queryset, params, ordenacao)
+    total = fonte.total()
+
+    cursor = decodificar_cursor(params.get('cursor', ''), ordenacao) if params.get('cursor') else None
+    itens = None
+
+    if cursor:
+        chave, direcao, offset = cursor
+        # Uma fonte pode devolver None quando não reconhece o cursor: volta à 1ª página
+        if direcao == 'n':
+            itens = fonte.depois(chave, por_pagina + 1)
+            if itens is not None:
+                tem_mais = len(itens) > por_pagina
+                itens = itens[:por_pagina]
+        else:
+            itens = fonte.antes(chave, por_pagina)
+            tem_mais = True
+            if itens is not None and len(itens) < por_pagina:
+                # Chegamos ao começo da lista: mostra a primeira página completa
+                itens = None
+
+    if itens is None:
+        pagina = params.get('page', '')
+        offset = (int(pagina) - 1) * por_pagina if pagina.isdigit() and int(pagina) > 1 else 0
+        ultima = (math.ceil(total / por_pagina) - 1) * por_pagina
+        if 0 < offset == ultima:
+            # Link "Última": lê do fim da ordem, sem pular `offset` linhas
+            itens = fonte.ultimos(total - offset)
+            tem_mais = False
+        else:
+            itens = fonte.fatia(offset, por_pagina + 1)
+            tem_mais = len(itens) > por_pagina
+            itens = itens[:por_pagina]
+
+    next_cursor = prev_cursor = None
+    if itens and tem_mais:
+        next_cursor = codificar_cursor(itens[-1], 'n', offset + len(itens), ordenacao)
+    if itens and offset > 0:
+        prev_cursor = codificar_cursor(itens[0], 'p', max(offset - por_pagina, 0), ordenacao)
+
+    return PaginaCursor(itens, total, offset, por_pagina, next_cursor, prev_cursor)
@@ -0,0 +1,289 @@
+# imoveis/semelhantes.py
+"""
+Bloco "Imóveis semelhantes" do detalhe.
+
+O cálculo roda fora da requisição (comando `calcular_semelhantes`) e guarda
+os k mais parecidos de cada imóvel em ImovelSemelhante. O detalhe só lê
+essas linhas: uma consulta pelo índice (imovel, posicao), sem conta nenhuma.
+
+Cálculo, por cidade e finalidade (venda e aluguel nunca são comparados, o
+preço não tem a mesma escala):
+
+* cada imóvel ATIVO vira um vetor NumPy com log(preço), log(área), quartos,
+  suítes e banheiros, padronizados dentro do grupo e multiplicados por PESOS;
+* bairro diferente (ou desconhecido) soma PENALIDADE_BAIRRO à distância;
+* as distâncias saem em blocos de linhas (|a|² + |b|² - 2a·b, um produto de
+  matrizes por bloco) e argpartition separa os k menores de cada linha.
+
+Execução incremental: cada cidade guarda a assinatura (md5) dos dados que
+entraram no último cálculo e quando ele começou (SemelhantesCidade). Se
+nenhum imóvel ativo da cidade entrou, saiu ou mudou desde então, ela é
+pulada. Se algo mudou, só são refeitas as linhas que a mudança alcança
+(atualizar_cidade):
+
+* os imóveis com atualizado_em depois do último cálculo, e os que não têm
+  as k linhas (acabaram de entrar no grupo, ou o grupo cresceu);
+* os que apontam para um deles ou para quem saiu do grupo (expirou, mudou
+  de cidade/finalidade);
+* os que passariam a ter um deles no top-k: a distância até ele é menor que
+  até o k-ésimo vizinho atual (uma matriz n x mudados, não n x n).
+
+Os outros mantêm os vizinhos do cálculo anterior, que usou a média/desvio
+do grupo daquela vez. Isso é uma aproximação (a padronização anda um pouco
+a cada mudança); `--tudo` refaz tudo do zero.
+"""
+import hashlib
+from collections import defaultdict
+
+try:
+    import numpy as np
+except ImportError:  # o comando avisa; o detalhe só lê o que já foi calculado
+    np = None
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Imovel, ImovelSemelhante, SemelhantesCidade
+
+SEMELHANTES_POR_IMOVEL = 6
+
+CAMPOS_NUMERICOS = ('preco', 'area', 'quartos', 'suites', 'banheiros')
+# Peso de cada campo (já padronizado) na distância, na ordem de CAMPOS_NUMERICOS
+PESOS = (2.0, 1.5, 1.0, 0.5, 0.5)
+PENALIDADE_BAIRRO = 1.0
+NULO = -1
+
+# Tamanho máximo (em células) da matriz de distâncias de um bloco: ~32 MB em float64
+CELULAS_POR_BLOCO = 4_000_000
+LOTE_GRAVACAO = 5000
+
+
+def imoveis_ativos():
+    return Imovel.objects.filter(
+        status_publicacao=Imovel.StatusPublicacao.ATIVO,
+        data_expiracao__gt=timezone.now(),
+    )
+
+
+def carregar_por_cidade():
+    """{cidade_id: [(id, finalidade, bairro_id, preco, area, quartos, suites, banheiros), ...]} (por id)."""
+    linhas = (
+        imoveis_ativos().exclude(cidade=None)
+        .order_by('cidade_id', 'id')
+        .values_list('cidade_id', 'id', 'finalidade', 'bairro_id', *CAMPOS_NUMERICOS)
+    )
+    por_cidade = defaultdict(list)
+    for cidade_id, *linha in linhas.iterator(chunk_size=5000):
+        por_cidade[cidade_id].append(tuple(linha))
+    return por_cidade
+
+
+def assinatura(linhas, k):
+    return hashlib.md5(repr((k, linhas)).encode('utf-8')).hexdigest()
+
+
+def vetorizar(linhas):
+    """Matriz (n x len(CAMPOS_NUMERICOS)) padronizada e ponderada."""
+    bruto = np.array(
+        [[np.nan if valor is None else float(valor) for valor in linha[3:]] for linha in linhas],
+        dtype=np.float64,
+    ).reshape(len(linhas), len(CAMPOS_NUMERICOS))
+    # Preço e área variam em ordens de grandeza: compara a razão, não a diferença
+    for coluna in (0, 1):
+        valores = bruto[:, coluna]
+        positivos = valores > 0
+        valores[positivos] = np.log(valores[positivos])
+        valores[~positivos] = np.nan
+    # Valor faltando: a mediana do grupo (não aproxima nem afasta ninguém)
+    for coluna in range(bruto.shape[1]):
+        valores = bruto[:, coluna]
+        faltando = np.isnan(valores)
+        valores[faltando] = np.median(valores[~faltando]) if (~faltando).any() else 0.0
+    desvio = bruto.std(axis=0)
+    desvio[desvio == 0] = 1.0
+    return (bruto - bruto.mean(axis=0)) / desvio * np.array(PESOS)
+
+
+def _distancias(matriz, normas, bairros, linhas, colunas=slice(None)):
+    """Distâncias das `linhas` (índices) às `colunas` (todas, por padrão), com a penalidade de bairro."""
+    distancias = normas[linhas, None] + normas[None, colunas] - 2.0 * (matriz[linhas] @ matriz[colunas].T)
+    bairros_linhas = bairros[linhas, None]
+    distancias += ((bairros_linhas != bairros[None, colunas]) | (bairros_linhas == NULO)) * PENALIDADE_BAIRRO
+    return distancias
+
+
+def vizinhos(matriz, bairros, k, linhas=None):
+    """
+    Para cada linha (todas, ou só os índices `linhas`), os índices das k linhas mais
+    próximas (sem ela mesma), da mais perto à mais longe.
+    """
+    n = len(matriz)
+    linhas = np.arange(n) if linhas is None else np.asarray(linhas, dtype=np.int64)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((len(linhas), 0), dtype=np.int64)
+
+    normas = (matriz * matriz).sum(axis=1)
+    bloco = max(1, CELULAS_POR_BLOCO // n)
+    resultado = np.empty((len(linhas), k), dtype=np.int64)
+    for inicio in range(0, len(linhas), bloco):
+        parte = linhas[inicio:inicio + bloco]
+        distancias = _distancias(matriz, normas, bairros, parte)
+        distancias[np.arange(len(parte)), parte] = np.inf  # ele mesmo
+        candidatos = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+        ordem = np.argsort(np.take_along_axis(distancias, candidatos, axis=1), axis=1, kind='stable')
+        resultado[inicio:inicio + len(parte)] = np.take_along_axis(candidatos, ordem, axis=1)
+    return resultado
+
+
+def _grupos(linhas):
+    """(ids, bairros, matriz) de cada finalidade da cidade."""
+    por_finalidade = defaultdict(list)
+    for linha in linhas:
+        por_finalidade[linha[1]].append(linha)
+    for grupo in por_finalidade.values():
+        ids = np.array([linha[0] for linha in grupo], dtype=np.int64)
+        bairros = np.array([NULO if linha[2] is None else linha[2] for linha in grupo], dtype=np.int64)
+        yield ids, bairros, vetorizar(grupo)
+
+
+def _linhas_de(ids, indices, semelhantes):
+    """Tuplas (imovel_id, semelhante_id, posicao) dos `indices` do grupo."""
+    return [
+        (imovel_id, semelhante_id, posicao)
+        for imovel_id, vizinhos_ids in zip(ids[indices].tolist(), ids[semelhantes].tolist())
+        for posicao, semelhante_id in enumerate(vizinhos_ids)
+    ]
+
+
+def _marcar(cidade_id, linhas, k, inicio):
+    SemelhantesCidade.objects.update_or_create(cidade_id=cidade_id, defaults={'assinatura': assinatura(linhas, k)})
+    # update() não passa pelo auto_now: vale o início da execução (o que mudou durante ela entra na próxima)
+    SemelhantesCidade.objects.filter(cidade_id=cidade_id).update(calculado_em=inicio)
+
+
+def calcular_cidade(cidade_id, linhas, k, inicio=None):
+    """Refaz os semelhantes de todos os imóveis ativos da cidade. Devolve quantas linhas gravou."""
+    novos = []
+    for ids, bairros, matriz in _grupos(linhas):
+        novos.extend(_linhas_de(ids, np.arange(len(ids)), vizinhos(matriz, bairros, k)))
+
+    with transaction.atomic():
+        # Pela cidade ATUAL do imóvel: quem mudou de cidade também perde as linhas antigas
+        ImovelSemelhante.objects.filter(imovel__cidade_id=cidade_id).delete()
+        _inserir(novos)
+        _marcar(cidade_id, linhas, k, inicio or timezone.now())
+    return len(novos)
+
+
+def a_refazer(ids, matriz, bairros, k, atuais, mudados_ids):
+    """
+    Índices do grupo cujas linhas a mudança alcança (ver o docstring do módulo).
+    `atuais` = {imovel_id: [semelhante_id, ...] na ordem de posicao}.
+    """
+    n = len(ids)
+    k = min(k, n - 1)
+    posicao = {imovel_id: indice for indice, imovel_id in enumerate(ids.tolist())}
+    mudados = {
+        indice for indice, imovel_id in enumerate(ids.tolist())
+        if imovel_id in mudados_ids or len(atuais.get(imovel_id, ())) != k
+    }
+    refazer = set(mudados)
+    for indice, imovel_id in enumerate(ids.tolist()):
+        if indice not in refazer and any(posicao.get(v) is None or posicao[v] in mudados for v in atuais[imovel_id]):
+            refazer.add(indice)
+
+    restantes = np.array(sorted(set(range(n)) - refazer), dtype=np.int64)
+    if not mudados or not len(restantes) or k <= 0:
+        return refazer
+    # Algum dos que mudaram ficou mais perto que o k-ésimo vizinho atual?
+    colunas = np.array(sorted(mudados), dtype=np.int64)
+    normas = (matriz * matriz).sum(axis=1)
+    bloco = max(1, CELULAS_POR_BLOCO // len(colunas))
+    for inicio in range(0, len(restantes), bloco):
+        parte = restantes[inicio:inicio + bloco]
+        ultimos = np.array([posicao[atuais[ids[indice]][-1]] for indice in parte.tolist()], dtype=np.int64)
+        diferenca = matriz[parte] - matriz[ultimos]
+        ate_o_ultimo = (diferenca * diferenca).sum(axis=1) + (
+            (bairros[parte] != bairros[ultimos]) | (bairros[parte] == NULO)
+        ) * PENALIDADE_BAIRRO
+        mais_perto = _distancias(matriz, normas, bairros, parte, colunas).min(axis=1) < ate_o_ultimo
+        refazer.update(parte[mais_perto].tolist())
+    return refazer
+
+
+def atualizar_cidade(cidade_id, linhas, k, desde, inicio=None):
+    """
+    Refaz só as linhas que as mudanças desde `desde` (o início do último cálculo)
+    alcançam. Devolve quantas linhas gravou.
+    """
+    mudados_ids = set(
+        imoveis_ativos().filter(cidade_id=cidade_id, atualizado_em__gte=desde).values_list('id', flat=True)
+    )
+    atuais = defaultdict(list)
+    for imovel_id, semelhante_id in (
+        ImovelSemelhante.objects.filter(imovel__cidade_id=cidade_id, posicao__lt=k)
+        .order_by('imovel_id', 'posicao').values_list('imovel_id', 'semelhante_id')
+    ):
+        atuais[imovel_id].append(semelhante_id)
+
+    refeitos, novos = [], []
+    for ids, bairros, matriz in _grupos(linhas):
+        indices = np.array(sorted(a_refazer(ids, matriz, bairros, k, atuais, mudados_ids)), dtype=np.int64)
+        if len(indices):
+            novos.extend(_linhas_de(ids, indices, vizinhos(matriz, bairros, k, indices)))
+            refeitos.extend(ids[indices].tolist())
+
+    with transaction.atomic():
+        ImovelSemelhante.objects.filter(imovel__cidade_id=cidade_id, posicao__gte=k).delete()  # --k diminuiu
+        for inicio_lote in range(0, len(refeitos), LOTE_GRAVACAO):
+            ImovelSemelhante.objects.filter(imovel_id__in=refeitos[inicio_lote:inicio_lote + LOTE_GRAVACAO]).delete()
+        _inserir(novos)
+        _marcar(cidade_id, linhas, k, inicio or timezone.now())
+    return len(novos)
+
+
+def _inserir(linhas):
+    """
+    INSERT direto de tuplas (imovel_id, semelhante_id, posicao). Uma cidade grande
+    gera centenas de milhares de linhas, e montar um objeto do ORM para cada uma
+    (bulk_create) custava mais que o cálculo inteiro.
+    """
+    tabela = connection.ops.quote_name(ImovelSemelhante._meta.db_table)
+    sql = f'INSERT INTO {tabela} ("imovel_id", "semelhante_id", "posicao") VALUES (%s, %s, %s)'
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(linhas), LOTE_GRAVACAO):
+            cursor.executemany(sql, linhas[inicio:inicio + LOTE_GRAVACAO])
+
+
+def calcular_semelhantes(k=SEMELHANTES_POR_IMOVEL, tudo=False):
+    """
+    Atualiza as cidades cujos imóveis ativos mudaram desde a última execução (só
+    as linhas alcançadas; a cidade inteira na primeira vez ou com `tudo=True`).
+    Devolve (cidades recalculadas, cidades puladas, linhas gravadas).
+    """
+    inicio = timezone.now()
+    por_cidade = carregar_por_cidade()
+    anteriores = {} if tudo else {
+        cidade_id: (assinatura_anterior, calculado_em)
+        for cidade_id, assinatura_anterior, calculado_em in SemelhantesCidade.objects.values_list(
+            'cidade_id', 'assinatura', 'calculado_em',
+        )
+    }
+
+    recalculadas = puladas = gravadas = 0
+    for cidade_id, linhas in por_cidade.items():
+        anterior = anteriores.get(cidade_id)
+        if anterior is None:
+            gravadas += calcular_cidade(cidade_id, linhas, k, inicio)
+        elif anterior[0] == assinatura(linhas, k):
+            puladas += 1
+            continue
+        else:
+            gravadas += atualizar_cidade(cidade_id, linhas, k, anterior[1], inicio)
+        recalculadas += 1
+
+    # Imóveis que saíram da vitrine (expirados, pausados, sem cidade) e cidades que ficaram vazias
+    ImovelSemelhante.objects.exclude(imovel__in=imoveis_ativos().exclude(cidade=None)).delete()
+    SemelhantesCidade.objects.exclude(cidade_id__in=list(por_cidade)).delete()
+    return recalculadas, puladas, gravadas
@@ -0,0 +1,65 @@
+# imoveis/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Imovel, Cidade, Bairro, Imobiliaria, ProcessamentoFoto
+from . import vitrine
+from .catalogo import incrementar_versao_catalogo, incrementar_versao_referencia
+
+# Gravações que não mudam nada do que a vitrine filtra/ordena (não invalidam o cache)
+CAMPOS_FORA_DA_VITRINE = {'visualizacoes'}
+
+
+# --- VERSÃO DO CATÁLOGO (cache de resultados, totais e facetas; imoveis/catalogo.py) ---
+@receiver(post_save, sender=Imovel)
+def invalidar_cache_ao_salvar(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= CAMPOS_FORA_DA_VITRINE:
+        return
+    transaction.on_commit(incrementar_versao_catalogo)
+
+
+@receiver(post_delete, sender=Imovel)
+def invalidar_cache_ao_remover(sender, instance, **kwargs):
+    transaction.on_commit(incrementar_versao_catalogo)
+
+
+# --- VERSÃO DE REFERÊNCIA (opções de cidade/imobiliária do formulário de busca e o
+# índice do autocompletar de cidade/bairro, imoveis/autocompletar.py) ---
+@receiver(post_save, sender=Cidade)
+@receiver(post_delete, sender=Cidade)
+@receiver(post_save, sender=Bairro)
+@receiver(post_delete, sender=Bairro)
+@receiver(post_save, sender=Imobiliaria)
+@receiver(post_delete, sender=Imobiliaria)
+def invalidar_formulario_busca(sender, **kwargs):
+    transaction.on_commit(incrementar_versao_referencia)
+
+
+# --- ÍNDICE DA VITRINE EM MEMÓRIA (imoveis/vitrine.py) ---
+@receiver(post_save, sender=Imovel)
+def atualizar_vitrine_ao_salvar(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= CAMPOS_FORA_DA_VITRINE:
+        return
+    indice = vitrine.indice_carregado()
+    if indice is not None:
+        # Só depois do COMMIT: se a transação voltar atrás, o índice não muda
+        transaction.on_commit(lambda: indice.atualizar(instance.pk))
+
+
+@receiver(post_delete, sender=Imovel)
+def remover_da_vitrine(sender, instance, **kwargs):
+    indice = vitrine.indice_carregado()
+    if indice is not None:
+        pk = instance.pk
+        transaction.on_commit(lambda: indice.remover(pk))
+
+
+# --- FILA DE FOTOS (contas/fila_fotos.py) ---
+@receiver(post_delete, sender=ProcessamentoFoto)
+def apagar_original_da_fila(sender, instance, **kwargs):
+    # Imóvel/foto apagados antes do worker passar: o original não fica esquecido no staging
+    if instance.status in (ProcessamentoFoto.Status.PENDENTE, ProcessamentoFoto.Status.PROCESSANDO):
+        from contas.fila_fotos import apagar_temporario
+        nome = instance.arquivo_temporario
+        transaction.on_commit(lambda: apagar_temporario(nome))
@@ -13,14 +13,14 @@ class ImovelSitemap(Sitemap):
     def items(self):
         # Retorna todos os imóveis que estão publicados e não expirados
         agora = timezone.now()
-        return Imovel.objects.filter(
+        return Imovel.objects.vitrine().filter(
             status_publicacao='ATIVO',
             data_expiracao__gt=agora
         ).order_by('-data_cadastro')
 
     def lastmod(self, obj):
-        # Retorna a data da última modificação (ou cadastro)
-        return obj.data_cadastro
+        # Retorna a data da última modificação do anúncio
+        return obj.atualizado_em
 
     def location(self, obj):
         # Retorna a URL para um imóvel específico
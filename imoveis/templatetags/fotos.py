@@ -0,0 +1,30 @@
+# imoveis/templatetags/fotos.py
+from django import template
+
+from contas.uploads import nome_derivado
+
+register = template.Library()
+
+
+@register.inclusion_tag('imoveis/foto_responsiva.html')
+def foto_responsiva(campo, derivados, sizes, alt='', classe='', estilo='', carregamento=''):
+    """
+    <picture> com srcset WebP + JPEG das versões reduzidas da foto (contas/uploads.py);
+    o navegador baixa só a largura que vai exibir. Sem versões (foto antiga, ou
+    trocada fora da fila) sai o <img> do original, como antes.
+
+    {% foto_responsiva imovel.foto_principal imovel.foto_principal_derivados "(min-width: 992px) 25vw, 50vw" alt=imovel.titulo %}
+    """
+    contexto = {'alt': alt, 'classe': classe, 'estilo': estilo, 'carregamento': carregamento, 'sizes': sizes}
+    larguras = (derivados or {}).get('larguras') or []
+    if not larguras or derivados.get('nome') != campo.name:
+        return {**contexto, 'src': campo.url}
+
+    url = campo.storage.url
+    srcset = {
+        extensao: ', '.join(f"{url(nome_derivado(campo.name, largura, extensao))} {largura}w" for largura in larguras)
+        for extensao in ('webp', 'jpg')
+    }
+    # src de quem não entende srcset: a segunda menor (640) ou a única
+    src = url(nome_derivado(campo.name, larguras[min(1, len(larguras) - 1)], 'jpg'))
+    return {**contexto, 'src': src, 'srcset_webp': srcset['webp'], 'srcset_jpg': srcset['jpg']}
@@ -1,3 +1,1102 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.cache import cache, caches
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Imovel, Cidade, Bairro, Imobiliaria
+
+
+def consultas_fora_do_cache(contexto):
+    """SQL capturado fora o das versões (sem Redis elas ficam na tabela VersaoGlobal; com Redis, no cache)."""
+    return [consulta['sql'] for consulta in contexto.captured_queries if 'imoveis_versaoglobal' not in consulta['sql']]
+
+
+class VitrineProjecaoTests(TestCase):
+    """Imovel.objects.vitrine(): o número de consultas não pode crescer com o tamanho da página."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cls.cidades = [Cidade.objects.create(nome=f"Cidade {i}", estado='MS') for i in range(3)]
+        cls.bairros = [Bairro.objects.create(cidade=cidade, nome=f"Centro {cidade.id}") for cidade in cls.cidades]
+        cls.imobiliaria = Imobiliaria.objects.create(nome="Imobiliária Teste")
+
+    def setUp(self):
+        cache.clear()
+
+    def criar_imoveis(self, quantidade):
+        expiracao = timezone.now() + timedelta(days=30)
+        for i in range(quantidade):
+            bairro = self.bairros[i % len(self.bairros)]
+            Imovel.objects.create(
+                proprietario=self.dono,
+                titulo=f"Casa {i}",
+                descricao="Descrição longa " * 50,
+                cidade=bairro.cidade,
+                bairro=bairro,
+                imobiliaria=self.imobiliaria,
+                preco=100000 + i,
+                status_publicacao=Imovel.StatusPublicacao.ATIVO,
+                data_expiracao=expiracao,
+            )
+
+    def contar_consultas(self, url):
+        # Começa sempre do zero: sem resultados/facetas em cache e sem o Site em memória
+        cache.clear()
+        Site.objects.clear_cache()
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return len(consultas)
+
+    def test_projecao_nao_carrega_descricao(self):
+        self.criar_imoveis(1)
+        imovel = Imovel.objects.vitrine().get()
+        self.assertIn('descricao', imovel.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.assertEqual(imovel.cidade.nome, "Cidade 0")
+            self.assertEqual(imovel.bairro.nome, f"Centro {imovel.cidade.id}")
+            self.assertEqual(imovel.imobiliaria.nome, "Imobiliária Teste")
+
+    def test_lista_imoveis_consultas_constantes(self):
+        self.criar_imoveis(2)
+        poucos = self.contar_consultas(reverse('lista_imoveis'))
+        self.criar_imoveis(48)
+        muitos = self.contar_consultas(reverse('lista_imoveis'))
+        self.assertEqual(poucos, muitos)
+
+    def test_meus_imoveis_consultas_constantes(self):
+        self.client.force_login(self.dono)
+        self.criar_imoveis(2)
+        poucos = self.contar_consultas(reverse('meus_imoveis'))
+        self.criar_imoveis(30)
+        muitos = self.contar_consultas(reverse('meus_imoveis'))
+        self.assertEqual(poucos, muitos)
+
+    def test_sitemap_consultas_constantes(self):
+        self.criar_imoveis(2)
+        poucos = self.contar_consultas('/sitemap.xml')
+        self.criar_imoveis(30)
+        muitos = self.contar_consultas('/sitemap.xml')
+        self.assertEqual(poucos, muitos)
+
+
+class PaginacaoCursorTests(TestCase):
+    """Paginação por cursor de imoveis/paginacao.py no banco (FonteQueryset)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        mesma_data = timezone.now() - timedelta(days=1)
+        precos = [None, 100, 100, 250, None, 100, 80, 250]
+        for i, preco in enumerate(precos):
+            Imovel.objects.create(
+                titulo=f"Imóvel {i}", proprietario=dono, preco=preco, destaque=i % 3 == 0,
+                status_publicacao=Imovel.StatusPublicacao.ATIVO, data_expiracao=timezone.now() + timedelta(days=30),
+            )
+        # Empates em (destaque, data_cadastro): só o id separa
+        Imovel.objects.update(data_cadastro=mesma_data)
+
+    def setUp(self):
+        cache.clear()
+
+    def percorrer(self, ordenacao, por_pagina=3):
+        from .paginacao import paginar_por_cursor
+
+        queryset = Imovel.objects.all()
+        pagina = paginar_por_cursor(queryset, QueryDict(''), por_pagina=por_pagina, ordenacao=ordenacao)
+        paginas = [[imovel.id for imovel in pagina]]
+        while pagina.has_next:
+            params = QueryDict(f'cursor={pagina.next_cursor}')
+            pagina = paginar_por_cursor(queryset, params, por_pagina=por_pagina, ordenacao=ordenacao)
+            paginas.append([imovel.id for imovel in pagina])
+        # E de volta, pelos cursores "Anterior"
+        voltando = []
+        while pagina.prev_cursor:
+            params = QueryDict(f'cursor={pagina.prev_cursor}')
+            pagina = paginar_por_cursor(queryset, params, por_pagina=por_pagina, ordenacao=ordenacao)
+            voltando.append([imovel.id for imovel in pagina])
+        return paginas, voltando
+
+    def test_ida_e_volta_com_empates(self):
+        from .ordenacao import ORDENACOES
+
+        for nome, ordenacao in ORDENACOES.items():
+            esperado = list(Imovel.objects.order_by(*ordenacao.order_by()).values_list('id', flat=True))
+            paginas, voltando = self.percorrer(ordenacao)
+            self.assertEqual(sum(paginas, []), esperado, nome)
+            self.assertEqual(voltando, paginas[-2::-1], nome)
+
+    def test_cursor_adulterado_volta_para_a_primeira_pagina(self):
+        from .paginacao import paginar_por_cursor
+
+        primeira = paginar_por_cursor(Imovel.objects.all(), QueryDict(''), por_pagina=3)
+        adulterado = primeira.next_cursor[:-2] + ('AA' if not primeira.next_cursor.endswith('AA') else 'BB')
+        for cursor in (adulterado, 'lixo', ''):
+            pagina = paginar_por_cursor(Imovel.objects.all(), QueryDict(f'cursor={cursor}'), por_pagina=3)
+            self.assertEqual([i.id for i in pagina], [i.id for i in primeira])
+            self.assertEqual(pagina.number, 1)
+
+    def test_total_em_cache_e_ultima_pagina(self):
+        from .paginacao import paginar_por_cursor
+
+        queryset = Imovel.objects.all()
+        self.assertEqual(paginar_por_cursor(queryset, QueryDict(''), por_pagina=3).total, 8)
+        with CaptureQueriesContext(connection) as consultas:
+            pagina = paginar_por_cursor(queryset, QueryDict('page=3'), por_pagina=3)
+        self.assertFalse([sql for sql in consultas_fora_do_cache(consultas) if 'COUNT(' in sql])
+        self.assertNotIn('OFFSET', ' '.join(consultas_fora_do_cache(consultas)))
+        esperado = list(queryset.order_by('-destaque', '-data_cadastro', '-id').values_list('id', flat=True))
+        self.assertEqual([i.id for i in pagina], esperado[6:])
+        self.assertTrue(pagina.is_last)
+        self.assertFalse(pagina.has_next)
+        self.assertEqual(pagina.total, 8)
+
+
+class VitrineEmMemoriaTests(TestCase):
+    """O índice NumPy (imoveis/vitrine.py) devolve o mesmo que o banco."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cls.cidades = [Cidade.objects.create(nome=nome, estado="MS") for nome in ("Campo Grande", "Dourados")]
+        cls.bairro = Bairro.objects.create(cidade=cls.cidades[0], nome="Centro")
+        agora = timezone.now()
+        for i in range(30):
+            Imovel.objects.create(
+                proprietario=dono, cidade=cls.cidades[i % 2], bairro=cls.bairro if i % 4 == 0 else None,
+                finalidade='VENDA' if i % 3 else 'ALUGUEL', quartos=i % 5 or None, area=40 + i * 7,
+                preco=None if i % 7 == 0 else 90000 + i * 15000, destaque=i % 6 == 0,
+                latitude=-20.45 - i * 0.01, longitude=-54.6 + i * 0.01,
+                status_publicacao='PAUSADO' if i == 29 else Imovel.StatusPublicacao.ATIVO,
+                data_expiracao=agora + timedelta(days=-1 if i == 28 else 30),
+            )
+        # Empates de data_cadastro, como num import em lote
+        Imovel.objects.filter(id__in=Imovel.objects.order_by('id').values('id')[:10]).update(
+            data_cadastro=agora - timedelta(days=2))
+
+    def test_mesmos_ids_e_paginas_que_o_banco(self):
+        from .filtros import aplicar_filtros
+        from .paginacao import FonteQueryset, paginar_por_cursor
+        from .vitrine import IndiceVitrine
+
+        agora = timezone.now()
+        vitrine_ativa = Imovel.objects.filter(status_publicacao='ATIVO', data_expiracao__gt=agora)
+        indice = IndiceVitrine()
+        indice.construir()
+        consultas = (
+            '', 'finalidade=VENDA', f'cidade={self.cidades[0].id}&quartos=2',
+            f'cidade={self.cidades[0].id}&bairro={self.bairro.id}', 'preco_max=300000&area=100',
+            'quartos=abc&finalidade=PERMUTA', 'caixa=-20.70,-54.50,-20.50,-54.30',
+            'lat=-20.6&lng=-54.45&raio=10',
+        )
+        for consulta in consultas:
+            params = QueryDict(consulta)
+            filtrados = aplicar_filtros(vitrine_ativa, params).order_by('-destaque', '-data_cadastro', '-id')
+            resultado = indice.buscar(params, agora, vitrine_ativa)
+            self.assertEqual([int(pk) for pk in resultado.ids], list(filtrados.values_list('id', flat=True)), consulta)
+
+            # Percorrendo por cursor, as páginas das duas fontes são as mesmas
+            def paginas(fonte):
+                pagina = paginar_por_cursor(filtrados, params, por_pagina=4, fonte=fonte)
+                ids = [[i.id for i in pagina]]
+                while pagina.has_next:
+                    pagina = paginar_por_cursor(filtrados, QueryDict(f'cursor={pagina.next_cursor}'), por_pagina=4, fonte=fonte)
+                    ids.append([i.id for i in pagina])
+                return ids
+            self.assertEqual(paginas(resultado), paginas(FonteQueryset(filtrados, params)), consulta)
+
+    def test_construcao_fora_da_requisicao(self):
+        from django.test import override_settings
+        from . import vitrine
+
+        with override_settings(VITRINE_EM_MEMORIA=True), \
+                mock.patch.object(vitrine, '_indice', None), \
+                mock.patch.object(vitrine, 'iniciar_reconstrucao_periodica') as iniciar, \
+                mock.patch.object(vitrine.IndiceVitrine, 'construir') as construir:
+            # Índice ainda não construído: a lista sai do banco e a thread é que constrói
+            resposta = self.client.get(reverse('lista_imoveis') + '?finalidade=VENDA')
+            self.assertEqual(resposta.status_code, 200)
+            iniciar.assert_called()
+            construir.assert_not_called()
+            self.assertEqual(resposta.context['imoveis'].total, 18)
+
+        indice = vitrine.IndiceVitrine()
+        indice.construir()
+        self.assertFalse(indice.desatualizado(300))
+        from .catalogo import incrementar_versao_catalogo
+        incrementar_versao_catalogo()
+        self.assertTrue(indice.desatualizado(300))
+
+
+class BuscaTextualTests(TestCase):
+    """Palavra-chave `?q=` da vitrine sobre o índice de texto (imoveis/busca_texto.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cls.cidade = Cidade.objects.create(nome="Água Clara", estado="MS")
+        cls.bairro = Bairro.objects.create(cidade=cls.cidade, nome="São João")
+        validade = timezone.now() + timedelta(days=30)
+
+        def criar(titulo, descricao='', **extra):
+            return Imovel.objects.create(
+                titulo=titulo, descricao=descricao, proprietario=cls.dono, cidade=cls.cidade,
+                status_publicacao=Imovel.StatusPublicacao.ATIVO, data_expiracao=validade, **extra,
+            )
+
+        cls.apartamento = criar("Apartamento mobiliado", "Perto do centro.", bairro=cls.bairro)
+        cls.piscina = criar("Casa com piscina", "Piscina aquecida e área de piscina coberta.")
+        # Em destaque, mas a piscina aparece uma vez só no meio de um texto longo
+        cls.chacara = criar(
+            "Chácara", "Terreno amplo com pomar, horta, curral, galpão, casa sede, "
+                       "casa de caseiro, represa e uma piscina pequena no fundo do terreno.",
+            destaque=True,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def buscar(self, q):
+        resposta = self.client.get(reverse('lista_imoveis'), {'q': q})
+        return [imovel.id for imovel in resposta.context['imoveis']]
+
+    def test_prefixo(self):
+        self.assertEqual(self.buscar('apart'), [self.apartamento.id])
+        self.assertEqual(self.buscar('mobil apto'), [])  # todos os termos precisam casar
+        self.assertEqual(self.buscar('mobil apart'), [self.apartamento.id])
+
+    def test_acentos_dos_dois_lados(self):
+        # Documento sem acento (bairro e cidade entram nele) e busca com/sem acento
+        self.assertEqual(self.buscar('sao joao'), [self.apartamento.id])
+        self.assertEqual(self.buscar('SÃO JOÃO'), [self.apartamento.id])
+        self.assertEqual(self.buscar('chacara'), [self.chacara.id])
+        self.assertEqual(len(self.buscar('agua clara')), 3)
+
+    def test_relevancia_antes_do_destaque(self):
+        self.assertEqual(self.buscar('piscina'), [self.piscina.id, self.chacara.id])
+        # Sem palavra-chave a ordem volta a ser a da vitrine (destaque primeiro)
+        self.assertEqual(self.buscar('')[0], self.chacara.id)
+
+    def test_salvar_sem_mudar_a_origem_nao_le_bairro_nem_cidade(self):
+        imovel = Imovel.objects.get(id=self.apartamento.id)
+        imovel.destaque = True
+        with CaptureQueriesContext(connection) as consultas:
+            imovel.save()
+        lidos = [c['sql'] for c in consultas if c['sql'].startswith('SELECT')]
+        self.assertFalse([sql for sql in lidos if 'imoveis_bairro' in sql or 'imoveis_cidade' in sql], lidos)
+
+        # Mudou o título: o documento é refeito (e o índice acompanha)
+        imovel.titulo = "Cobertura mobiliada"
+        imovel.save()
+        self.assertEqual(self.buscar('cobertura'), [imovel.id])
+        self.assertEqual(self.buscar('apartamento'), [])
+
+
+class FacetasTests(TestCase):
+    """Contagens por opção do formulário (imoveis/facetas.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cls.campo_grande = Cidade.objects.create(nome="Campo Grande", estado="MS")
+        cls.dourados = Cidade.objects.create(nome="Dourados", estado="MS")
+        centro = Bairro.objects.create(cidade=cls.campo_grande, nome="Centro")
+        jardim = Bairro.objects.create(cidade=cls.campo_grande, nome="Jardim")
+        validade = timezone.now() + timedelta(days=30)
+        linhas = [
+            (cls.campo_grande, centro, 'VENDA', 1), (cls.campo_grande, centro, 'ALUGUEL', 2),
+            (cls.campo_grande, jardim, 'VENDA', 3), (cls.campo_grande, jardim, 'VENDA', 5),
+            (cls.campo_grande, None, 'ALUGUEL', 0), (cls.dourados, None, 'VENDA', 2),
+            (cls.dourados, None, 'ALUGUEL', 4), (cls.dourados, None, 'VENDA', None),
+        ]
+        for cidade, bairro, finalidade, quartos in linhas:
+            Imovel.objects.create(
+                proprietario=dono, cidade=cidade, bairro=bairro, finalidade=finalidade, quartos=quartos,
+                status_publicacao=Imovel.StatusPublicacao.ATIVO, data_expiracao=validade,
+            )
+        Imovel.objects.create(proprietario=dono, cidade=cls.dourados, finalidade='VENDA', quartos=2,
+                              status_publicacao=Imovel.StatusPublicacao.ATIVO, data_expiracao=timezone.now() - timedelta(days=1))
+
+    def setUp(self):
+        cache.clear()
+
+    def base(self):
+        return Imovel.objects.filter(status_publicacao='ATIVO', data_expiracao__gt=timezone.now())
+
+    def contar(self, params, ignorar, campo):
+        from collections import Counter
+        from .filtros import aplicar_filtros
+
+        valores = aplicar_filtros(self.base(), params, ignorar=ignorar).values_list(campo, flat=True)
+        return dict(Counter(valor for valor in valores if valor is not None))
+
+    def test_contagens_batem_com_o_queryset_filtrado(self):
+        from .facetas import FAIXAS_QUARTOS, calcular_facetas
+
+        for consulta in ('', 'finalidade=VENDA', f'cidade={self.campo_grande.id}&quartos=2',
+                         f'cidade={self.campo_grande.id}&finalidade=VENDA&quartos=1'):
+            params = QueryDict(consulta)
+            facetas = calcular_facetas(self.base(), params)
+            self.assertEqual(facetas['cidade'], self.contar(params, ('cidade', 'bairro'), 'cidade_id'), consulta)
+            self.assertEqual(facetas['finalidade'], self.contar(params, ('finalidade',), 'finalidade'), consulta)
+            quartos = {}
+            for n, total in self.contar(params, ('quartos',), 'quartos').items():
+                faixa = min(n, FAIXAS_QUARTOS[-1])
+                quartos[faixa] = quartos.get(faixa, 0) + total
+            self.assertEqual(facetas['quartos'], quartos, consulta)
+            esperado_bairro = self.contar(params, ('bairro',), 'bairro_id') if params.get('cidade') else {}
+            self.assertEqual(facetas['bairro'], esperado_bairro, consulta)
+
+    def test_cada_faceta_ignora_o_proprio_filtro(self):
+        from .facetas import calcular_facetas
+
+        facetas = calcular_facetas(self.base(), QueryDict(f'cidade={self.campo_grande.id}&finalidade=VENDA'))
+        # A outra cidade e a outra finalidade continuam com contagem (dá para trocar de opção)...
+        self.assertEqual(facetas['cidade'], {self.campo_grande.id: 3, self.dourados.id: 2})
+        self.assertEqual(facetas['finalidade'], {'VENDA': 3, 'ALUGUEL': 2})
+        # ...e os outros filtros valem: quartos só de Campo Grande à venda
+        self.assertEqual(facetas['quartos'], {1: 1, 3: 1, 4: 1})
+
+    def test_cache_pela_chave_dos_filtros(self):
+        from .facetas import calcular_facetas
+
+        cidade = self.campo_grande.id
+        primeira = calcular_facetas(self.base(), QueryDict(f'cidade={cidade}&finalidade=VENDA'))
+        # Mesmo filtro em outra ordem, com vazios e navegação: vem do cache
+        with CaptureQueriesContext(connection) as consultas:
+            repetida = calcular_facetas(self.base(), QueryDict(f'finalidade=VENDA&quartos=&cidade={cidade}&page=3'))
+        self.assertEqual(consultas_fora_do_cache(consultas), [])
+        self.assertEqual(repetida, primeira)
+        # Outro filtro: calcula de novo
+        with CaptureQueriesContext(connection) as consultas:
+            outra = calcular_facetas(self.base(), QueryDict(f'cidade={cidade}&finalidade=ALUGUEL'))
+        self.assertTrue(consultas_fora_do_cache(consultas))
+        self.assertEqual(outra['quartos'], {0: 1, 2: 1})
+
+
+class FormularioBuscaEmCacheTests(TestCase):
+    """Opções de cidade/imobiliária do formulário da home em {% cache %} pela versão de referência."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cidade = Cidade.objects.create(nome="Campo Grande", estado="MS")
+        cls.imobiliaria = Imobiliaria.objects.create(nome="Imobiliária Central")
+
+    def setUp(self):
+        cache.clear()
+
+    def opcao(self, resposta, objeto, nome):
+        return f'<option value="{objeto.id}">{nome}</option>' in resposta.content.decode()
+
+    def test_fragmento_e_cidades_refeitos_ao_editar_a_cidade(self):
+        from .catalogo import cidades_em_cache
+
+        lista = reverse('lista_imoveis')
+        self.assertTrue(self.opcao(self.client.get(lista), self.cidade, "Campo Grande"))
+        # Sem mudança: as opções saem do cache, sem ler cidades nem imobiliárias
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertTrue(self.opcao(self.client.get(lista), self.imobiliaria, "Imobiliária Central"))
+        self.assertFalse([sql for sql in consultas_fora_do_cache(consultas)
+                          if 'imoveis_cidade' in sql or 'imoveis_imobiliaria' in sql])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cidade.nome = "Campo Grande (Capital)"
+            self.cidade.save()
+        resposta = self.client.get(lista)
+        self.assertTrue(self.opcao(resposta, self.cidade, "Campo Grande (Capital)"))
+        self.assertFalse(self.opcao(resposta, self.cidade, "Campo Grande"))
+        self.assertEqual(cidades_em_cache(), [{'id': self.cidade.id, 'nome': "Campo Grande (Capital)"}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.imobiliaria.delete()
+        self.assertFalse(self.opcao(self.client.get(lista), self.imobiliaria, "Imobiliária Central"))
+
+
+class VersaoCatalogoCompartilhadaTests(TestCase):
+    """A versão do catálogo vale para todos os processos: Redis ou, sem ele, a tabela VersaoGlobal (imoveis/catalogo.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.calculos = []
+
+    def calcular(self):
+        self.calculos.append(1)
+        return {'ids': [len(self.calculos)], 'total': 1}
+
+    def test_sem_redis_versao_no_banco(self):
+        from django.core.cache.backends.db import DatabaseCache
+        from django.db.models import F
+        from .catalogo import CHAVE_VERSAO, incrementar_versao_catalogo, resultado_em_cache, versao_catalogo
+        from .models import VersaoGlobal
+
+        self.assertNotIsInstance(caches['default'], DatabaseCache)
+        params = QueryDict('quartos=2')
+        versao = versao_catalogo()
+        self.assertEqual(resultado_em_cache(params, self.calcular)['ids'], [1])
+        self.assertEqual(resultado_em_cache(params, self.calcular)['ids'], [1])
+
+        # O cron/processar_fotos num processo separado incrementa no banco (UPDATE valor = valor + 1)
+        VersaoGlobal.objects.filter(chave=CHAVE_VERSAO).update(valor=F('valor') + 1)
+        self.assertEqual(resultado_em_cache(params, self.calcular)['ids'], [2])
+        self.assertEqual(incrementar_versao_catalogo(), versao + 2)
+
+    def test_com_redis_incremento_de_outro_processo_invalida_o_resultado(self):
+        from django.test import override_settings
+        from .catalogo import CHAVE_VERSAO, resultado_em_cache, versao_catalogo
+
+        with override_settings(CACHE_COMPARTILHADO=True):
+            params = QueryDict('quartos=2')
+            versao_catalogo()
+            self.assertEqual(resultado_em_cache(params, self.calcular)['ids'], [1])
+            self.assertEqual(resultado_em_cache(params, self.calcular)['ids'], [1])
+
+            # Outra conexão com o cache, como a do cron/processar_fotos num processo separado
+            outro_processo = caches.create_connection('default')
+            outro_processo.incr(CHAVE_VERSAO)
+            self.assertEqual(resultado_em_cache(params, self.calcular)['ids'], [2])
+
+
+class ApiImoveisTests(TestCase):
+    """GET /api/imoveis/: projeção por `fields`, paginação por cursor e ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cidade = Cidade.objects.create(nome="Campo Grande", estado='MS')
+        expiracao = timezone.now() + timedelta(days=30)
+        for i in range(5):
+            Imovel.objects.create(
+                proprietario=dono, titulo=f"Casa {i}", cidade=cidade, preco=100000 + i,
+                finalidade='VENDA' if i % 2 else 'ALUGUEL',
+                status_publicacao=Imovel.StatusPublicacao.ATIVO, data_expiracao=expiracao,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_projecao_e_cursor(self):
+        url = reverse('api_imoveis')
+        resposta = self.client.get(url, {'fields': 'id,cidade,preco', 'limite': 3})
+        dados = resposta.json()
+        self.assertEqual(dados['total'], 5)
+        self.assertEqual(set(dados['resultados'][0]), {'id', 'cidade', 'preco'})
+        self.assertEqual(dados['resultados'][0]['cidade'], "Campo Grande")
+
+        seguinte = self.client.get(url, {'fields': 'id', 'limite': 3, 'cursor': dados['next_cursor']}).json()
+        ids = [item['id'] for item in dados['resultados'] + seguinte['resultados']]
+        self.assertEqual(len(set(ids)), 5)
+        self.assertIsNone(seguinte['next_cursor'])
+
+    def test_etag_devolve_304_ate_o_catalogo_mudar(self):
+        url = reverse('api_imoveis') + '?finalidade=VENDA'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Imovel.objects.first().save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_muda_quando_a_cidade_e_renomeada(self):
+        url = reverse('api_imoveis') + '?fields=id,cidade'
+        etag = self.client.get(url)['ETag']
+        cidade = Cidade.objects.get()
+        cidade.nome = "Campo Grande (MS)"
+        with self.captureOnCommitCallbacks(execute=True):
+            cidade.save()
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['resultados'][0]['cidade'], "Campo Grande (MS)")
+
+    def test_parametros_de_rastreamento_nao_mudam_chave_nem_etag(self):
+        from .filtros import chave_filtros
+
+        filtros = QueryDict('finalidade=VENDA&ordem=menor_preco')
+        rastreado = QueryDict('ordem=menor_preco&utm_source=news&finalidade=VENDA&fbclid=abc&page=2')
+        self.assertEqual(chave_filtros(rastreado), chave_filtros(filtros))
+        self.assertNotEqual(chave_filtros(QueryDict('finalidade=VENDA')), chave_filtros(filtros))
+
+        url = reverse('api_imoveis') + '?finalidade=VENDA'
+        etag = self.client.get(url)['ETag']
+        resposta = self.client.get(url + '&utm_source=news&fbclid=abc', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(self.client.get(url + '&limite=1', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_campo_invalido(self):
+        resposta = self.client.get(reverse('api_imoveis'), {'fields': 'id,senha'})
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_ordem_menor_preco_alem_dos_ids_em_cache(self):
+        # Com só 2 ids em cache, as páginas seguintes saem do cursor no banco
+        Imovel.objects.filter(titulo="Casa 4").update(preco=None)
+        url = reverse('api_imoveis')
+        precos = []
+        params = {'fields': 'preco', 'limite': 2, 'ordem': 'menor_preco'}
+        with mock.patch('imoveis.busca.LIMITE_IDS', 2):
+            while True:
+                dados = self.client.get(url, params).json()
+                precos += [item['preco'] for item in dados['resultados']]
+                if not dados['next_cursor']:
+                    break
+                params['cursor'] = dados['next_cursor']
+        # Sem preço vai para o fim
+        self.assertEqual(precos, [100000, 100001, 100002, 100003, None])
+
+
+class BuscaPorAreaTests(TestCase):
+    """Localização pelo centroide do bairro e busca por raio/caixa (imoveis/geo.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cidade = Cidade.objects.create(nome="Campo Grande", estado='MS', latitude=-20.4697, longitude=-54.6201)
+        centro = Bairro.objects.create(cidade=cidade, nome="Centro", latitude=-20.4630, longitude=-54.6160)
+        expiracao = timezone.now() + timedelta(days=30)
+        comum = dict(proprietario=dono, cidade=cidade, status_publicacao=Imovel.StatusPublicacao.ATIVO,
+                     data_expiracao=expiracao)
+        cls.no_centro = Imovel.objects.create(titulo="No centro", bairro=centro, **comum)
+        cls.exato = Imovel.objects.create(titulo="Ponto exato", latitude=-20.5200, longitude=-54.6201, **comum)
+        cls.sem_bairro = Imovel.objects.create(titulo="Sem bairro", **comum)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_localizacao_pelo_centroide(self):
+        self.assertTrue(self.no_centro.localizacao_aproximada)
+        self.assertEqual((self.no_centro.latitude, self.no_centro.longitude), (-20.4630, -54.6160))
+        # Sem bairro cai no centroide da cidade; com ponto informado, ele é mantido
+        self.assertEqual((self.sem_bairro.latitude, self.sem_bairro.longitude), (-20.4697, -54.6201))
+        self.assertFalse(self.exato.localizacao_aproximada)
+        self.assertIsNotNone(self.exato.celula_geo)
+
+    def test_csv_de_centroides_tem_bairros_dos_load_bairros(self):
+        import re
+        from io import StringIO
+        from pathlib import Path
+        from django.core.management import call_command
+        from .geo import celula
+
+        comandos = Path(__file__).resolve().parent / 'management' / 'commands'
+        cadastrados = {}
+        for arquivo in comandos.glob('load_bairros*.py'):
+            fonte = arquivo.read_text(encoding='utf-8')
+            cidade = re.search(r'Cidade\.objects\.get\(nome="([^"]+)"', fonte).group(1)
+            cadastrados[cidade] = set(re.findall(r"'([^']+)'", fonte.split('= [', 1)[1].split(']', 1)[0]))
+
+        csv = (comandos.parents[1] / 'dados' / 'centroides.csv').read_text(encoding='utf-8')
+        no_csv = {}
+        for linha in csv.splitlines():
+            partes = linha.split(',')
+            if not linha.startswith('#') and len(partes) == 5 and partes[2] and partes[0] != 'estado':
+                no_csv.setdefault(partes[1], set()).add(partes[2])
+
+        # Toda cidade com load_bairros* tem bairros no CSV, com os mesmos nomes
+        for cidade, nomes in cadastrados.items():
+            self.assertTrue(no_csv.get(cidade), cidade)
+            self.assertLessEqual(no_csv[cidade], nomes, cidade)
+
+        # Carregados pelo comando, os imóveis do bairro saem do centroide da cidade para o do bairro
+        centro = Bairro.objects.get(nome="Centro")
+        Bairro.objects.filter(pk=centro.pk).update(latitude=None, longitude=None)
+        Imovel.objects.filter(pk=self.no_centro.pk).update(latitude=None, longitude=None, celula_geo=None)
+        call_command('carregar_centroides', stdout=StringIO())
+        self.no_centro.refresh_from_db()
+        self.assertEqual((self.no_centro.latitude, self.no_centro.longitude), (-20.4628, -54.6158))
+        self.assertEqual(self.no_centro.celula_geo, celula(-20.4628, -54.6158))
+
+    def test_busca_por_raio_e_caixa(self):
+        url = reverse('api_imoveis')
+        perto = self.client.get(url, {'fields': 'id', 'lat': '-20.4650', 'lng': '-54.6180', 'raio': '2'}).json()
+        self.assertEqual({item['id'] for item in perto['resultados']}, {self.no_centro.id, self.sem_bairro.id})
+
+        caixa = self.client.get(url, {'fields': 'id', 'caixa': '-20.53,-54.63,-20.51,-54.61'}).json()
+        self.assertEqual([item['id'] for item in caixa['resultados']], [self.exato.id])
+
+    def test_api_mapa_agrupa_e_guarda_em_cache(self):
+        url = reverse('api_mapa')
+        params = {'caixa': '-20.55,-54.65,-20.44,-54.59', 'zoom': '12'}
+        grupos = self.client.get(url, params).json()['grupos']
+        self.assertEqual(sum(grupo['n'] for grupo in grupos), 3)
+
+        # Mesmos blocos/zoom/versão do catálogo: nenhuma consulta aos imóveis
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url, params).json()['grupos'], grupos)
+        self.assertEqual(consultas_fora_do_cache(consultas), [])
+        self.assertEqual(self.client.get(url, {'zoom': '12'}).status_code, 400)
+
+    def test_api_mapa_le_a_versao_uma_vez_para_todos_os_blocos(self):
+        from . import mapa
+
+        def leituras_da_versao(caixa):
+            with mock.patch.object(mapa, 'chave_vitrine', wraps=mapa.chave_vitrine) as chave, \
+                    CaptureQueriesContext(connection) as consultas:
+                self.assertEqual(self.client.get(reverse('api_mapa'), {'caixa': caixa, 'zoom': '12'}).status_code, 200)
+            return chave.call_count, sum('imoveis_versaoglobal' in c['sql'] for c in consultas)
+
+        blocos, leituras = leituras_da_versao('-20.9,-55.0,-20.1,-54.2')
+        self.assertGreater(blocos, 4)
+        self.assertEqual(leituras, leituras_da_versao('-20.55,-54.65,-20.54,-54.64')[1])
+
+
+class BuscasSalvasTests(TestCase):
+    """Buscas salvas casadas em lote com os imóveis aprovados (imoveis/buscas_salvas.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.dono = User.objects.create_user(username='dono', password='senha-forte-123')
+        cls.comprador = User.objects.create_user(username='comprador', password='senha-forte-123')
+        cls.cidade = Cidade.objects.create(nome="Dourados", estado='MS')
+        cls.centro = Bairro.objects.create(cidade=cls.cidade, nome="Centro")
+        cls.outro_bairro = Bairro.objects.create(cidade=cls.cidade, nome="Jardim")
+        expiracao = timezone.now() + timedelta(days=30)
+        comum = dict(proprietario=cls.dono, cidade=cls.cidade, bairro=cls.centro, finalidade='VENDA',
+                     quartos=3, status_publicacao=Imovel.StatusPublicacao.ATIVO, data_expiracao=expiracao)
+        cls.barato = Imovel.objects.create(titulo="Casa com piscina", preco=400000, **comum)
+        cls.caro = Imovel.objects.create(titulo="Casa com piscina", preco=900000, **comum)
+
+    def test_salva_e_notifica_uma_vez(self):
+        from .buscas_salvas import notificar_ao_confirmar
+        from .models import BuscaSalva, NotificacaoBusca
+
+        self.client.force_login(self.comprador)
+        querystring = f'finalidade=VENDA&cidade={self.cidade.id}&quartos=2&preco_max=500000&q=piscina&ordem=preco'
+        self.client.post(reverse('salvar_busca'), {'querystring': querystring})
+        busca = BuscaSalva.objects.get(usuario=self.comprador)
+        self.assertEqual(busca.criterios, {'finalidade': 'VENDA', 'cidade': str(self.cidade.id), 'quartos': '2',
+                                           'preco_max': '500000', 'q': 'piscina'})
+        self.assertEqual(busca.cidade_id, self.cidade.id)
+        # Buscas que não podem casar: outro bairro, outra finalidade, e a do próprio dono
+        BuscaSalva.objects.create(usuario=self.comprador, nome='Jardim', criterios={'bairro': str(self.outro_bairro.id)})
+        BuscaSalva.objects.create(usuario=self.comprador, nome='Aluguel', criterios={'finalidade': 'ALUGUEL'})
+        BuscaSalva.objects.create(usuario=self.dono, nome='Minha', criterios={'cidade': str(self.cidade.id)})
+
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                notificar_ao_confirmar([self.barato.id, self.caro.id])
+        self.assertEqual(list(NotificacaoBusca.objects.values_list('busca_id', 'imovel_id')), [(busca.id, self.barato.id)])
+
+        resposta = self.client.get(reverse('minhas_buscas'))
+        self.assertContains(resposta, reverse('detalhe_imovel', args=[self.barato.id]))
+        self.assertFalse(NotificacaoBusca.objects.filter(lida=False).exists())
+
+
+class ImoveisSemelhantesTests(TestCase):
+    """Vizinhos pré-calculados pelo comando calcular_semelhantes (imoveis/semelhantes.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cidade = Cidade.objects.create(nome="Três Lagoas", estado='MS')
+        bairro = Bairro.objects.create(cidade=cidade, nome="Centro")
+        comum = dict(proprietario=dono, cidade=cidade, bairro=bairro, status_publicacao=Imovel.StatusPublicacao.ATIVO,
+                     data_expiracao=timezone.now() + timedelta(days=30))
+        cls.casa = Imovel.objects.create(titulo="Casa", finalidade='VENDA', preco=300000, area=100, quartos=3, **comum)
+        cls.parecida = Imovel.objects.create(titulo="Parecida", finalidade='VENDA', preco=320000, area=110, quartos=3, **comum)
+        cls.mansao = Imovel.objects.create(titulo="Mansão", finalidade='VENDA', preco=3000000, area=800, quartos=6, **comum)
+        cls.aluguel = Imovel.objects.create(titulo="Aluguel", finalidade='ALUGUEL', preco=300000, area=100, quartos=3, **comum)
+
+    def test_calcula_incremental_e_mostra_no_detalhe(self):
+        from .semelhantes import calcular_semelhantes
+
+        self.assertEqual(calcular_semelhantes(k=2)[:2], (1, 0))
+        ordem = list(self.casa.semelhantes.order_by('posicao').values_list('semelhante_id', flat=True))
+        self.assertEqual(ordem, [self.parecida.id, self.mansao.id])  # o aluguel nunca é comparado com venda
+        self.assertFalse(self.aluguel.semelhantes.exists())
+
+        # Nada mudou: a cidade é pulada; um preço alterado refaz a cidade
+        self.assertEqual(calcular_semelhantes(k=2)[:2], (0, 1))
+        self.mansao.preco = 310000
+        self.mansao.save()
+        self.assertEqual(calcular_semelhantes(k=2)[:2], (1, 0))
+
+        ordem = list(self.casa.semelhantes.order_by('posicao').values_list('semelhante_id', flat=True))
+        resposta = self.client.get(reverse('detalhe_imovel', args=[self.casa.id]))
+        self.assertEqual([imovel.id for imovel in resposta.context['semelhantes']], ordem)
+
+    def test_mudanca_refaz_so_as_linhas_alcancadas(self):
+        import random
+        from .models import ImovelSemelhante
+        from .semelhantes import calcular_semelhantes
+
+        sorteio = random.Random(7)
+        cidade = Cidade.objects.create(nome="Campo Grande", estado='MS')
+        comum = dict(proprietario=self.casa.proprietario, cidade=cidade, finalidade='VENDA',
+                     status_publicacao=Imovel.StatusPublicacao.ATIVO, data_expiracao=timezone.now() + timedelta(days=30))
+        imoveis = [
+            Imovel.objects.create(titulo=f"Casa {i}", preco=sorteio.randint(100, 900) * 1000,
+                                  area=sorteio.randint(40, 400), quartos=sorteio.randint(1, 5), **comum)
+            for i in range(40)
+        ]
+        calcular_semelhantes(k=3)
+
+        def linhas(imovel):
+            return list(imovel.semelhantes.order_by('posicao').values_list('semelhante_id', flat=True))
+
+        mudado, saiu = imoveis[0], imoveis[1]
+        mudado.preco = 5_000_000
+        mudado.save()
+        apontavam_para_ele = set(ImovelSemelhante.objects.filter(semelhante=saiu).values_list('imovel_id', flat=True))
+        Imovel.objects.filter(id=saiu.id).update(data_expiracao=timezone.now() - timedelta(days=1))
+
+        recalculadas, _, gravadas = calcular_semelhantes(k=3)
+        self.assertEqual(recalculadas, 1)  # só Campo Grande (Três Lagoas não mudou)
+        self.assertLess(gravadas, 39 * 3 // 2)
+        self.assertFalse(ImovelSemelhante.objects.filter(semelhante=saiu).exists())
+        self.assertTrue(all(len(linhas(Imovel(id=i))) == 3 for i in apontavam_para_ele))
+
+        incremental = linhas(mudado)
+        calcular_semelhantes(k=3, tudo=True)
+        self.assertEqual(incremental, linhas(mudado))
+
+
+class AutocompletarTests(TestCase):
+    """Autocompletar de cidade/bairro servido do índice em memória (imoveis/autocompletar.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agua_clara = Cidade.objects.create(nome="Água Clara", estado='MS')
+        cls.campo_grande = Cidade.objects.create(nome="Campo Grande", estado='MS')
+        cls.vila = Bairro.objects.create(cidade=cls.campo_grande, nome="Vila Água Limpa")
+
+    def setUp(self):
+        from . import autocompletar
+
+        cache.clear()
+        autocompletar._indice = None  # a versão recomeça pelo relógio: não reaproveita o de outro teste
+
+    def test_sem_acento_sem_banco_e_reconstroi_na_versao(self):
+        url = reverse('api_autocompletar')
+        self.client.get(url, {'q': 'ag'})  # constrói o índice deste worker
+
+        with CaptureQueriesContext(connection) as consultas:
+            resultados = self.client.get(url, {'q': 'AGUA'}).json()['resultados']
+        self.assertEqual(consultas_fora_do_cache(consultas), [])
+        self.assertEqual([(r['tipo'], r['id']) for r in resultados],
+                         [('cidade', self.agua_clara.id), ('bairro', self.vila.id)])
+        self.assertEqual(self.client.get(url, {'q': 'clara'}).json()['resultados'][0]['rotulo'], "Água Clara, MS")
+
+        # Bairro novo muda a versão de referência: o índice é refeito no próximo pedido
+        with self.captureOnCommitCallbacks(execute=True):
+            Bairro.objects.create(cidade=self.campo_grande, nome="Jardim Aguaí")
+        resultados = self.client.get(url, {'q': 'agua', 'tipo': 'bairro', 'cidade': self.campo_grande.id}).json()['resultados']
+        self.assertEqual([r['nome'] for r in resultados], ["Jardim Aguaí", "Vila Água Limpa"])
+
+
+@override_settings(CACHE_COMPARTILHADO=True)
+class ContadorVisualizacoesTests(TestCase):
+    """
+    Visitantes únicos (HyperLogLog) acumulados no cache e gravados em lote (imoveis/contador.py).
+    O buffer exige Redis: aqui o LocMemCache faz o papel dele (um processo só).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cls.imovel = Imovel.objects.create(
+            titulo="Casa", proprietario=dono, status_publicacao=Imovel.StatusPublicacao.ATIVO,
+            data_expiracao=timezone.now() + timedelta(days=30), visualizacoes=10,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_visitante_unico_sem_sessao_e_descarga_em_lote(self):
+        import time
+        from django.contrib.sessions.models import Session
+        from .contador import COOKIE_VISITANTE, INTERVALO_SEGUNDOS, descarregar
+
+        url = reverse('detalhe_imovel', args=[self.imovel.id])
+        for agente in ('navegador-a', 'navegador-b'):
+            self.client_class(HTTP_USER_AGENT=agente).get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url)
+        self.assertFalse([c for c in consultas if c['sql'].startswith('UPDATE "imoveis_imovel"')])
+        self.assertEqual(resposta.context['imovel'].visualizacoes, 13)
+        # O mesmo visitante (cookie gravado na primeira resposta) não conta de novo
+        self.assertIn(COOKIE_VISITANTE, resposta.cookies)
+        self.assertEqual(self.client.get(url).context['imovel'].visualizacoes, 13)
+        self.assertFalse(Session.objects.exists())
+        self.imovel.refresh_from_db()
+        self.assertEqual(self.imovel.visualizacoes, 10)
+
+        self.assertEqual(descarregar(agora=time.time() + 3 * INTERVALO_SEGUNDOS), {self.imovel.id: 3})
+        self.imovel.refresh_from_db()
+        self.assertEqual(self.imovel.visualizacoes, 13)
+        self.assertEqual(self.imovel.visitantes.base, 10)
+        self.assertEqual(self.imovel.visualizacoes_diarias.get().total, 3)
+        # Já gravado: não conta de novo como pendente
+        self.assertEqual(self.client.get(url).context['imovel'].visualizacoes, 13)
+
+    def test_ip_do_visitante_ignora_o_que_o_cliente_escreve_no_x_forwarded_for(self):
+        from django.test import RequestFactory, override_settings
+        from .contador import token_visitante
+
+        def token(forjado):
+            request = RequestFactory().get('/', HTTP_USER_AGENT='robo', REMOTE_ADDR='10.0.0.1',
+                                           HTTP_X_FORWARDED_FOR=f'{forjado}, 200.1.2.3')
+            return token_visitante(request)[0]
+
+        with override_settings(PROXIES_CONFIAVEIS=1):
+            self.assertEqual(token('1.1.1.1'), token('2.2.2.2'))
+            self.assertNotEqual(token('1.1.1.1'), token_visitante(RequestFactory().get(
+                '/', HTTP_USER_AGENT='robo', HTTP_X_FORWARDED_FOR='200.9.9.9'))[0])
+        with override_settings(PROXIES_CONFIAVEIS=0):
+            self.assertEqual(token('1.1.1.1'), token('2.2.2.2'))
+
+    def test_falha_no_meio_da_descarga_nao_soma_o_dia_duas_vezes(self):
+        import time
+        from django.db import DatabaseError
+        from . import contador
+        from .estatisticas import gravar_diarias
+
+        url = reverse('detalhe_imovel', args=[self.imovel.id])
+        for agente in ('navegador-a', 'navegador-b'):
+            self.client_class(HTTP_USER_AGENT=agente).get(url)
+
+        def grava_e_cai(sketches):
+            gravar_diarias(sketches)
+            raise DatabaseError("conexão perdida")
+
+        depois = time.time() + 3 * contador.INTERVALO_SEGUNDOS
+        with mock.patch.object(contador, 'gravar_diarias', grava_e_cai), self.assertRaises(DatabaseError):
+            contador.descarregar(agora=depois)
+        self.assertFalse(self.imovel.visualizacoes_diarias.exists())
+
+        self.assertEqual(contador.descarregar(agora=depois), {self.imovel.id: 2})
+        self.assertEqual(self.imovel.visualizacoes_diarias.get().total, 2)
+        self.imovel.refresh_from_db()
+        self.assertEqual(self.imovel.visualizacoes, 12)
+
+    @override_settings(CACHE_COMPARTILHADO=False)
+    def test_sem_redis_grava_direto_no_banco(self):
+        from . import contador
+
+        url = reverse('detalhe_imovel', args=[self.imovel.id])
+        with mock.patch.object(contador, 'iniciar_descarga_periodica') as iniciar:
+            for agente in ('navegador-a', 'navegador-b'):
+                self.client_class(HTTP_USER_AGENT=agente).get(url)
+            self.assertEqual(self.client.get(url).context['imovel'].visualizacoes, 13)
+            # Já visto hoje: só lê, nada gravado
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertEqual(self.client.get(url).context['imovel'].visualizacoes, 13)
+        iniciar.assert_not_called()
+        self.assertFalse([c for c in consultas if c['sql'].startswith(('UPDATE', 'INSERT'))])
+
+        self.imovel.refresh_from_db()
+        self.assertEqual(self.imovel.visualizacoes, 13)
+        self.assertEqual(self.imovel.visitantes.base, 10)
+        self.assertEqual(self.imovel.visualizacoes_diarias.get().total, 3)
+        self.assertEqual(contador.descarregar(), {})
+
+    def test_total_do_dia_e_pendentes_pela_estimativa(self):
+        import time
+        from . import contador
+
+        # Com 1000 visitantes, bem menos de 1000 mudam um registrador
+        for i in range(1000):
+            pendentes = contador.registrar_visita(self.imovel.id, f"{i:032x}")
+        self.assertAlmostEqual(pendentes, 1000, delta=100)
+        self.assertEqual(contador.visualizacoes_pendentes(self.imovel.id), pendentes)
+
+        depois = time.time() + 3 * contador.INTERVALO_SEGUNDOS
+        self.assertEqual(contador.descarregar(agora=depois), {self.imovel.id: pendentes})
+        self.assertEqual(self.imovel.visualizacoes_diarias.get().total, pendentes)
+        self.imovel.refresh_from_db()
+        self.assertEqual(self.imovel.visualizacoes, 10 + pendentes)
+        self.assertEqual(contador.visualizacoes_pendentes(self.imovel.id), 0)
+
+    def test_estimativa_e_mescla(self):
+        from .hll import HyperLogLog, hash64
+
+        a, b = HyperLogLog(), HyperLogLog()
+        for i in range(6000):
+            a.adicionar(hash64(f"visitante-{i}"))
+        for i in range(4000, 10000):
+            b.adicionar(hash64(f"visitante-{i}"))
+        self.assertAlmostEqual(a.estimar(), 6000, delta=6000 * 0.1)
+        self.assertAlmostEqual(a.mesclar(b).estimar(), 10000, delta=10000 * 0.1)
+
+
+
+class VisualizacoesDiariasTests(TestCase):
+    """Série diária somada em lote, painel e compactação mensal (imoveis/estatisticas.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cls.imovel = Imovel.objects.create(titulo="Casa", proprietario=cls.dono)
+
+    def test_soma_painel_e_compactacao(self):
+        from datetime import date
+        from .estatisticas import compactar, gravar_diarias, tendencias
+        from .hll import HyperLogLog, hash64
+        from .models import ImovelVisualizacaoDiaria, ImovelVisualizacaoMensal
+
+        def sketch(*visitantes):
+            hll = HyperLogLog()
+            for visitante in visitantes:
+                hll.adicionar(hash64(visitante))
+            return hll.para_bytes()
+
+        hoje = timezone.localdate()
+        gravar_diarias({(self.imovel.id, hoje): sketch('a', 'b'), (self.imovel.id, hoje - timedelta(days=8)): sketch('a', 'b', 'c', 'd')})
+        # Mescla com o que já estava: 'b' de novo não conta; imóvel apagado é ignorado
+        gravados = gravar_diarias({(self.imovel.id, hoje): sketch('b', 'c', 'd', 'e'), (999999, hoje): sketch('a')})
+        self.assertEqual(gravados, {(self.imovel.id, hoje): (5, 3)})
+        self.assertEqual(ImovelVisualizacaoDiaria.objects.get(dia=hoje).total, 5)
+
+        tendencia = tendencias([self.imovel.id], hoje=hoje)[self.imovel.id]
+        self.assertEqual((tendencia['total'], tendencia['semana'], tendencia['variacao']), (9, 5, 25))
+        self.client.force_login(self.dono)
+        self.assertContains(self.client.get(reverse('meus_imoveis')), '9 em 30 dias')
+
+        gravar_diarias({(self.imovel.id, date(2020, 1, 5)): sketch('a'), (self.imovel.id, date(2020, 1, 20)): sketch(*'abcdef')})
+        self.assertEqual(compactar(date(2020, 2, 1)), (2, 1))
+        compactar(date(2020, 2, 1))
+        self.assertEqual(ImovelVisualizacaoMensal.objects.get(mes=date(2020, 1, 1)).total, 7)
+        self.assertEqual(ImovelVisualizacaoDiaria.objects.count(), 2)
+
+class GetCondicionalTests(TestCase):
+    """ETag/Last-Modified e 304 nas páginas públicas (imoveis/condicional.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dono = get_user_model().objects.create_user(username='dono', password='senha-forte-123')
+        cls.cidade = Cidade.objects.create(nome="Campo Grande", estado="MS")
+        cls.imovel = Imovel.objects.create(
+            titulo="Casa", proprietario=dono, cidade=cls.cidade, status_publicacao=Imovel.StatusPublicacao.ATIVO,
+            data_expiracao=timezone.now() + timedelta(days=30),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidar(self, url):
+        etag = self.client.get(url)['ETag']
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_304_ate_o_anuncio_mudar(self):
+        detalhe = reverse('detalhe_imovel', args=[self.imovel.id])
+        for url in (detalhe, reverse('lista_imoveis') + '?quartos=0', '/sitemap.xml',
+                    reverse('get_bairros') + f'?cidade_id={self.cidade.id}'):
+            self.assertEqual(self.revalidar(url), 304, url)
+
+        resposta = self.client.get(detalhe)
+        antes = self.imovel.atualizado_em
+        self.assertIn('Last-Modified', resposta)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.imovel.titulo = "Casa reformada"
+            self.imovel.save(update_fields=['titulo'])
+        self.imovel.refresh_from_db()
+        self.assertGreater(self.imovel.atualizado_em, antes)
+        self.assertEqual(self.client.get(detalhe, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 200)
+
+    def test_novo_login_nao_reaproveita_token_csrf(self):
+        lista = reverse('lista_imoveis')
+        credenciais = {'username': 'dono', 'password': 'senha-forte-123'}
+        self.client.post(reverse('login'), credenciais)
+        resposta = self.client.get(lista)
+        self.assertEqual(self.client.get(lista, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 304)
+
+        # Saiu e entrou de novo: o login girou o segredo CSRF, a página velha não serve mais
+        self.client.post(reverse('logout'))
+        self.client.post(reverse('login'), credenciais)
+        self.assertEqual(self.client.get(lista, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 200)
+
+
+class ExpiracaoTests(TestCase):
+    """Expiração em lotes fora da requisição (imoveis/expiracao.py)."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_expira_em_lotes_e_lista_so_le(self):
+        from . import expiracao
+        from .models import Assinatura
+
+        agora = timezone.now()
+        vencido = get_user_model().objects.create_user(username='vencido', password='senha-forte-123')
+        em_dia = get_user_model().objects.create_user(username='em_dia', password='senha-forte-123')
+        Assinatura.objects.create(usuario=vencido, status='ATIVA', data_expiracao=agora - timedelta(days=1))
+        Assinatura.objects.create(usuario=em_dia, status='ATIVA', data_expiracao=agora + timedelta(days=1))
+        futuro = agora + timedelta(days=30)
+        do_vencido = [Imovel.objects.create(proprietario=vencido, status_publicacao='ATIVO', data_expiracao=futuro) for _ in range(3)]
+        vencidos = [Imovel.objects.create(proprietario=em_dia, status_publicacao='ATIVO', data_expiracao=agora - timedelta(hours=1)) for _ in range(2)]
+        ativo = Imovel.objects.create(proprietario=em_dia, status_publicacao='ATIVO', data_expiracao=futuro)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('lista_imoveis'))
+        self.assertFalse([c for c in consultas if c['sql'].startswith('UPDATE')])
+
+        with mock.patch.object(expiracao, 'LOTE', 2):
+            resultado = expiracao.expirar(agora)
+        self.assertEqual(resultado, {'assinaturas': 1, 'imoveis_assinatura': 3, 'imoveis': 2})
+        self.assertEqual(
+            set(Imovel.objects.filter(status_publicacao='EXPIRADO').values_list('id', flat=True)),
+            {imovel.id for imovel in do_vencido + vencidos},
+        )
+        ativo.refresh_from_db()
+        self.assertEqual(ativo.status_publicacao, 'ATIVO')
+
+        # Com a trava ocupada, outra execução não faz nada
+        cache.add(expiracao.CHAVE_TRAVA, 1)
+        self.assertIsNone(expiracao.expirar(agora))
+
+
+class LembretesExpiracaoTests(TestCase):
+    """Avisos de vencimento agrupados por dono e registrados (imoveis/lembretes.py)."""
+
+    def test_um_email_por_dono_e_sem_repetir(self):
+        from django.core import mail
+        from .lembretes import enviar_lembretes
+        from .models import Assinatura
+
+        agora = timezone.now()
+        dono = get_user_model().objects.create_user(username='dono', email='dono@exemplo.com', password='senha-forte-123')
+        sem_email = get_user_model().objects.create_user(username='sem_email', password='senha-forte-123')
+        assinatura = Assinatura.objects.create(usuario=dono, status='ATIVA', data_expiracao=agora + timedelta(days=3))
+        for titulo, dias in (("Casa", 2), ("Sala", 5), ("Sítio", 20)):
+            Imovel.objects.create(titulo=titulo, proprietario=dono, status_publicacao='ATIVO', data_expiracao=agora + timedelta(days=dias))
+        Imovel.objects.create(titulo="Apto", proprietario=sem_email, status_publicacao='ATIVO', data_expiracao=agora + timedelta(days=1))
+
+        self.assertEqual(enviar_lembretes(dias=7, agora=agora), (1, 3, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Casa", mail.outbox[0].body)
+        self.assertNotIn("Sítio", mail.outbox[0].body)
+
+        # Nada novo: nenhum e-mail; renovou a assinatura: só ela é avisada de novo
+        self.assertEqual(enviar_lembretes(dias=7, agora=agora), (0, 0, 0))
+        assinatura.data_expiracao = agora + timedelta(days=6)
+        assinatura.save()
+        self.assertEqual(enviar_lembretes(dias=7, agora=agora), (1, 1, 0))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_recusa_e_queda_do_servidor_contam_como_falha(self):
+        from django.core.mail.backends.locmem import EmailBackend
+        from .lembretes import enviar_lembretes
+        from .models import LembreteExpiracao
+
+        agora = timezone.now()
+        for i in range(4):
+            dono = get_user_model().objects.create_user(username=f'dono{i}', email=f'dono{i}@exemplo.com')
+            Imovel.objects.create(titulo=f"Casa {i}", proprietario=dono, status_publicacao='ATIVO',
+                                  data_expiracao=agora + timedelta(days=1, hours=i))
+
+        # 1º enviado, 2º recusado (0 aceitas), 3º derruba a conexão e a reconexão falha: 3º e 4º ficam
+        enviar = mock.patch.object(EmailBackend, 'send_messages', side_effect=[1, 0, OSError("caiu")])
+        abrir = mock.patch.object(EmailBackend, 'open', side_effect=[None, OSError("recusada")])
+        with enviar, abrir, mock.patch('builtins.print'):
+            self.assertEqual(enviar_lembretes(dias=7, agora=agora), (1, 1, 3))
+        self.assertEqual(list(LembreteExpiracao.objects.values_list('imovel__titulo', flat=True)), ["Casa 0"])
+
+        # Na próxima execução vão os três que faltaram
+        self.assertEqual(enviar_lembretes(dias=7, agora=agora), (3, 3, 0))
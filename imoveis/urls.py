@@ -1,10 +1,16 @@
 # imoveis/urls.py
 from django.urls import path
-from . import views
+from . import views, api
 
 urlpatterns = [
     # --- NOVA URL PARA A API DE BAIRROS ---
     path('api/bairros/', views.get_bairros, name='get_bairros'),
+    # API JSON da busca (mesmos filtros da vitrine; ver imoveis/api.py)
+    path('api/imoveis/', api.api_imoveis, name='api_imoveis'),
+    # Grupos (clusters) de imóveis para o mapa (ver imoveis/mapa.py)
+    path('api/mapa/', api.api_mapa, name='api_mapa'),
+    # Autocompletar de cidade/bairro (índice em memória, ver imoveis/autocompletar.py)
+    path('api/autocompletar/', api.api_autocompletar, name='api_autocompletar'),
 
     path('', views.lista_imoveis, name='lista_imoveis'),
     path('imovel/<int:id>/', views.detalhe_imovel, name='detalhe_imovel'),
@@ -1,125 +1,110 @@
 # imoveis/views.py
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-# 1. IMPORTAMOS OS MODELOS 'Assinatura' e 'Imovel' COMPLETOS
-from .models import Imovel, Cidade, Imobiliaria, Bairro, Assinatura, Plano, NichoParceiro, Parceiro 
+from .models import Imovel, Cidade, Imobiliaria, Bairro, NichoParceiro, Parceiro
 from .forms import ImovelForm, ImobiliariaForm, ParceiroForm
-# 2. IMPORTAMOS O 'F' PARA FAZER A CONTAGEM SEGURA
-from django.db.models import F
-from django.core.paginator import Paginator
+from .contador import registrar_visita, token_visitante, COOKIE_VISITANTE, COOKIE_VALIDADE_SEGUNDOS
+from .paginacao import paginar_por_cursor
+from .catalogo import cidades_em_cache, versao_catalogo, versao_referencia
+from .expiracao import garantir_expiracao_periodica
+from .condicional import etag_pagina, nao_modificado, marcar, etag_bairros
+from .busca import fonte_da_busca
+from .ordenacao import ordenacao_do_get, ORDENACOES
+from .filtros import aplicar_filtros, PARAMETROS_NAVEGACAO
+from .geo import ler_area, PARAMETROS_AREA, RAIOS_KM, RAIO_PADRAO_KM
+from .facetas import calcular_facetas, quartos_acumulado
 from django.http import JsonResponse
+from django.views.decorators.http import condition
 from django.utils import timezone # Importação já existe
 
 def lista_imoveis(request):
     
-    # --- [INÍCIO DA CORREÇÃO "VIGIA GLOBAL"] ---
     agora = timezone.now()
 
-    # 1. VIGIA DE ASSINATURAS: Encontra e expira Assinaturas vencidas
-    # (Isso é importante para o painel do usuário)
-    assinaturas_expiradas = Assinatura.objects.filter(
-        status='ATIVA',
-        data_expiracao__lt=agora # Menor que (lt) agora
-    )
-    if assinaturas_expiradas.exists():
-        print(f"VIGIA GLOBAL: Encontradas {assinaturas_expiradas.count()} assinaturas expiradas. Atualizando...")
-        assinaturas_expiradas.update(status=Assinatura.StatusAssinatura.EXPIRADA)
-
-    # 2. VIGIA DE IMÓVEIS: Encontra e expira Imóveis vencidos
-    # (Isso limpa a vitrine pública E o painel do usuário)
-    imoveis_expirados = Imovel.objects.filter(
-        status_publicacao='ATIVO',
-        data_expiracao__lt=agora # Menor que (lt) agora
-    )
-    if imoveis_expirados.exists():
-        print(f"VIGIA GLOBAL: Encontrados {imoveis_expirados.count()} imóveis expirados. Atualizando...")
-        imoveis_expirados.update(status_publicacao=Imovel.StatusPublicacao.EXPIRADO)
-    
-    # --- [FIM DA CORREÇÃO "VIGIA GLOBAL"] ---
+    # Assinaturas/anúncios vencidos são expirados pelo comando expirar_anuncios (ou pela
+    # thread opcional de imoveis/expiracao.py): esta view só lê.
+    garantir_expiracao_periodica()
 
+    # --- GET CONDICIONAL: catálogo igual ao da última visita -> 304 sem busca nem render ---
+    etag = etag_pagina(request, 'lista', versao_catalogo(), versao_referencia(), request.get_full_path())
+    resposta = nao_modificado(request, etag)
+    if resposta is not None:
+        return resposta
 
     # Agora, a busca principal só pega os que SÃO ATIVOS e NÃO EXPIRADOS
-    imoveis_list = Imovel.objects.filter(
+    # (a ordenação '-destaque, -data_cadastro, -id' é aplicada pela paginação por cursor)
+    vitrine_ativa = Imovel.objects.vitrine().filter(
         status_publicacao='ATIVO',
         data_expiracao__gt=agora 
-    ).order_by('-destaque', '-data_cadastro')
+    )
+    imoveis_list = vitrine_ativa
     
+    # Cidades/imobiliárias só são lidas do banco quando a versão de referência muda:
+    # os querysets abaixo são preguiçosos e só rodam se o fragmento {% cache %} expirar.
     cidades = Cidade.objects.all()
     imobiliarias = Imobiliaria.objects.all()
     
     imobiliaria_selecionada = None
 
-    # Lógica de filtros (pegando os valores)
-    finalidade = request.GET.get('finalidade')
+    # --- APLICANDO OS FILTROS COM VALIDAÇÃO (regras em imoveis/filtros.py) ---
+    imoveis_list = aplicar_filtros(imoveis_list, request.GET)
+
     imobiliaria_id = request.GET.get('imobiliaria')
-    cidade_id = request.GET.get('cidade')
-    bairro_id = request.GET.get('bairro')
-    
-    quartos_min = request.GET.get('quartos')
-    suites_min = request.GET.get('suites')
-    banheiros_min = request.GET.get('banheiros')
-    salas_min = request.GET.get('salas')
-    cozinhas_min = request.GET.get('cozinhas')
-    closets_min = request.GET.get('closets')
-    area_min = request.GET.get('area')
-    preco_max = request.GET.get('preco_max')
-
-    # --- APLICANDO OS FILTROS COM VALIDAÇÃO ---
-
-    if finalidade: 
-        imoveis_list = imoveis_list.filter(finalidade=finalidade)
-    
     if imobiliaria_id and imobiliaria_id.isdigit():
-        imoveis_list = imoveis_list.filter(imobiliaria__id=imobiliaria_id)
         try: 
             imobiliaria_selecionada = Imobiliaria.objects.get(id=imobiliaria_id)
         except Imobiliaria.DoesNotExist: 
             imobiliaria_selecionada = None
-            
-    if cidade_id and cidade_id.isdigit(): 
-        imoveis_list = imoveis_list.filter(cidade__id=cidade_id)
-        
-    if bairro_id and bairro_id.isdigit(): 
-        imoveis_list = imoveis_list.filter(bairro__id=bairro_id)
-
-    if quartos_min and quartos_min.isdigit(): 
-        imoveis_list = imoveis_list.filter(quartos__gte=quartos_min)
-        
-    if suites_min and suites_min.isdigit(): 
-        imoveis_list = imoveis_list.filter(suites__gte=suites_min)
-        
-    if banheiros_min and banheiros_min.isdigit(): 
-        imoveis_list = imoveis_list.filter(banheiros__gte=banheiros_min)
-        
-    if salas_min and salas_min.isdigit(): 
-        imoveis_list = imoveis_list.filter(salas__gte=salas_min)
-        
-    if cozinhas_min and cozinhas_min.isdigit(): 
-        imoveis_list = imoveis_list.filter(cozinhas__gte=cozinhas_min)
-        
-    if closets_min and closets_min.isdigit(): 
-        imoveis_list = imoveis_list.filter(closets__gte=closets_min)
-        
-    if area_min and area_min.isdigit(): 
-        imoveis_list = imoveis_list.filter(area__gte=area_min)
-        
-    if preco_max and preco_max.isdigit(): 
-        imoveis_list = imoveis_list.filter(preco__lte=preco_max)
 
     # --- Fim dos Filtros ---
 
-    paginator = Paginator(imoveis_list, 50) 
-    page_number = request.GET.get('page')
-    imoveis_page = paginator.get_page(page_number)
-    
+    # --- FACETAS: contagem por opção do formulário (1 GROUP BY por campo, em cache) ---
+    facetas = calcular_facetas(vitrine_ativa, request.GET)
+    cidade_filtro = request.GET.get('cidade', '')
+    cidades_facetas = []
+    for cidade in cidades_em_cache():
+        total_imoveis = facetas['cidade'].get(cidade['id'], 0)
+        # Esconde cidades sem resultado (menos a que já está selecionada)
+        if total_imoveis or str(cidade['id']) == cidade_filtro:
+            cidades_facetas.append({**cidade, 'total_imoveis': total_imoveis})
+
+    # --- PAGINAÇÃO POR CURSOR (sem OFFSET/COUNT a cada página) ---
+    # O resultado de cada combinação de filtros (ids ordenados + total) fica em
+    # cache até o catálogo mudar (imoveis/catalogo.py); o banco só carrega os
+    # imóveis da página. Com a vitrine em memória ligada, o cálculo sai do índice NumPy.
+    ordenacao = ordenacao_do_get(request.GET)
+    fonte = fonte_da_busca(vitrine_ativa, request.GET, agora, ordenacao)
+    imoveis_page = paginar_por_cursor(imoveis_list, request.GET, por_pagina=50, fonte=fonte, ordenacao=ordenacao)
+
+    # Querystring dos filtros (sem 'page'/'cursor') para montar os links de navegação
+    filtros_querystring = request.GET.copy()
+    for parametro in PARAMETROS_NAVEGACAO:
+        filtros_querystring.pop(parametro, None)
+    
+    # Busca por área (?caixa= ou ?lat=&lng=&raio=) e a mesma querystring sem ela (link "Remover")
+    area_busca = ler_area(request.GET)
+    sem_area_querystring = filtros_querystring.copy()
+    for parametro in PARAMETROS_AREA:
+        sem_area_querystring.pop(parametro, None)
+
     contexto = {
         'imoveis': imoveis_page,
         'cidades': cidades,
         'imobiliarias': imobiliarias,
+        'versao_referencia': versao_referencia(),
         'imobiliaria_selecionada': imobiliaria_selecionada,
-        'valores_filtro': request.GET
+        'valores_filtro': request.GET,
+        'filtros_querystring': filtros_querystring.urlencode(),
+        'facetas': facetas,
+        'cidades_facetas': cidades_facetas,
+        'quartos_facetas': quartos_acumulado(facetas['quartos']),
+        'ordenacoes': ORDENACOES.values(),
+        'area_busca': area_busca,
+        'raios_km': RAIOS_KM,
+        'raio_selecionado': area_busca.raio_km if area_busca and area_busca.centro else RAIO_PADRAO_KM,
+        'sem_area_querystring': sem_area_querystring.urlencode(),
     }
-    return render(request, 'imoveis/lista_imoveis.html', contexto)
+    return marcar(render(request, 'imoveis/lista_imoveis.html', contexto), etag)
 
 def detalhe_imovel(request, id):
     
@@ -134,33 +119,50 @@ def detalhe_imovel(request, id):
     )
 
     # --- [INÍCIO] LÓGICA DO CONTADOR DE VISITAS ---
+    # Visitantes únicos por HyperLogLog no cache (imoveis/contador.py), sem sessão;
+    # o comando descarregar_visualizacoes grava a estimativa com um UPDATE por lote.
     
-    # 1. Pega a lista de IDs de imóveis já vistos nesta sessão
-    viewed_imoveis = request.session.get('viewed_imoveis', [])
+    # 1. Quem é o visitante (cookie próprio; nunca cria/regrava sessão)
+    token, novo_visitante = token_visitante(request)
     
-    # 2. Verifica se o ID deste imóvel AINDA NÃO ESTÁ na lista
-    if imovel.id not in viewed_imoveis:
-        print(f"Primeira visita ao imóvel {imovel.id} nesta sessão. Contando.")
-        
-        # 3. Incrementa o contador no banco de dados (de forma segura, evitando 'race condition')
-        imovel.visualizacoes = F('visualizacoes') + 1
-        imovel.save(update_fields=['visualizacoes'])
-        
-        # 4. Adiciona o ID deste imóvel à lista da sessão
-        viewed_imoveis.append(imovel.id)
-        request.session['viewed_imoveis'] = viewed_imoveis
-        
-        # 5. Atualiza o objeto para mostrar o novo número imediatamente
-        imovel.refresh_from_db()
-    else:
-        print(f"Imóvel {imovel.id} já foi visto nesta sessão. Não contando.")
+    # 2. O número exibido é o gravado + os visitantes novos ainda no buffer (sem Redis, o que
+    #    esta visita acabou de gravar), sem reler o imóvel
+    imovel.visualizacoes += registrar_visita(imovel.id, token)
     
     # --- [FIM] DA LÓGICA ---
 
-    contexto = { 'imovel': imovel }
-    return render(request, 'imoveis/detalhe_imovel.html', contexto)
+    # --- GET CONDICIONAL (depois de contar a visita: um 304 também é uma visita) ---
+    etag = etag_pagina(request, 'detalhe', imovel.id, imovel.atualizado_em.isoformat(), versao_catalogo(), versao_referencia())
+    resposta = nao_modificado(request, etag, imovel.atualizado_em)
+    if resposta is not None:
+        return _com_cookie_visitante(request, resposta, token, novo_visitante)
+
+    # --- IMÓVEIS SEMELHANTES (pré-calculados pelo comando calcular_semelhantes) ---
+    # Uma consulta pelo índice (imovel, posicao); quem saiu da vitrine desde o cálculo fica de fora
+    semelhantes = Imovel.objects.vitrine().filter(
+        semelhante_de__imovel=imovel,
+        status_publicacao='ATIVO',
+        data_expiracao__gt=agora,
+    ).order_by('semelhante_de__posicao')
+
+    contexto = {
+        'imovel': imovel,
+        'semelhantes': list(semelhantes),
+    }
+    resposta = marcar(render(request, 'imoveis/detalhe_imovel.html', contexto), etag, imovel.atualizado_em)
+    return _com_cookie_visitante(request, resposta, token, novo_visitante)
+
+
+def _com_cookie_visitante(request, resposta, token, novo_visitante):
+    if novo_visitante:
+        resposta.set_cookie(
+            COOKIE_VISITANTE, token, max_age=COOKIE_VALIDADE_SEGUNDOS,
+            httponly=True, samesite='Lax', secure=request.is_secure(),
+        )
+    return resposta
 
 # --- VIEW "ASSISTENTE" ---
+@condition(etag_func=etag_bairros)
 def get_bairros(request):
     # As linhas abaixo precisam estar indentadas
     cidade_id = request.GET.get('cidade_id')
@@ -0,0 +1,326 @@
+# imoveis/vitrine.py
+"""
+Índice da vitrine em memória (opcional, um por worker).
+
+Guarda os imóveis ATIVOS em arrays NumPy, uma coluna por campo filtrável.
+Cada busca vira um punhado de máscaras booleanas vetorizadas + um lexsort,
+e o banco só é consultado para carregar os ~50 imóveis da página exibida
+(SELECT ... WHERE id IN (...)).
+
+Ativado por settings.VITRINE_EM_MEMORIA. O índice é mantido pelos sinais
+post_save/post_delete do Imovel (imoveis/signals.py) e reconstruído por
+completo numa thread do worker, nunca no caminho da requisição: quando a
+versão do catálogo (imoveis/catalogo.py, no cache compartilhado) muda ou a
+cada VITRINE_RECONSTRUIR_SEGUNDOS. Isso cobre o que os sinais não veem:
+QuerySet.update() (ex: ação 'marcar_como_destaque' do admin, expirar_anuncios)
+e as gravações feitas em outros workers.
+
+Enquanto a primeira construção não termina, obter_indice_vitrine() devolve
+None e a busca vai ao banco.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele a vitrine usa só o banco
+    np = None
+
+from .catalogo import versao_catalogo
+from .filtros import FILTROS_FAIXA
+from .geo import ler_area
+from .paginacao import carregar_por_ids
+
+logger = logging.getLogger(__name__)
+
+# Valor usado nas colunas inteiras para "NULL" (nenhum filtro da vitrine casa com ele)
+NULO = -1
+
+# De quanto em quanto tempo a thread confere se a versão do catálogo mudou
+VERIFICAR_SEGUNDOS = 5
+
+# Parâmetro do GET -> coluna inteira comparada por igualdade
+COLUNAS_EXATAS = {
+    'imobiliaria': 'imobiliaria_id',
+    'cidade': 'cidade_id',
+    'bairro': 'bairro_id',
+}
+
+# Parâmetro do GET -> (coluna, operador). Mesmas regras de FILTROS_FAIXA.
+COLUNAS_FAIXA = {
+    parametro: (lookup.split('__')[0], lookup.split('__')[1])
+    for parametro, lookup in FILTROS_FAIXA.items()
+}
+
+COLUNAS_INTEIRAS = (
+    'quartos', 'suites', 'banheiros', 'salas', 'cozinhas', 'closets', 'area',
+    'cidade_id', 'bairro_id', 'imobiliaria_id',
+)
+
+CAMPOS_DB = (
+    'id', 'destaque', 'data_cadastro', 'data_expiracao', 'preco', 'finalidade', 'latitude', 'longitude',
+) + COLUNAS_INTEIRAS
+
+# Colunas float (NaN = NULL, que não passa em nenhuma comparação)
+COLUNAS_FLOAT = ('preco', 'latitude', 'longitude')
+
+
+def vitrine_disponivel():
+    return np is not None and getattr(settings, 'VITRINE_EM_MEMORIA', False)
+
+
+def _timestamp(valor):
+    return valor.timestamp() if valor is not None else float('nan')
+
+
+class ResultadoVitrine:
+    """
+    Resultado ordenado de uma busca no índice (destaque DESC, data_cadastro DESC, id DESC).
+
+    Expõe a mesma interface da fonte baseada em queryset de imoveis/paginacao.py,
+    então a paginação por cursor funciona igual nos dois caminhos.
+    """
+
+    def __init__(self, ids, destaque, data_cadastro, queryset):
+        self.ids = ids
+        self.destaque = destaque
+        self.data_cadastro = data_cadastro
+        self.queryset = queryset
+
+    def total(self):
+        return int(len(self.ids))
+
+    def _antes_da_chave(self, chave, inclusive):
+        destaque, data_cadastro, pk = chave
+        data = data_cadastro.timestamp()
+        mesma_data = self.data_cadastro == data
+        ultimo = (self.ids >= pk) if inclusive else (self.ids > pk)
+        antes = (self.destaque > destaque) | (
+            (self.destaque == destaque) & ((self.data_cadastro > data) | (mesma_data & ultimo))
+        )
+        return int(np.count_nonzero(antes))
+
+    def _carregar(self, ids):
+        # Um id pode ter saído da vitrine desde a última reconstrução: é simplesmente pulado
+        return carregar_por_ids(self.queryset, ids)
+
+    def fatia(self, offset, quantidade):
+        return self._carregar(self.ids[offset:offset + quantidade])
+
+    def ultimos(self, quantidade):
+        return self._carregar(self.ids[max(len(self.ids) - quantidade, 0):])
+
+    def depois(self, chave, quantidade):
+        inicio = self._antes_da_chave(chave, inclusive=True)
+        return self._carregar(self.ids[inicio:inicio + quantidade])
+
+    def antes(self, chave, quantidade):
+        fim = self._antes_da_chave(chave, inclusive=False)
+        return self._carregar(self.ids[max(fim - quantidade, 0):fim])
+
+
+class IndiceVitrine:
+    """Colunas NumPy dos imóveis ATIVOS. Seguro para uso entre threads do mesmo worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._n = 0
+        self._posicao = {}
+        self._colunas = {}
+        self._finalidades = {}
+        self.construido_em = 0.0
+        self.versao = None
+
+    # --- Construção ---
+    def _alocar(self, capacidade):
+        colunas = {
+            'id': np.zeros(capacidade, dtype=np.int64),
+            'destaque': np.zeros(capacidade, dtype=np.int8),
+            'data_cadastro': np.zeros(capacidade, dtype=np.float64),
+            'data_expiracao': np.zeros(capacidade, dtype=np.float64),
+            'finalidade': np.zeros(capacidade, dtype=np.int8),
+        }
+        for nome in COLUNAS_FLOAT:
+            colunas[nome] = np.zeros(capacidade, dtype=np.float64)
+        for nome in COLUNAS_INTEIRAS:
+            colunas[nome] = np.zeros(capacidade, dtype=np.int64)
+        return colunas
+
+    def _codigo_finalidade(self, finalidade):
+        if finalidade is None:
+            return NULO
+        return self._finalidades.setdefault(finalidade, len(self._finalidades))
+
+    def _gravar_linha(self, i, linha):
+        colunas = self._colunas
+        colunas['id'][i] = linha['id']
+        colunas['destaque'][i] = 1 if linha['destaque'] else 0
+        colunas['data_cadastro'][i] = _timestamp(linha['data_cadastro'])
+        colunas['data_expiracao'][i] = _timestamp(linha['data_expiracao'])
+        for nome in COLUNAS_FLOAT:
+            colunas[nome][i] = float(linha[nome]) if linha[nome] is not None else float('nan')
+        colunas['finalidade'][i] = self._codigo_finalidade(linha['finalidade'])
+        for nome in COLUNAS_INTEIRAS:
+            valor = linha[nome]
+            colunas[nome][i] = valor if valor is not None else NULO
+
+    def construir(self):
+        """Recarrega todos os imóveis ATIVOS do banco (uma consulta)."""
+        from .models import Imovel
+
+        # Lida antes da consulta: um incremento durante a leitura dispara outra reconstrução
+        versao = versao_catalogo()
+        linhas = list(Imovel.objects.filter(status_publicacao='ATIVO').values(*CAMPOS_DB))
+        with self._lock:
+            self._finalidades = {}
+            self._colunas = self._alocar(max(len(linhas) * 2, 64))
+            self._posicao = {}
+            for i, linha in enumerate(linhas):
+                self._gravar_linha(i, linha)
+                self._posicao[linha['id']] = i
+            self._n = len(linhas)
+            self.construido_em = time.monotonic()
+            self.versao = versao
+        logger.info("Vitrine: índice em memória construído com %d imóveis ativos.", len(linhas))
+
+    def desatualizado(self, validade):
+        return self.versao != versao_catalogo() or time.monotonic() - self.construido_em > validade
+
+    # --- Atualização incremental (chamada pelos sinais) ---
+    def atualizar(self, pk):
+        """Relê um imóvel do banco e insere/atualiza/remove a linha correspondente."""
+        from .models import Imovel
+
+        linha = Imovel.objects.filter(pk=pk, status_publicacao='ATIVO').values(*CAMPOS_DB).first()
+        if linha is None:
+            self.remover(pk)
+            return
+        with self._lock:
+            i = self._posicao.get(pk)
+            if i is None:
+                i = self._n
+                if i >= len(self._colunas['id']):
+                    # Dobra a capacidade (amortizado O(1) por inserção)
+                    maiores = self._alocar(max(len(self._colunas['id']) * 2, 64))
+                    for nome, coluna in self._colunas.items():
+                        maiores[nome][:self._n] = coluna[:self._n]
+                    self._colunas = maiores
+                self._n += 1
+                self._posicao[pk] = i
+            self._gravar_linha(i, linha)
+
+    def remover(self, pk):
+        with self._lock:
+            i = self._posicao.pop(pk, None)
+            if i is None:
+                return
+            ultimo = self._n - 1
+            if i != ultimo:
+                # Move a última linha para o buraco (remoção O(1))
+                for coluna in self._colunas.values():
+                    coluna[i] = coluna[ultimo]
+                self._posicao[int(self._colunas['id'][i])] = i
+            self._n = ultimo
+
+    # --- Busca ---
+    def buscar(self, params, agora, queryset):
+        """
+        Aplica os filtros do GET (mesmas regras de imoveis/filtros.py) e devolve
+        um ResultadoVitrine já ordenado. `queryset` é usado só para carregar a página.
+        """
+        with self._lock:
+            n = self._n
+            c = {nome: coluna[:n] for nome, coluna in self._colunas.items()}
+            mascara = c['data_expiracao'] > agora.timestamp()
+
+            finalidade = params.get('finalidade')
+            if finalidade:
+                codigo = self._finalidades.get(finalidade)
+                mascara &= (c['finalidade'] == codigo) if codigo is not None else False
+
+            for parametro, coluna in COLUNAS_EXATAS.items():
+                valor = params.get(parametro)
+                if valor and valor.isdigit():
+                    mascara &= c[coluna] == int(valor)
+
+            for parametro, (coluna, operador) in COLUNAS_FAIXA.items():
+                valor = params.get(parametro)
+                if valor and valor.isdigit():
+                    if operador == 'gte':
+                        # valor >= 0, então NULL (-1) nunca passa, igual ao banco
+                        mascara &= c[coluna] >= int(valor)
+                    else:
+                        # NaN (preço NULL) dá False em qualquer comparação
+                        mascara &= c[coluna] <= int(valor)
+
+            area = ler_area(params)
+            if area is not None:
+                latitude, longitude = c['latitude'], c['longitude']
+                mascara &= (latitude >= area.sul) & (latitude <= area.norte)
+                mascara &= (longitude >= area.oeste) & (longitude <= area.leste)
+                if area.centro is not None:
+                    # Mesma distância equirretangular de geo.filtrar_area
+                    km_lat, km_lng = area.fatores_km()
+                    dy = (latitude - area.centro[0]) * km_lat
+                    dx = (longitude - area.centro[1]) * km_lng
+                    mascara &= dy * dy + dx * dx <= area.raio_km ** 2
+
+            linhas = np.flatnonzero(mascara)
+            ids = c['id'][linhas]
+            destaque = c['destaque'][linhas]
+            data_cadastro = c['data_cadastro'][linhas]
+
+        # lexsort: a ÚLTIMA chave é a principal. Negativos = ordem decrescente.
+        ordem = np.lexsort((-ids, -data_cadastro, -destaque))
+        return ResultadoVitrine(ids[ordem], destaque[ordem], data_cadastro[ordem], queryset)
+
+
+# --- Um índice por processo (worker), construído pela thread abaixo ---
+_indice = None
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def indice_carregado():
+    """O índice deste worker, se já foi construído (usado pelos sinais)."""
+    return _indice
+
+
+def _reconstruir_sempre():
+    global _indice
+    validade = getattr(settings, 'VITRINE_RECONSTRUIR_SEGUNDOS', 300)
+    while True:
+        try:
+            if _indice is None:
+                indice = IndiceVitrine()
+                indice.construir()
+                _indice = indice
+            elif _indice.desatualizado(validade):
+                _indice.construir()
+        except Exception:
+            logger.exception("Vitrine: erro ao construir o índice em memória.")
+        finally:
+            close_old_connections()
+        time.sleep(VERIFICAR_SEGUNDOS)
+
+
+def iniciar_reconstrucao_periodica():
+    global _thread
+    if _thread is not None:
+        return
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_reconstruir_sempre, name='vitrine-em-memoria', daemon=True)
+            _thread.start()
+
+
+def obter_indice_vitrine():
+    """Devolve o índice pronto para busca, ou None (desativado ou ainda em construção: a busca vai ao banco)."""
+    if not vitrine_disponivel():
+        return None
+    iniciar_reconstrucao_periodica()
+    return _indice